@@ -19,15 +19,48 @@ except ImportError:  # script style (cwd likely project root or backend dir)
 
 __all__ = ["detect_anomalies", "BlobDet", "DetectionReport", "asdict"]
 
+def _pop_option(argv, name):
+    """Remove `--name VALUE` / `--name=VALUE` from argv and return VALUE (or None)."""
+    for i, arg in enumerate(argv):
+        if arg == name and i + 1 < len(argv):
+            value = argv[i + 1]
+            del argv[i:i + 2]
+            return value
+        if arg.startswith(name + "="):
+            del argv[i]
+            return arg.split("=", 1)[1]
+    return None
+
+def _pop_flag(argv, name):
+    """Remove a boolean `--name` flag from argv; return True if it was present."""
+    if name in argv:
+        argv.remove(name)
+        return True
+    return False
+
 def _cli():  # mirror previous main block
-    if len(sys.argv) not in (3,4,5):
-        print("Usage: python anomaly_cv.py <baseline.jpg> <maintenance.jpg> [report.json] [slider_percent]")
+    argv = list(sys.argv)
+    if _pop_flag(argv, "--serve"):
+        # Persistent worker: JSONL jobs on stdin (or --socket), results on stdout
+        try:
+            from backend.anomaly_engine.jobs import main as serve  # type: ignore
+        except ImportError:
+            from anomaly_engine.jobs import main as serve  # type: ignore
+        sys.exit(serve(argv[1:]))
+    profile = _pop_option(argv, "--profile")
+    auto_roi = True if _pop_flag(argv, "--auto-roi") else None
+    budget = _pop_option(argv, "--memory-budget-mb")
+    memory_budget_mb = float(budget) if budget else None
+    arrays_dir = _pop_option(argv, "--save-arrays")
+    if len(argv) not in (3,4,5):
+        print("Usage: python anomaly_cv.py <baseline.jpg> <maintenance.jpg> [report.json] [slider_percent] [--profile fast|balanced|accurate] [--auto-roi] [--memory-budget-mb MB] [--save-arrays DIR]")
+        print("       python anomaly_cv.py --serve [--workers N] [--socket PATH] [--baseline-dir DIR] [--no-warmup]  (JSONL jobs on stdin)")
         sys.exit(1)
-    _, bpath, mpath, *rest = sys.argv
+    _, bpath, mpath, *rest = argv
     jpath = rest[0] if len(rest) >= 1 and not rest[0].replace('.','',1).lstrip('-').isdigit() else None
     slider_arg = float(rest[-1]) if rest and rest[-1].replace('.','',1).lstrip('-').isdigit() else None
-    rep = detect_anomalies(bpath, mpath, out_json_path=jpath, slider_percent=slider_arg)
-    print(f"Result: {rep.image_level_label} | blobs={len(rep.blobs)} | SSIM={rep.mean_ssim:.3f} | warp={rep.warp_model} | t_pot={rep.t_pot:.2f} t_fault={rep.t_fault:.2f} (src={rep.threshold_source})")
+    rep = detect_anomalies(bpath, mpath, out_json_path=jpath, slider_percent=slider_arg, profile=profile, auto_roi=auto_roi, memory_budget_mb=memory_budget_mb, out_arrays_dir=arrays_dir)
+    print(f"Result: {rep.image_level_label} | blobs={len(rep.blobs)} | SSIM={rep.mean_ssim:.3f} | warp={rep.warp_model} | t_pot={rep.t_pot:.2f} t_fault={rep.t_fault:.2f} (src={rep.threshold_source}) | profile={rep.profile} | roi={rep.roi}")
 
 if __name__ == "__main__":
     _cli()
@@ -3,7 +3,13 @@ Expose detect_anomalies and data structures for external use.
 """
 from .data_structures import BlobDet, DetectionReport
 from .detection import detect_anomalies
+from .profiles import PipelineProfile, PROFILES, get_profile
+from .buffers import BufferPool, worker_pool
+from .baselines import BaselineFeatures, BaselineRegistry
 
 __all__ = [
-    'BlobDet', 'DetectionReport', 'detect_anomalies'
+    'BlobDet', 'DetectionReport', 'detect_anomalies',
+    'PipelineProfile', 'PROFILES', 'get_profile',
+    'BufferPool', 'worker_pool',
+    'BaselineFeatures', 'BaselineRegistry'
 ]
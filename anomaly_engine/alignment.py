@@ -1,62 +1,200 @@
-"""Image alignment logic (ECC + feature fallback) extracted from anomaly_cv.
-No functional changes.
+"""Image alignment: ECC on edge maps with an ORB/homography fallback.
+
+`ecc_align` estimates the warp mapping maintenance pixels onto the baseline,
+optionally starting from a known warp, and `warp_to_base` applies it (also to
+ROI crops, via an offset). The ORB helpers are shared with the baseline
+registry, which precomputes the baseline's keypoints.
 """
 from typing import Tuple
 import numpy as np
 import cv2 as cv
 
-def ecc_align(base_gray: np.ndarray, mov_gray: np.ndarray) -> Tuple[np.ndarray, np.ndarray, bool, float]:
+# A seeded result keeping less than this fraction of init_cc is rejected
+SEEDED_MIN_CC_RATIO = 0.9
+# Feature fallback: descriptors per image, keypoint grid, Lowe ratio, and the
+# matches / RANSAC inliers below which the homography is not trusted
+FALLBACK_MAX_FEATURES = 2000
+FALLBACK_GRID = 8
+LOWE_RATIO = 0.75
+FALLBACK_MIN_MATCHES = 8
+FALLBACK_MIN_INLIERS = 15
+
+def ecc_input_mask(shape, drop_legend: bool = True) -> np.ndarray:
+    """ECC mask: keep transformer region, drop right colorbar + top sky band.
+
+    drop_legend=False keeps the right edge, for frames already cropped to the
+    baseline ROI (see roi.py).
+    """
+    H, W = shape[:2]
+    inputMask = np.ones((H, W), np.uint8) * 255
+    if drop_legend:
+        inputMask[:, int(0.88 * W):] = 0
+    inputMask[:int(0.15 * H), :] = 0
+    return inputMask
+
+def warp_to_base(img: np.ndarray, warp: np.ndarray, dsize, offset=(0, 0),
+                 dst: np.ndarray | None = None) -> np.ndarray:
+    """Resample img into baseline space using the pipeline's inverse-map convention.
+
+    offset=(x, y) is for warps estimated on crops taken at the same offset in
+    both images: the output covers the crop while sampling the full img.
+    """
+    ox, oy = offset
+    if ox or oy:
+        M = np.eye(3, dtype=np.float64)
+        M[:warp.shape[0], :] = warp
+        M = np.array([[1, 0, ox], [0, 1, oy], [0, 0, 1]], np.float64) @ M
+        warp = M[:warp.shape[0]].astype(np.float32)
+    if warp.shape == (3,3):
+        return cv.warpPerspective(img, warp, dsize, dst=dst, flags=cv.INTER_LINEAR + cv.WARP_INVERSE_MAP)
+    return cv.warpAffine(img, warp, dsize, dst=dst, flags=cv.INTER_LINEAR + cv.WARP_INVERSE_MAP)
+
+def ecc_align(base_gray: np.ndarray, mov_gray: np.ndarray,
+              max_iter: int = 300, eps: float = 1e-6,
+              n_features: int = 5000,
+              input_mask: np.ndarray | None = None,
+              base_edges: np.ndarray | None = None,
+              base_orb: Tuple[np.ndarray, np.ndarray] | None = None,
+              init_warp: np.ndarray | None = None,
+              init_cc: float | None = None,
+              min_cc_ratio: float = SEEDED_MIN_CC_RATIO,
+              stats: dict | None = None) -> Tuple[np.ndarray, np.ndarray, bool, float]:
     """
     Robust alignment:
       1) ECC on Canny edges with an inputMask (ignores legend/sky).
-      2) Fallback: ORB + KNN (Lowe ratio) + RANSAC homography.
+      2) Fallback: `feature_align` (bucketed ORB + LSH KNN with Lowe ratio +
+         RANSAC homography).
+    max_iter/eps are the ECC termination criteria, n_features the ORB budget;
+    input_mask overrides the default ecc_input_mask. base_edges (Canny of
+    base_gray) and base_orb (`orb_keypoints` for n_features) are
+    precomputed baseline features, see baselines.py. init_warp (2x3)
+    starts ECC from a known warp (the previous video frame's, or the last
+    inspection's of a registered baseline) under the same max_iter/eps; if
+    ECC fails from there, or ends below min_cc_ratio * init_cc, the full
+    search from the identity runs before the fallback.
+    stats, if given, receives 'init' ('seeded', 'identity' or 'fallback')
+    and 'seed_rejected' (plus 'matches' and 'inliers' after the fallback).
     Returns: (warp_matrix, aligned_gray, ok, score)
       - warp_matrix is 2x3 (affine) or 3x3 (homography)
       - score is ECC correlation for ECC; 0.0 for homography fallback
+      - both map baseline to maintenance coordinates (use WARP_INVERSE_MAP)
+      - a failed fallback returns the identity with ok=False
     """
     H, W = base_gray.shape
 
-    # Mask: keep transformer region, drop right colorbar + top sky band
-    inputMask = np.ones_like(base_gray, np.uint8) * 255
-    inputMask[:, int(0.88 * W):] = 0
-    inputMask[:int(0.15 * H), :] = 0
+    inputMask = ecc_input_mask(base_gray.shape) if input_mask is None else input_mask
 
     # Edge images (photometrically robust)
-    base_e = cv.Canny(base_gray, 50, 150)
+    base_e = cv.Canny(base_gray, 50, 150) if base_edges is None else base_edges
     mov_e  = cv.Canny(mov_gray,  50, 150)
 
     warp_mode = cv.MOTION_AFFINE
-    warp = np.eye(2, 3, dtype=np.float32)
-    criteria = (cv.TERM_CRITERIA_EPS | cv.TERM_CRITERIA_COUNT, 300, 1e-6)
+    stats = {} if stats is None else stats
+    stats['seed_rejected'] = False
+    starts = [('identity', np.eye(2, 3, dtype=np.float32))]
+    if init_warp is not None and init_warp.shape == (2, 3):
+        starts.insert(0, ('seeded', init_warp.astype(np.float32)))
 
-    try:
-        cc, warp = cv.findTransformECC(
-            base_e, mov_e, warp, warp_mode, criteria, inputMask=inputMask
-        )
+    criteria = (cv.TERM_CRITERIA_EPS | cv.TERM_CRITERIA_COUNT, max_iter, eps)
+    for init, warp in starts:
+        try:
+            cc, warp = cv.findTransformECC(
+                base_e, mov_e, warp, warp_mode, criteria, inputMask=inputMask
+            )
+        except cv.error:
+            stats['seed_rejected'] |= init == 'seeded'
+            continue
+        if init == 'seeded' and init_cc is not None and cc < min_cc_ratio * init_cc:
+            stats['seed_rejected'] = True
+            continue
         aligned = cv.warpAffine(
             mov_gray, warp, (W, H),
             flags=cv.INTER_LINEAR + cv.WARP_INVERSE_MAP
         )
+        stats['init'] = init
         return warp, aligned, True, float(cc)
-    except cv.error:
-        # Feature fallback: ORB + KNN(Lowe ratio) + RANSAC Homography
-        orb = cv.ORB_create(5000)
-        k1, d1 = orb.detectAndCompute(base_gray, None)
-        k2, d2 = orb.detectAndCompute(mov_gray,  None)
-        if d1 is None or d2 is None:
-            return np.eye(2,3,np.float32), mov_gray, False, 0.0
-
-        bf = cv.BFMatcher(cv.NORM_HAMMING, crossCheck=False)
-        knn = bf.knnMatch(d1, d2, k=2)
-        good = [m for m,n in knn if n is not None and m.distance < 0.75 * n.distance]
-        if len(good) < 8:
-            return np.eye(2,3,np.float32), mov_gray, False, 0.0
-
-        pts1 = np.float32([k1[m.queryIdx].pt for m in good])
-        pts2 = np.float32([k2[m.trainIdx].pt for m in good])
-        Hm, mask = cv.findHomography(pts2, pts1, cv.RANSAC, 3.0)
-        if Hm is None:
-            return np.eye(2,3,np.float32), mov_gray, False, 0.0
-
-        aligned = cv.warpPerspective(mov_gray, Hm, (W, H))
-        return Hm.astype(np.float32), aligned, True, 0.0
+    stats['init'] = 'fallback'
+
+    # Feature fallback: bucketed ORB + LSH KNN (Lowe ratio) + RANSAC homography
+    Hm = feature_align(base_gray, mov_gray, n_features=n_features, base_orb=base_orb, stats=stats)
+    if Hm is None:
+        return np.eye(2, 3, dtype=np.float32), mov_gray, False, 0.0
+    aligned = cv.warpPerspective(mov_gray, Hm, (W, H), flags=cv.INTER_LINEAR + cv.WARP_INVERSE_MAP)
+    return Hm, aligned, True, 0.0
+
+
+def orb_keypoints(gray: np.ndarray, n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Grid-bucketed ORB: keypoint positions (N, 2) float32 and descriptors (N, 32) uint8.
+
+    ORB's n_features strongest corners cluster on text, the legend and busy
+    structure. At most FALLBACK_MAX_FEATURES of them are kept, taken round-robin
+    over a FALLBACK_GRID x FALLBACK_GRID grid (strongest first in each cell), so
+    the matches spread over the frame and the matcher's input stays bounded.
+    """
+    orb = cv.ORB_create(n_features)
+    kps = orb.detect(gray, None)
+    keep = min(n_features, FALLBACK_MAX_FEATURES)
+    if len(kps) > keep:
+        H, W = gray.shape[:2]
+        xy = np.float32([kp.pt for kp in kps])
+        response = np.float32([kp.response for kp in kps])
+        gx = np.minimum((xy[:, 0] * FALLBACK_GRID // W).astype(np.int32), FALLBACK_GRID - 1)
+        gy = np.minimum((xy[:, 1] * FALLBACK_GRID // H).astype(np.int32), FALLBACK_GRID - 1)
+        cell = gy * FALLBACK_GRID + gx
+        order = np.lexsort((-response, cell))            # by cell, strongest first
+        starts = np.r_[0, np.flatnonzero(np.diff(cell[order])) + 1]
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        chosen = order[np.lexsort((-response[order], rank))][:keep]
+        kps = [kps[i] for i in np.sort(chosen)]
+    kps, desc = orb.compute(gray, kps)
+    pts = np.float32([kp.pt for kp in kps]).reshape(-1, 2)
+    if desc is None:
+        desc = np.zeros((0, 32), np.uint8)
+    return pts, desc
+
+
+def match_features(desc_base: np.ndarray, desc_mov: np.ndarray,
+                   ratio: float = LOWE_RATIO) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices (base, mov) of the matches passing Lowe's ratio test.
+
+    Nearest neighbours come from a FLANN LSH index over the binary
+    descriptors; the index is seeded, so matches are reproducible.
+    """
+    cv.setRNGSeed(0)
+    matcher = cv.FlannBasedMatcher(dict(algorithm=6, table_number=6, key_size=12,   # 6 = LSH
+                                        multi_probe_level=1), dict(checks=50))
+    knn = matcher.knnMatch(desc_base, desc_mov, k=2)
+    pairs = np.array([(m[0].queryIdx, m[0].trainIdx, m[0].distance, m[1].distance)
+                      for m in knn if len(m) == 2], np.float32).reshape(-1, 4)
+    good = pairs[pairs[:, 2] < ratio * pairs[:, 3]]
+    return good[:, 0].astype(np.intp), good[:, 1].astype(np.intp)
+
+
+def feature_align(base_gray: np.ndarray, mov_gray: np.ndarray, n_features: int = 5000,
+                  base_orb: Tuple[np.ndarray, np.ndarray] | None = None,
+                  stats: dict | None = None) -> np.ndarray | None:
+    """RANSAC homography mapping base to mov coordinates (the WARP_INVERSE_MAP
+    convention of the ECC warps), or None without enough matches or inliers.
+
+    base_orb is the baseline's precomputed `orb_keypoints`. stats, if given,
+    receives 'matches' and 'inliers'.
+    """
+    stats = {} if stats is None else stats
+    stats['matches'] = stats['inliers'] = 0
+    pts_base, d1 = base_orb if base_orb is not None else orb_keypoints(base_gray, n_features)
+    if len(d1) < FALLBACK_MIN_MATCHES:
+        return None
+    pts_mov, d2 = orb_keypoints(mov_gray, n_features)
+    if len(d2) < FALLBACK_MIN_MATCHES:
+        return None
+    qi, ti = match_features(d1, d2)
+    stats['matches'] = len(qi)
+    if len(qi) < FALLBACK_MIN_MATCHES:
+        return None
+    Hm, inliers = cv.findHomography(pts_base[qi], pts_mov[ti], cv.RANSAC, 3.0)
+    if Hm is None:
+        return None
+    stats['inliers'] = int(inliers.sum())
+    if stats['inliers'] < FALLBACK_MIN_INLIERS:
+        return None
+    return Hm.astype(np.float32)
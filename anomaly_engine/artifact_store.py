@@ -0,0 +1,270 @@
+"""Content-addressed store for inspection run images.
+
+Runs used to keep their own `baseline.png`, `maintenance.png` and
+`overlay.png`; the same baseline repeats across every run of an inspection
+and the whole tree is mirrored again under `inspection_logs/`. With the store
+each image is kept once under the inspections root as
+
+    objects/<d[:2]>/<d>.png        d = image_digest of the decoded pixels
+
+and a run directory holds `artifacts.json` mapping each role to its digest.
+Keying by decoded pixels (not file bytes) lets `put_image` skip an image that
+is already stored before encoding it, and makes two encodings of the same
+pixels share one object.
+
+`migrate` converts the legacy layout in place (objects are written before the
+manifest, the inspection's `index.json` paths are repointed after it, and run
+files are removed last, so an interrupted migration can simply be re-run);
+`gc` removes objects that no manifest references. `resolve` reads either
+layout.
+
+CLI:
+python -m anomaly_engine.artifact_store migrate --root inspections [--keep-files] [--dry-run]
+python -m anomaly_engine.artifact_store gc --root inspections [--dry-run]
+python -m anomaly_engine.artifact_store stats --root inspections
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+import argparse
+import json
+import os
+import time
+import cv2 as cv
+import numpy as np
+
+from .io_utils import image_digest
+
+IMAGE_ROLES = ('baseline', 'maintenance', 'overlay')
+MANIFEST = 'artifacts.json'
+OBJECTS_DIR = 'objects'
+GC_MIN_AGE_S = 3600.0    # objects younger than this may belong to a run still being written
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.tmp{os.getpid()}')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ArtifactStore:
+    def __init__(self, root='inspections'):
+        self.root = Path(root)
+        self.objects = self.root / OBJECTS_DIR
+        self._stats = dict(puts=0, skipped=0, written=0, bytes_written=0)
+
+    # -- objects -----------------------------------------------------------
+    def object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / f'{digest}.png'
+
+    def has(self, digest: str) -> bool:
+        return self.object_path(digest).exists()
+
+    def _store(self, digest: str, encode) -> str:
+        self._stats['puts'] += 1
+        path = self.object_path(digest)
+        if path.exists():
+            self._stats['skipped'] += 1
+            return digest
+        data = encode()
+        _write_atomic(path, data)
+        self._stats['written'] += 1
+        self._stats['bytes_written'] += len(data)
+        return digest
+
+    def put_image(self, img: np.ndarray) -> str:
+        """Store a decoded image; encoding is skipped when its pixels are already stored."""
+        def encode():
+            ok, buf = cv.imencode('.png', img)
+            if not ok:
+                raise ValueError('PNG encoding failed')
+            return buf.tobytes()
+        return self._store(image_digest(img), encode)
+
+    def put_file(self, path) -> str:
+        """Store an image file; PNG bytes are copied as-is, other formats re-encoded."""
+        path = Path(path)
+        data = path.read_bytes()
+        img = cv.imdecode(np.frombuffer(data, np.uint8), cv.IMREAD_UNCHANGED)
+        if img is None:
+            raise ValueError(f'Not a decodable image: {path}')
+        if path.suffix.lower() != '.png':
+            return self.put_image(img)
+        return self._store(image_digest(img), lambda: data)
+
+    # -- runs ----------------------------------------------------------------
+    def read_manifest(self, run_dir) -> Dict[str, Any]:
+        path = Path(run_dir) / MANIFEST
+        if not path.exists():
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self, run_dir, manifest: Dict[str, Any]) -> None:
+        _write_atomic(Path(run_dir) / MANIFEST, json.dumps(manifest, indent=2).encode('utf-8'))
+
+    def _entry(self, digest: str) -> Dict[str, Any]:
+        path = self.object_path(digest)
+        return {'digest': digest, 'object': path.relative_to(self.root).as_posix(),
+                'bytes': path.stat().st_size}
+
+    def write_run(self, run_dir, images: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a run's images (role -> array or file path) and record them in its manifest."""
+        manifest = self.read_manifest(run_dir)
+        for role, img in images.items():
+            digest = self.put_image(img) if isinstance(img, np.ndarray) else self.put_file(img)
+            manifest[role] = self._entry(digest)
+        self._save_manifest(run_dir, manifest)
+        return manifest
+
+    def resolve(self, run_dir, role: str) -> Path:
+        """Path of a run's image in either layout (manifest first, then the legacy file)."""
+        entry = self.read_manifest(run_dir).get(role)
+        if entry is not None:
+            return self.object_path(entry['digest'])
+        return Path(run_dir) / f'{role}.png'
+
+    def iter_runs(self) -> Iterator[Path]:
+        """Every run directory under root, `inspection_logs/` mirror included."""
+        for runs_dir in sorted(self.root.rglob('runs')):
+            if self.objects in runs_dir.parents or not runs_dir.is_dir():
+                continue
+            for run_dir in sorted(runs_dir.iterdir()):
+                if run_dir.is_dir():
+                    yield run_dir
+
+    # -- maintenance -----------------------------------------------------------
+    def _index_paths(self, run_dir: Path, digests: Dict[str, str], dry_run: bool) -> int:
+        """Point the run's `paths` in its inspection's index.json at the stored objects.
+
+        Only entries still naming the run's own `<role>.png` are rewritten,
+        keeping their root prefix and separator (the mirror's index names the
+        primary tree); returns how many changed.
+        """
+        index_path = run_dir.parent.parent / 'index.json'
+        if not digests or not index_path.exists():
+            return 0
+        with open(index_path, encoding='utf-8') as f:
+            index = json.load(f)
+        changed = 0
+        for run in index.get('runs', []):
+            if run.get('run_id') != run_dir.name:
+                continue
+            paths = run.get('paths') or {}
+            for role, digest in digests.items():
+                old = paths.get(role)
+                if not old:
+                    continue
+                sep = '\\' if '\\' in old else '/'
+                parts = old.split(sep)
+                if len(parts) < 4 or parts[-3:] != ['runs', run_dir.name, f'{role}.png']:
+                    continue
+                paths[role] = sep.join(parts[:-4] + [OBJECTS_DIR, digest[:2], f'{digest}.png'])
+                changed += 1
+        if changed and not dry_run:
+            _write_atomic(index_path, json.dumps(index, indent=2).encode('utf-8'))
+        return changed
+
+    def migrate(self, remove_files: bool = True, dry_run: bool = False) -> Dict[str, Any]:
+        """Move legacy per-run images into the store and repoint index.json `paths`.
+
+        Runs already in the store still get their index entries rewritten,
+        so a tree migrated before the index was updated can be re-run.
+        """
+        summary = dict(runs=0, files=0, legacy_bytes=0, objects_written=0, bytes_written=0, index_paths=0)
+        start = dict(self._stats)
+        seen = set()
+        for run_dir in self.iter_runs():
+            files = {role: run_dir / f'{role}.png' for role in IMAGE_ROLES
+                     if (run_dir / f'{role}.png').exists()}
+            digests = {role: e['digest'] for role, e in self.read_manifest(run_dir).items()}
+            if files:
+                summary['runs'] += 1
+                summary['files'] += len(files)
+                summary['legacy_bytes'] += sum(p.stat().st_size for p in files.values())
+            if dry_run:
+                for role, p in files.items():
+                    img = cv.imread(str(p), cv.IMREAD_UNCHANGED)
+                    digest = digests[role] = image_digest(img)
+                    if digest not in seen and not self.has(digest):
+                        summary['objects_written'] += 1
+                        summary['bytes_written'] += p.stat().st_size
+                    seen.add(digest)
+            elif files:
+                digests.update((role, e['digest']) for role, e in self.write_run(run_dir, files).items())
+            summary['index_paths'] += self._index_paths(run_dir, digests, dry_run)
+            if files and remove_files and not dry_run:
+                for p in files.values():
+                    p.unlink()
+        if not dry_run:
+            summary['objects_written'] = self._stats['written'] - start['written']
+            summary['bytes_written'] = self._stats['bytes_written'] - start['bytes_written']
+        return summary
+
+    def referenced(self) -> set:
+        refs = set()
+        for run_dir in self.iter_runs():
+            refs.update(e['digest'] for e in self.read_manifest(run_dir).values())
+        return refs
+
+    def gc(self, dry_run: bool = False, min_age_s: float = GC_MIN_AGE_S) -> Dict[str, Any]:
+        """Delete objects (and stale temp files) no run manifest references.
+
+        Objects newer than min_age_s are kept: a writer stores objects before
+        it saves the manifest that references them.
+        """
+        refs = self.referenced()
+        now = time.time()
+        removed: List[str] = []
+        freed = 0
+        if not self.objects.exists():
+            return dict(removed=removed, bytes_freed=0, referenced=len(refs))
+        for path in sorted(self.objects.glob('*/*')):
+            digest = path.name.split('.')[0] if not path.name.startswith('.') else None
+            if digest in refs or now - path.stat().st_mtime < min_age_s:
+                continue
+            freed += path.stat().st_size
+            removed.append(path.relative_to(self.root).as_posix())
+            if not dry_run:
+                path.unlink()
+        return dict(removed=removed, bytes_freed=freed, referenced=len(refs))
+
+    def stats(self) -> Dict[str, Any]:
+        objects = list(self.objects.glob('*/*.png')) if self.objects.exists() else []
+        legacy = [run_dir / f'{role}.png' for run_dir in self.iter_runs() for role in IMAGE_ROLES
+                  if (run_dir / f'{role}.png').exists()]
+        refs = sum(len(self.read_manifest(r)) for r in self.iter_runs())
+        return {
+            **self._stats,
+            'objects': len(objects),
+            'object_bytes': sum(p.stat().st_size for p in objects),
+            'references': refs,
+            'legacy_files': len(legacy),
+            'legacy_bytes': sum(p.stat().st_size for p in legacy),
+        }
+
+
+def _cli() -> int:
+    parser = argparse.ArgumentParser(description="Content-addressed inspection artifact store")
+    parser.add_argument("command", choices=["migrate", "gc", "stats"])
+    parser.add_argument("--root", default="inspections", help="Inspections root")
+    parser.add_argument("--keep-files", action="store_true", help="migrate: keep the per-run image files")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change")
+    parser.add_argument("--min-age-hours", type=float, default=GC_MIN_AGE_S / 3600.0,
+                        help="gc: keep unreferenced objects newer than this")
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.root)
+    if args.command == "migrate":
+        result = store.migrate(remove_files=not args.keep_files, dry_run=args.dry_run)
+    elif args.command == "gc":
+        result = store.gc(dry_run=args.dry_run, min_age_s=args.min_age_hours * 3600.0)
+    else:
+        result = store.stats()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
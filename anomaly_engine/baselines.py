@@ -0,0 +1,435 @@
+"""Baseline registry: register a transformer baseline once, reuse its features.
+
+A registered baseline lives in the registry directory (`baselines/` by
+default) as
+
+    <id>.png             the decoded baseline image (source of truth)
+    <id>.json            metadata: version, feature_version, sha256, ROI, timestamps
+                         and the last converged ECC warp per view and profile
+    <id>.features.npz    Canny edges, 256-bin histograms and ORB points/descriptors,
+                         each for the full frame and for the ROI crop
+    <id>.lab.npy         float64 LAB of the full frame (memory-mapped on load)
+
+Features are computed exactly as the pipeline computes them from the image, so
+detecting against a registered baseline gives the same result as passing the
+image path. `version` counts re-registrations of an id; `feature_version`
+tracks the feature format, and stale features are rebuilt on load. Features
+of baselines idle for longer than a cutoff can be evicted from disk; the image
+and metadata stay, and the features are rebuilt on next use. Loaded features
+are kept in a small in-memory LRU.
+
+Detections do no metadata I/O beyond a stat: `lastUsedAt` and newly
+converged warps are kept in memory and written back at most every
+FLUSH_INTERVAL_S, when a baseline leaves the LRU, and on `flush`. A cached
+baseline is checked against re-registration by another process through the
+mtime and size of its metadata file; the JSON is only re-read when they
+changed.
+
+With seed_warps (off by default), each detection against a registered
+baseline starts ECC from the warp the previous one with the same view and
+profile converged to (see `alignment.ecc_align`): fixed-mount cameras
+reproduce nearly the same offset from one inspection to the next. The seeded
+result is kept only if its correlation reaches the stored one; otherwise the
+identity search runs as without seeding.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+import cv2 as cv
+import numpy as np
+
+from .alignment import orb_keypoints
+from .io_utils import read_bgr, to_gray
+from .color_metrics import to_lab
+from .image_stats import hist256
+from .profiles import PROFILES
+from .roi import detect_roi
+
+FEATURE_VERSION = 2       # 2: grid-bucketed ORB (alignment.orb_keypoints)
+CACHE_SIZE = 16          # baselines kept decoded in memory
+FLUSH_INTERVAL_S = 30.0  # pending lastUsedAt / warps are written at most this often
+
+_ID_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+
+@dataclass
+class BaselineFeatures:
+    """Everything the pipeline derives from a baseline before seeing a maintenance image.
+
+    Per-view entries are keyed 'full' or 'roi' (the frame cropped to `roi`).
+    """
+    baseline_id: str
+    version: int
+    bgr: np.ndarray
+    gray: np.ndarray
+    roi: Tuple[int, int, int, int]
+    lab: np.ndarray | None                            # full frame, float64 (memmap); None = not kept
+    edges: Dict[str, np.ndarray] = field(default_factory=dict)
+    hist: Dict[str, np.ndarray] = field(default_factory=dict)
+    orb: Dict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]] = field(default_factory=dict)
+    warps: Dict[str, Tuple[np.ndarray, float]] = field(default_factory=dict)  # warp_key -> (2x3 warp, ECC cc)
+    on_warp: Callable[['BaselineFeatures', str], None] | None = field(default=None, repr=False)
+
+    def view(self, use_roi: bool) -> str:
+        return 'roi' if use_roi else 'full'
+
+    def crop(self, arr, view: str):
+        if view == 'full':
+            return arr
+        x, y, w, h = self.roi
+        return arr[y:y + h, x:x + w]
+
+    def seed_warp(self, view: str, profile: str) -> Tuple[np.ndarray, float] | None:
+        """Last converged (warp, cc) for view and profile; None unless seeding is on (on_warp set)."""
+        if self.on_warp is None:
+            return None
+        return self.warps.get(warp_key(view, profile))
+
+    def remember_warp(self, view: str, profile: str, warp: np.ndarray, cc: float,
+                      seeded: bool = False) -> None:
+        """Store a converged warp; a seeded one only if its cc is not below the stored cc.
+
+        The stored cc is the acceptance reference of the next seeded run, so it
+        comes from an identity convergence or from a seeded run that matched or
+        beat it, and cannot drift down from one accepted seed to the next.
+        """
+        if self.on_warp is None:
+            return
+        key = warp_key(view, profile)
+        if seeded and key in self.warps and cc < self.warps[key][1]:
+            return
+        self.warps[key] = (warp, cc)
+        self.on_warp(self, key)
+
+
+def warp_key(view: str, profile: str) -> str:
+    """Key of a stored warp: ECC budgets and ROI crops differ, so each pair seeds only itself."""
+    return f'{view}/{profile}'
+
+
+def _compute(bgr, orb_budgets=None, lab: bool = True) -> Dict[str, Any]:
+    gray = to_gray(bgr)
+    roi = detect_roi(bgr)
+    x, y, w, h = roi
+    views = {'full': gray, 'roi': gray[y:y + h, x:x + w]}
+    arrays = {}
+    for view, g in views.items():
+        arrays[f'edges_{view}'] = cv.Canny(g, 50, 150)
+        arrays[f'hist_{view}'] = hist256(g)
+        for n in orb_budgets or sorted({p.orb_features for p in PROFILES.values()}):
+            arrays[f'orbpts_{view}_{n}'], arrays[f'orbdesc_{view}_{n}'] = orb_keypoints(g, n)
+    return dict(gray=gray, roi=roi, arrays=arrays, lab=to_lab(bgr) if lab else None)
+
+
+def _unpack(feats: BaselineFeatures, arrays: Dict[str, np.ndarray]) -> BaselineFeatures:
+    for key, arr in arrays.items():
+        kind, view, *rest = key.split('_')
+        if kind == 'edges':
+            feats.edges[view] = arr
+        elif kind == 'hist':
+            feats.hist[view] = arr
+        elif kind == 'orbpts':
+            n = int(rest[0])
+            feats.orb[(view, n)] = (arr, arrays[f'orbdesc_{view}_{n}'])
+    return feats
+
+
+def compute_features(bgr, baseline_id: str = '', orb_budgets=None, lab: bool = True) -> BaselineFeatures:
+    """In-memory features of an unregistered baseline image (nothing is written).
+
+    orb_budgets limits the ORB keypoints to those feature budgets (default:
+    every profile's); lab=False skips the full-frame LAB, which only pays off
+    when the colour difference runs without the change prefilter.
+    """
+    computed = _compute(bgr, orb_budgets, lab)
+    feats = BaselineFeatures(baseline_id=baseline_id, version=0, bgr=bgr,
+                             gray=computed['gray'], roi=computed['roi'], lab=computed['lab'])
+    return _unpack(feats, computed['arrays'])
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _replace_with(path: Path, write) -> None:
+    """Write through a temp file in the same directory, then rename over path."""
+    tmp = path.with_name(f'.{path.stem}.tmp{path.suffix}')
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _save_npz(path: Path, arrays) -> None:
+    def write(tmp):
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+    _replace_with(path, write)
+
+
+def _save_npy(path: Path, arr) -> None:
+    def write(tmp):
+        with open(tmp, 'wb') as f:
+            np.save(f, arr)
+    _replace_with(path, write)
+
+
+class BaselineRegistry:
+    def __init__(self, root, cache_size: int = CACHE_SIZE, seed_warps: bool = False):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.cache_size = cache_size
+        self.seed_warps = seed_warps
+        self._cache: "OrderedDict[str, BaselineFeatures]" = OrderedDict()
+        self._stamps: Dict[str, Tuple[int, int] | None] = {}   # id -> metadata (mtime_ns, size) last seen
+        self._pending: Dict[str, Dict[str, Any]] = {}          # id -> unwritten lastUsedAt / warps
+        self._flushed_at = time.monotonic()
+        self._lock = threading.RLock()
+
+    # -- paths / metadata --------------------------------------------------
+    @staticmethod
+    def valid_id(baseline_id: str) -> bool:
+        return bool(_ID_RE.match(baseline_id or ''))
+
+    def _check_id(self, baseline_id: str) -> None:
+        if not self.valid_id(baseline_id):
+            raise ValueError(f"Invalid baseline id '{baseline_id}'")
+
+    def image_path(self, baseline_id: str) -> Path:
+        return self.root / f'{baseline_id}.png'
+
+    def _meta_path(self, baseline_id: str) -> Path:
+        return self.root / f'{baseline_id}.json'
+
+    def _features_path(self, baseline_id: str) -> Path:
+        return self.root / f'{baseline_id}.features.npz'
+
+    def _lab_path(self, baseline_id: str) -> Path:
+        return self.root / f'{baseline_id}.lab.npy'
+
+    def _stamp(self, baseline_id: str) -> Tuple[int, int] | None:
+        try:
+            st = self._meta_path(baseline_id).stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read_metadata(self, baseline_id: str) -> Dict[str, Any] | None:
+        path = self._meta_path(baseline_id)
+        if not path.exists():
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _apply_pending(meta: Dict[str, Any], pending: Dict[str, Any]) -> None:
+        if 'lastUsedAt' in pending:
+            meta['lastUsedAt'] = max(meta.get('lastUsedAt', ''), pending['lastUsedAt'])
+        if pending.get('warps') and meta.get('version') == pending['version']:
+            meta.setdefault('warps', {}).update(pending['warps'])
+
+    def metadata(self, baseline_id: str) -> Dict[str, Any] | None:
+        """Stored metadata, including the lastUsedAt / warps not written yet."""
+        self._check_id(baseline_id)
+        with self._lock:
+            meta = self._read_metadata(baseline_id)
+            if meta is not None and baseline_id in self._pending:
+                self._apply_pending(meta, self._pending[baseline_id])
+            return meta
+
+    def _save_metadata(self, meta: Dict[str, Any]) -> None:
+        def write(tmp):
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+        _replace_with(self._meta_path(meta['id']), write)
+        self._stamps[meta['id']] = self._stamp(meta['id'])
+
+    def flush(self, ids=None) -> None:
+        """Write pending lastUsedAt stamps and warps (of ids, default all) to the metadata files."""
+        with self._lock:
+            for baseline_id in list(self._pending if ids is None else ids):
+                pending = self._pending.pop(baseline_id, None)
+                meta = self._read_metadata(baseline_id) if pending else None
+                if meta is not None:     # None: deleted meanwhile
+                    self._apply_pending(meta, pending)
+                    self._save_metadata(meta)
+            if ids is None:
+                self._flushed_at = time.monotonic()
+
+    def list_baselines(self) -> List[Dict[str, Any]]:
+        out = []
+        for path in sorted(self.root.glob('*.json')):
+            meta = self.metadata(path.stem) if self.valid_id(path.stem) else None
+            if meta is not None:
+                out.append(meta)
+        return out
+
+    def exists(self, baseline_id: str) -> bool:
+        return self.valid_id(baseline_id) and self.image_path(baseline_id).exists()
+
+    # -- registration --------------------------------------------------------
+    def register(self, image_path, baseline_id: str | None = None) -> Dict[str, Any]:
+        """Ingest an image file as a baseline (new id, or a new version of an existing one)."""
+        baseline_id = baseline_id or str(uuid.uuid4())
+        self._check_id(baseline_id)
+        bgr = read_bgr(str(image_path))
+        with self._lock:
+            previous = self.metadata(baseline_id)
+            target = self.image_path(baseline_id)
+            if Path(image_path).resolve() != target.resolve():
+                _replace_with(target, lambda tmp: cv.imwrite(str(tmp), bgr))
+            meta = {
+                'id': baseline_id,
+                'version': (previous['version'] + 1) if previous else 1,
+                'createdAt': previous['createdAt'] if previous else _now(),
+            }
+            self._cache.pop(baseline_id, None)
+            return self._build(baseline_id, bgr, meta)
+
+    def _build(self, baseline_id: str, bgr, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """(Re)compute and persist features for the stored image."""
+        feats = _compute(bgr)
+        _save_npz(self._features_path(baseline_id), feats['arrays'])
+        _save_npy(self._lab_path(baseline_id), feats['lab'])
+        with open(self.image_path(baseline_id), 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        meta.update({
+            'featureVersion': FEATURE_VERSION,
+            'sha256': sha256,
+            'width': int(bgr.shape[1]),
+            'height': int(bgr.shape[0]),
+            'roi': list(feats['roi']),
+            'updatedAt': _now(),
+            'lastUsedAt': meta.get('lastUsedAt') or _now(),
+        })
+        self._save_metadata(meta)
+        return meta
+
+    # -- loading ---------------------------------------------------------------
+    def get(self, baseline_id: str, touch: bool = True) -> BaselineFeatures:
+        """Features for a baseline; raises KeyError when the id is unknown.
+
+        A stored image without metadata (e.g. a reference image dropped into
+        the directory) is registered on first use; missing or stale features
+        are rebuilt.
+        """
+        self._check_id(baseline_id)
+        with self._lock:
+            feats = self._cache.get(baseline_id)
+            if feats is not None and self._stamp(baseline_id) != self._stamps.get(baseline_id):
+                # Written by another process since: re-registered or deleted?
+                meta = self._read_metadata(baseline_id)
+                self._stamps[baseline_id] = self._stamp(baseline_id)
+                if meta is None or meta.get('version') != feats.version:
+                    feats = None
+            if feats is None:
+                feats = self._load(baseline_id)
+                self._cache[baseline_id] = feats
+                while len(self._cache) > self.cache_size:
+                    self.flush([self._cache.popitem(last=False)[0]])
+            self._cache.move_to_end(baseline_id)
+            if touch:
+                self._pending.setdefault(baseline_id, {})['lastUsedAt'] = _now()
+            if time.monotonic() - self._flushed_at >= FLUSH_INTERVAL_S:
+                self.flush()
+            return feats
+
+    def _load(self, baseline_id: str) -> BaselineFeatures:
+        if not self.image_path(baseline_id).exists():
+            raise KeyError(baseline_id)
+        bgr = read_bgr(str(self.image_path(baseline_id)))
+        meta = self.metadata(baseline_id)
+        self._stamps[baseline_id] = self._stamp(baseline_id)
+        if meta is None:
+            meta = self._build(baseline_id, bgr, {'id': baseline_id, 'version': 1, 'createdAt': _now()})
+        elif (meta.get('featureVersion') != FEATURE_VERSION
+              or not self._features_path(baseline_id).exists()
+              or not self._lab_path(baseline_id).exists()):
+            meta = self._build(baseline_id, bgr, meta)
+
+        with np.load(self._features_path(baseline_id)) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+        feats = BaselineFeatures(
+            baseline_id=baseline_id,
+            version=int(meta['version']),
+            bgr=bgr,
+            gray=to_gray(bgr),
+            roi=tuple(int(v) for v in meta['roi']),
+            lab=np.load(self._lab_path(baseline_id), mmap_mode='r'),
+        )
+        if self.seed_warps:
+            feats.on_warp = self._save_warp
+            for key, entry in meta.get('warps', {}).items():
+                if '/' in key:   # warps stored per view only, before profiles were part of the key
+                    feats.warps[key] = (np.array(entry['matrix'], np.float32), float(entry['cc']))
+        return _unpack(feats, arrays)
+
+    def _save_warp(self, feats: BaselineFeatures, key: str) -> None:
+        """Queue the warp for the next flush; it is dropped if the baseline is re-registered first."""
+        warp, cc = feats.warps[key]
+        with self._lock:
+            pending = self._pending.setdefault(feats.baseline_id, {})
+            if pending.get('version') != feats.version:
+                pending['warps'] = {}
+            pending['version'] = feats.version
+            pending['warps'][key] = {'matrix': warp.tolist(), 'cc': cc, 'updatedAt': _now()}
+
+    def warm_load(self, limit: int | None = None) -> List[str]:
+        """Load the most recently used baselines into memory (building any missing features)."""
+        ids = [p.stem for p in self.root.glob('*.png') if self.valid_id(p.stem)]
+        last_used = {}
+        for baseline_id in ids:
+            meta = self.metadata(baseline_id) or {}
+            last_used[baseline_id] = meta.get('lastUsedAt', '')
+        ids.sort(key=lambda i: last_used[i], reverse=True)
+        loaded = []
+        for baseline_id in ids[:limit or self.cache_size]:
+            self.get(baseline_id, touch=False)
+            loaded.append(baseline_id)
+        return loaded
+
+    # -- eviction ----------------------------------------------------------------
+    def delete(self, baseline_id: str) -> bool:
+        """Remove a baseline and everything derived from it."""
+        self._check_id(baseline_id)
+        with self._lock:
+            self._cache.pop(baseline_id, None)
+            self._pending.pop(baseline_id, None)
+            self._stamps.pop(baseline_id, None)
+            removed = False
+            for path in (self.image_path(baseline_id), self._meta_path(baseline_id),
+                         self._features_path(baseline_id), self._lab_path(baseline_id)):
+                if path.exists():
+                    path.unlink()
+                    removed = True
+            return removed
+
+    def evict_unused(self, max_idle_days: float) -> List[str]:
+        """Drop cached and on-disk features of baselines unused for max_idle_days.
+
+        Images and metadata are kept; features are rebuilt on next use.
+        """
+        cutoff = (datetime.utcnow() - timedelta(days=max_idle_days)).isoformat()
+        evicted = []
+        with self._lock:
+            for meta in self.list_baselines():
+                if meta.get('lastUsedAt', '') >= cutoff:
+                    continue
+                baseline_id = meta['id']
+                self._cache.pop(baseline_id, None)
+                for path in (self._features_path(baseline_id), self._lab_path(baseline_id)):
+                    if path.exists():
+                        path.unlink()
+                        evicted.append(baseline_id)
+        return sorted(set(evicted))
+
+    def cached_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._cache)
@@ -0,0 +1,173 @@
+"""Reusable full-frame array pool.
+
+Every detection used to allocate fresh full-size arrays (grayscale, warped
+BGR, HSV, deltaE, masks, skeleton). In a long-lived worker that churns the
+allocator and lets RSS drift. A `BufferPool` hands out arrays keyed by
+(shape, dtype) for the duration of a session and takes them back when the
+session ends; engine functions write into them through their `dst=` / `out=`
+parameters.
+
+Arrays from `take` are uninitialised (like np.empty) and must not outlive the
+session. Each thread gets its own pool from `worker_pool()`, so concurrent
+requests never share a buffer; `pool_stats()` sums the pools of every
+live thread of the process.
+
+A pool keeps at most DEFAULT_POOL_BYTES of free arrays (about the working set
+of one 1080p detection), and the `worker_pool()`s of a process together keep
+at most the process cap (`set_process_cap`, default PROCESS_POOL_BYTES): a
+release that takes the total over it evicts from its own pool first, then
+from the other threads' pools, largest first. Retained memory therefore no
+longer grows with the number of threads that ever ran a detection.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Tuple
+import threading
+import weakref
+import numpy as np
+
+DEFAULT_POOL_BYTES = 256 * 1024 * 1024   # retained (free) bytes per pool
+PROCESS_POOL_BYTES = 512 * 1024 * 1024   # retained bytes of all worker_pool()s together
+
+
+class BufferPool:
+    def __init__(self, max_bytes: int = DEFAULT_POOL_BYTES):
+        self.max_bytes = int(max_bytes)
+        self._free: "OrderedDict[Tuple, List[np.ndarray]]" = OrderedDict()
+        self._leased: List[np.ndarray] = []
+        self._free_bytes = 0
+        self._lock = threading.Lock()   # other threads may evict, see _trim_process
+        self._stats = dict(takes=0, hits=0, misses=0, bytes_reused=0,
+                           bytes_allocated=0, evicted_bytes=0, sessions=0)
+
+    def take(self, shape, dtype=np.uint8) -> np.ndarray:
+        """Lease an uninitialised array of the given shape and dtype."""
+        key = (tuple(int(s) for s in shape), np.dtype(dtype).str)
+        self._stats['takes'] += 1
+        with self._lock:
+            free = self._free.get(key)
+            arr = free.pop() if free else None
+            if arr is not None:
+                self._free.move_to_end(key)
+                self._free_bytes -= arr.nbytes
+        if arr is not None:
+            self._stats['hits'] += 1
+            self._stats['bytes_reused'] += arr.nbytes
+        else:
+            arr = np.empty(key[0], dtype=dtype)
+            self._stats['misses'] += 1
+            self._stats['bytes_allocated'] += arr.nbytes
+        self._leased.append(arr)
+        return arr
+
+    def release(self) -> None:
+        """Return every leased array; evict least recently used shapes over max_bytes."""
+        with self._lock:
+            for arr in self._leased:
+                key = (arr.shape, arr.dtype.str)
+                self._free.setdefault(key, []).append(arr)
+                self._free.move_to_end(key)
+                self._free_bytes += arr.nbytes
+            self._leased.clear()
+            self._evict(self._free_bytes - self.max_bytes)
+        if self in _pools:
+            _trim_process(self)
+
+    def _evict(self, nbytes: int) -> int:
+        """Drop least recently used shapes until nbytes are freed; caller holds _lock."""
+        freed = 0
+        while freed < nbytes and self._free:
+            _, arrs = self._free.popitem(last=False)
+            for arr in arrs:
+                freed += arr.nbytes
+        self._free_bytes -= freed
+        self._stats['evicted_bytes'] += freed
+        return freed
+
+    def shrink(self, nbytes: int) -> int:
+        """Evict at least nbytes of free arrays (if held); returns the bytes freed."""
+        with self._lock:
+            return self._evict(nbytes)
+
+    @contextmanager
+    def session(self):
+        """Lease arrays for one request; all of them come back on exit."""
+        self._stats['sessions'] += 1
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._free.clear()
+            self._free_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self._stats)
+        s['hit_rate'] = s['hits'] / s['takes'] if s['takes'] else 0.0
+        s['pooled_bytes'] = self._free_bytes
+        s['leased_bytes'] = sum(a.nbytes for a in self._leased)
+        s['max_bytes'] = self.max_bytes
+        return s
+
+
+_local = threading.local()
+_pools: "weakref.WeakSet[BufferPool]" = weakref.WeakSet()
+_pools_lock = threading.Lock()
+_process_cap = PROCESS_POOL_BYTES
+
+
+def set_process_cap(max_bytes: int) -> None:
+    """Cap the free bytes all `worker_pool()`s of this process keep together.
+
+    A single pool keeps no more than the cap either. Applies from the next
+    release of any pool.
+    """
+    global _process_cap
+    _process_cap = max(0, int(max_bytes))
+
+
+def _trim_process(pool: BufferPool) -> None:
+    with _pools_lock:
+        pools = list(_pools)
+    over = sum(p._free_bytes for p in pools) - _process_cap
+    if over <= 0:
+        return
+    others = sorted((p for p in pools if p is not pool), key=lambda p: p._free_bytes, reverse=True)
+    for p in [pool] + others:
+        over -= p.shrink(over)
+        if over <= 0:
+            break
+
+
+def worker_pool() -> BufferPool:
+    """The calling thread's pool (created on first use)."""
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = _local.pool = BufferPool(min(DEFAULT_POOL_BYTES, _process_cap))
+        with _pools_lock:
+            _pools.add(pool)
+    return pool
+
+
+def merge_stats(stats: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Counters of several `BufferPool.stats()` summed; hit_rate recomputed, pools = how many."""
+    out: Dict[str, Any] = {'pools': 0}
+    for s in stats:
+        out['pools'] += s.get('pools', 1)
+        for key, value in s.items():
+            if key not in ('hit_rate', 'pools'):
+                out[key] = out.get(key, 0) + value
+    for key in ('sessions', 'takes', 'hits', 'misses', 'bytes_reused', 'bytes_allocated',
+                'evicted_bytes', 'pooled_bytes', 'leased_bytes', 'max_bytes'):
+        out.setdefault(key, 0)
+    out['hit_rate'] = out['hits'] / out['takes'] if out['takes'] else 0.0
+    return out
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Summed stats of the `worker_pool()` of every live thread in this process."""
+    with _pools_lock:
+        pools = list(_pools)
+    return merge_stats(p.stats() for p in pools)
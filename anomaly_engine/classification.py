@@ -1,10 +1,54 @@
 """Rule-based blob classification with topology and absolute heat promotions.
-No functional changes.
+
+The rule constants live at module level and are bundled in `ClassifierParams`
+so offline sweeps (see `replay`) can vary them. `classify_blobs` evaluates the
+same rules vectorized over many blobs from precomputed `blob_features`.
 """
+from dataclasses import dataclass
 from typing import Dict, Any, List, Tuple
 import numpy as np
 from .topology import wire_hot_coverage, is_near_joint
 
+# Colour bands on the blob's mean OpenCV hue (0..179)
+RED_HUE_MAX = 10          # red: h <= 10 ...
+RED_WRAP_MIN = 170        # ... or h >= 170
+ORANGE_HUE = (11, 25)
+YELLOW_HUE = (26, 35)
+ELONG_THR = 3.0           # elongated blobs count as potential at mean deltaE >= t_pot
+
+# Topology
+JOINT_RADIUS = 8          # centroid within this distance of a skeleton node is "near joint"
+COVER_EXPAND = 10         # bbox margin for wire coverage
+FULL_COVER_THR = 0.60     # hot coverage of the wire for FullWireOverload
+POINT_COVER_THR = 0.25    # below this coverage (with a cool remainder) it is a point
+REST_COOL_THR = 0.60      # cool fraction of the wire band around a point
+
+# Absolute-heat promotion of blobs the colour rules left Normal
+ABS_V_THR = 200.0         # mean V that promotes a near-joint blob
+ABS_FRAC_THR = 0.20       # absolute-hot fraction of the bbox (joint / point)
+ABS_FRAC_WIRE_THR = 0.40  # absolute-hot fraction of the bbox (full wire)
+
+LABELS = ('Normal', 'Potentially Faulty', 'Faulty')
+SUBTYPES = ('None', 'LooseJoint', 'PointOverload', 'FullWireOverload')
+
+
+@dataclass(frozen=True)
+class ClassifierParams:
+    red_hue_max: float = RED_HUE_MAX
+    red_wrap_min: float = RED_WRAP_MIN
+    orange_hue: Tuple[float, float] = ORANGE_HUE
+    yellow_hue: Tuple[float, float] = YELLOW_HUE
+    elong_thr: float = ELONG_THR
+    full_cover_thr: float = FULL_COVER_THR
+    point_cover_thr: float = POINT_COVER_THR
+    rest_cool_thr: float = REST_COOL_THR
+    abs_v_thr: float = ABS_V_THR
+    abs_frac_thr: float = ABS_FRAC_THR
+    abs_frac_wire_thr: float = ABS_FRAC_WIRE_THR
+
+
+DEFAULT_PARAMS = ClassifierParams()
+
 
 def classify_blob_enhanced(
     b: Dict[str,Any],
@@ -13,26 +57,29 @@ def classify_blob_enhanced(
     skel=None,
     joints: List[Tuple[int,int]] = None,
     hot_mask=None,
-    abs_hot_mask=None
+    abs_hot_mask=None,
+    params: ClassifierParams = DEFAULT_PARAMS
 ):
     """Returns (label, subtype, confidence, severity)"""
+    p = params
     h,s,v = b['mean_hsv']
     elong = b['elongation']
     peak, mean = b['peak_deltaE'], b['mean_deltaE']
 
     # Color bands (OpenCV Hue 0..179)
-    is_red_or_orange = (h <= 10 or h >= 170 or (11 <= h <= 25))
-    is_yellowish     = (26 <= h <= 35)
+    is_red_or_orange = (h <= p.red_hue_max or h >= p.red_wrap_min
+                        or (p.orange_hue[0] <= h <= p.orange_hue[1]))
+    is_yellowish     = (p.yellow_hue[0] <= h <= p.yellow_hue[1])
 
     faulty = is_red_or_orange and (peak >= dE_thr_fault)
-    potential = (is_yellowish and peak >= dE_thr_pot) or ((elong >= 3.0) and mean >= dE_thr_pot)
+    potential = (is_yellowish and peak >= dE_thr_pot) or ((elong >= p.elong_thr) and mean >= dE_thr_pot)
 
     near_joint = False
     coverage = 0.0
     cool_frac = 0.0
     if skel is not None and hot_mask is not None and joints is not None:
-        near_joint = is_near_joint(b['centroid'], joints, r=8)
-        coverage, hot_len, wire_len, cool_frac = wire_hot_coverage(b['bbox'], skel, hot_mask, expand=10)
+        near_joint = is_near_joint(b['centroid'], joints, r=JOINT_RADIUS)
+        coverage, hot_len, wire_len, cool_frac = wire_hot_coverage(b['bbox'], skel, hot_mask, expand=COVER_EXPAND)
 
     subtype = 'None'
     label = 'Normal'
@@ -42,13 +89,10 @@ def classify_blob_enhanced(
         if faulty: label = 'Faulty'
         elif potential: label = 'Potentially Faulty'
     else:
-        FULL_COVER_THR = 0.60
-        POINT_COVER_THR = 0.25
-        REST_COOL_THR = 0.60
-        if coverage >= FULL_COVER_THR:
+        if coverage >= p.full_cover_thr:
             subtype = 'FullWireOverload'
             label = 'Potentially Faulty' if (faulty or potential) else 'Normal'
-        elif (coverage < POINT_COVER_THR and cool_frac >= REST_COOL_THR):
+        elif (coverage < p.point_cover_thr and cool_frac >= p.rest_cool_thr):
             subtype = 'PointOverload'
             if faulty: label = 'Faulty'
             elif potential: label = 'Potentially Faulty'
@@ -58,15 +102,13 @@ def classify_blob_enhanced(
             elif potential: label = 'Potentially Faulty'
 
     if label == 'Normal' and abs_hot_mask is not None:
-        x,y,w,h_box = b['bbox']
-        abs_roi = abs_hot_mask[y:y+h_box, x:x+w]
-        abs_frac = float(abs_roi.sum()) / float(max(1, w*h_box) * 255.0)
+        abs_frac = _abs_hot_fraction(b['bbox'], abs_hot_mask)
         mean_v = b['mean_hsv'][2]
-        if near_joint and (mean_v >= 200 or abs_frac >= 0.20):
+        if near_joint and (mean_v >= p.abs_v_thr or abs_frac >= p.abs_frac_thr):
             label, subtype = 'Faulty', 'LooseJoint'
-        elif (coverage < 0.25 and cool_frac >= 0.60 and abs_frac >= 0.20):
+        elif (coverage < p.point_cover_thr and cool_frac >= p.rest_cool_thr and abs_frac >= p.abs_frac_thr):
             label, subtype = 'Faulty', 'PointOverload'
-        elif coverage >= 0.60 and abs_frac >= 0.40:
+        elif coverage >= p.full_cover_thr and abs_frac >= p.abs_frac_wire_thr:
             label, subtype = 'Potentially Faulty', 'FullWireOverload'
 
     color_bonus = 0.15 if is_red_or_orange else (0.05 if is_yellowish else 0.0)
@@ -80,6 +122,81 @@ def classify_blob_enhanced(
     return label, subtype, conf, sev
 
 
+def skeleton_regions(props) -> List[Tuple[int, int, int, int]]:
+    """Where the rules read the skeleton: each blob's bbox grown by COVER_EXPAND.
+
+    Joints count within JOINT_RADIUS of the centroid, which lies inside the
+    bbox, so the larger of the two margins covers both.
+    """
+    pad = max(COVER_EXPAND, JOINT_RADIUS)
+    return [(x - pad, y - pad, w + 2*pad, h + 2*pad) for x, y, w, h in (b['bbox'] for b in props)]
+
+
+def _abs_hot_fraction(bbox, abs_hot_mask) -> float:
+    x,y,w,h_box = bbox
+    abs_roi = abs_hot_mask[y:y+h_box, x:x+w]
+    return float(abs_roi.sum()) / float(max(1, w*h_box) * 255.0)
+
+
+def blob_features(props, skel, joints, hot_mask, abs_hot_mask) -> Dict[str, np.ndarray]:
+    """Parameter-independent inputs of the rules for a list of blob_props, as arrays."""
+    n = len(props)
+    feats = {k: np.empty(n, np.float64) for k in
+             ('h', 'v', 'peak', 'mean', 'elong', 'coverage', 'cool_frac', 'abs_frac')}
+    feats['near_joint'] = np.empty(n, bool)
+    for i, b in enumerate(props):
+        feats['h'][i] = b['mean_hsv'][0]
+        feats['v'][i] = b['mean_hsv'][2]
+        feats['peak'][i] = b['peak_deltaE']
+        feats['mean'][i] = b['mean_deltaE']
+        feats['elong'][i] = b['elongation']
+        feats['near_joint'][i] = is_near_joint(b['centroid'], joints, r=JOINT_RADIUS)
+        coverage, _, _, cool_frac = wire_hot_coverage(b['bbox'], skel, hot_mask, expand=COVER_EXPAND)
+        feats['coverage'][i] = coverage
+        feats['cool_frac'][i] = cool_frac
+        feats['abs_frac'][i] = _abs_hot_fraction(b['bbox'], abs_hot_mask)
+    return feats
+
+
+def classify_blobs(feats: Dict[str, np.ndarray], dE_thr_fault, dE_thr_pot,
+                   params: ClassifierParams = DEFAULT_PARAMS) -> Tuple[np.ndarray, np.ndarray]:
+    """classify_blob_enhanced over feature arrays (thresholds may be per-blob arrays).
+
+    Returns (label, subtype) as int8 indices into LABELS / SUBTYPES.
+    """
+    p = params
+    h = feats['h']
+    red_or_orange = (h <= p.red_hue_max) | (h >= p.red_wrap_min) | \
+        ((h >= p.orange_hue[0]) & (h <= p.orange_hue[1]))
+    yellow = (h >= p.yellow_hue[0]) & (h <= p.yellow_hue[1])
+    faulty = red_or_orange & (feats['peak'] >= dE_thr_fault)
+    potential = (yellow & (feats['peak'] >= dE_thr_pot)) | \
+        ((feats['elong'] >= p.elong_thr) & (feats['mean'] >= dE_thr_pot))
+    colour_label = np.where(faulty, 2, np.where(potential, 1, 0)).astype(np.int8)
+
+    near = feats['near_joint']
+    full = ~near & (feats['coverage'] >= p.full_cover_thr)
+    point = ~near & ~full & (feats['coverage'] < p.point_cover_thr) & (feats['cool_frac'] >= p.rest_cool_thr)
+    other = ~near & ~full & ~point
+
+    label = np.where(full, np.minimum(colour_label, 1), colour_label).astype(np.int8)
+    subtype = np.select([near, full, point, other & (colour_label > 0)], [1, 3, 2, 2], 0).astype(np.int8)
+
+    normal = label == 0
+    abs_frac = feats['abs_frac']
+    promo_joint = normal & near & ((feats['v'] >= p.abs_v_thr) | (abs_frac >= p.abs_frac_thr))
+    promo_point = normal & ~promo_joint & (feats['coverage'] < p.point_cover_thr) & \
+        (feats['cool_frac'] >= p.rest_cool_thr) & (abs_frac >= p.abs_frac_thr)
+    promo_wire = normal & ~promo_joint & ~promo_point & \
+        (feats['coverage'] >= p.full_cover_thr) & (abs_frac >= p.abs_frac_wire_thr)
+    label[promo_joint | promo_point] = 2
+    label[promo_wire] = 1
+    subtype[promo_joint] = 1
+    subtype[promo_point] = 2
+    subtype[promo_wire] = 3
+    return label, subtype
+
+
 def summarize_image(blobs):
     if any(b.classification == 'Faulty' for b in blobs): return 'Faulty'
     if any(b.classification == 'Potentially Faulty' for b in blobs): return 'Potentially Faulty'
@@ -1,26 +1,133 @@
-"""Color and difference metrics (LAB, HSV, deltaE, hot color mask).
-No functional changes.
+"""Color and difference metrics: LAB/HSV conversion, deltaE, hot-colour masks.
+
+`hot_masks` builds the hot, absolute-hot and band masks in one strip-wise LUT
+pass; `hot_color_mask` and `absolute_hot_mask` are the plain per-mask
+definitions it must agree with.
 """
-from typing import Tuple
+from functools import lru_cache
+from typing import Optional, Tuple
 import cv2 as cv
 import numpy as np
-from skimage.color import rgb2lab, deltaE_ciede2000
+
+# skimage.color (with scipy) costs ~0.2 s to import; it is loaded on first use
+# so importing the service stays fast (see warmup.py).
+_DELTA_E = {
+    'ciede2000': 'deltaE_ciede2000',
+    'ciede94': 'deltaE_ciede94',
+    'cie76': 'deltaE_cie76',
+}
+
+
+def _skcolor():
+    import skimage.color
+    return skimage.color
+
+
+_HOT_RANGES = (
+    ((0,   90, 120), (10,  255, 255)),   # red (low hue)
+    ((170, 90, 120), (179, 255, 255)),   # red (wrap-around)
+    ((11,  80, 120), (25,  255, 255)),   # orange
+    ((26,  60, 120), (35,  255, 255)),   # yellow
+)
+
+# Labels written by hot_masks(bands=True); 0 is "not hot"
+HOT_BANDS = (None, 'red', 'orange', 'yellow')
+_BAND_RANGES = (_HOT_RANGES[:2], _HOT_RANGES[2:3], _HOT_RANGES[3:])
+
+MASK_ROWS = 64   # rows per strip in hot_masks; its temporaries stay in cache
+
+
+def to_lab(img_bgr):
+    return _skcolor().rgb2lab(cv.cvtColor(img_bgr, cv.COLOR_BGR2RGB))
+
+
+def to_hsv(img_bgr, dst=None):
+    return cv.cvtColor(img_bgr, cv.COLOR_BGR2HSV, dst=dst)
 
 
 def lab_and_hsv(img_bgr):
-    img_rgb = cv.cvtColor(img_bgr, cv.COLOR_BGR2RGB)
-    lab = rgb2lab(img_rgb)
-    hsv = cv.cvtColor(img_bgr, cv.COLOR_BGR2HSV)
-    return lab, hsv
+    return to_lab(img_bgr), to_hsv(img_bgr)
+
+
+def deltaE_map(lab_base, lab_maint, formula: str = 'ciede2000', dst=None):
+    try:
+        fn = getattr(_skcolor(), _DELTA_E[formula])
+    except KeyError:
+        raise ValueError(f"Unknown deltaE formula '{formula}'") from None
+    dE = fn(lab_base, lab_maint)
+    if dst is None:
+        return dE.astype(np.float32)
+    np.copyto(dst, dE, casting='same_kind')
+    return dst
+
+
+def hot_color_mask(hsv, dst=None):
+    out = None
+    tmp = None
+    for lo, hi in _HOT_RANGES:
+        if out is None:
+            out = cv.inRange(hsv, lo, hi, dst=dst)
+        else:
+            tmp = cv.inRange(hsv, lo, hi, dst=tmp)
+            cv.bitwise_or(out, tmp, dst=out)
+    return out
+
+
+def absolute_hot_mask(hsv, v_min: float, dst=None):
+    """Red/orange/yellow (H <= 25 or H >= 170), S >= 80 and V >= v_min, as 0/255."""
+    v_lo = int(np.ceil(v_min))   # V is uint8: V >= v_min  <=>  V >= ceil(v_min)
+    out = cv.inRange(hsv, (0, 80, v_lo), (25, 255, 255), dst=dst)
+    cv.bitwise_or(out, cv.inRange(hsv, (170, 80, v_lo), (255, 255, 255)), dst=out)
+    return out
+
+
+@lru_cache(maxsize=64)
+def _mask_luts(v_lo: int):
+    """Channel LUT of hot_masks and the hot / abs-hot / band LUTs of its sums.
 
+    The red, orange, yellow and absolute-hot boxes each own a base-4 digit.
+    The channel LUT adds 4**k for every channel that lies inside box k, so in
+    the sum of the three channels digit k is 3 exactly where the pixel is
+    inside box k (3 * (1+4+16+64) = 255 still fits in uint8).
+    """
+    x = np.arange(256)
+    abs_ranges = (((0, 80, v_lo), (25, 255, 255)), ((170, 80, v_lo), (255, 255, 255)))
+    chan = np.zeros((256, 3), np.int64)
+    for digit, ranges in enumerate((*_BAND_RANGES, abs_ranges)):
+        for c in range(3):   # ranges sharing a digit differ in hue only
+            inside = np.zeros(256, bool)
+            for lo, hi in ranges:
+                inside |= (x >= lo[c]) & (x <= hi[c])
+            chan[:, c] += inside * 4 ** digit
+    full = [(x // 4 ** k) % 4 == 3 for k in range(4)]
+    band = np.select(full[:3], [1, 2, 3], 0).astype(np.uint8)
+    return (chan.astype(np.uint8).reshape(256, 1, 3), np.where(band > 0, 255, 0).astype(np.uint8),
+            np.where(full[3], 255, 0).astype(np.uint8), band)
 
-def deltaE_map(lab_base, lab_maint):
-    return deltaE_ciede2000(lab_base, lab_maint).astype(np.float32)
 
+def hot_masks(hsv, v_min: float, out=None, bands: bool = False,
+              rows: int = MASK_ROWS) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """(hot_color_mask(hsv), absolute_hot_mask(hsv, v_min), band labels) in one pass.
 
-def hot_color_mask(hsv):
-    m_red1   = cv.inRange(hsv, (0,   90, 120), (10,  255, 255))
-    m_red2   = cv.inRange(hsv, (170, 90, 120), (179, 255, 255))
-    m_orange = cv.inRange(hsv, (11,  80, 120), (25,  255, 255))
-    m_yellow = cv.inRange(hsv, (26,  60, 120), (35,  255, 255))
-    return cv.bitwise_or(cv.bitwise_or(m_red1, m_red2), cv.bitwise_or(m_orange, m_yellow))
+    Each strip of `rows` rows goes through one channel LUT, a channel sum and
+    one LUT per output, so no full-frame temporary is made. Band labels index
+    HOT_BANDS and are only computed with bands=True (else None). out
+    optionally gives the (hot, abs_hot) arrays to fill.
+    """
+    H, W = hsv.shape[:2]
+    lut, hot_lut, abs_lut, band_lut = _mask_luts(min(256, max(0, int(np.ceil(v_min)))))
+    hot, abs_hot = out if out is not None else (np.empty((H, W), np.uint8), np.empty((H, W), np.uint8))
+    labels = np.empty((H, W), np.uint8) if bands else None
+    ones = np.ones((1, 3), np.float32)
+    chan = digits = None
+    for y0 in range(0, H, rows):
+        y1 = min(H, y0 + rows)
+        if chan is None or chan.shape[0] != y1 - y0:     # the last strip may be shorter
+            chan, digits = np.empty((y1 - y0, W, 3), np.uint8), np.empty((y1 - y0, W), np.uint8)
+        cv.LUT(hsv[y0:y1], lut, dst=chan)
+        cv.transform(chan, ones, dst=digits)
+        cv.LUT(digits, hot_lut, dst=hot[y0:y1])
+        cv.LUT(digits, abs_lut, dst=abs_hot[y0:y1])
+        if labels is not None:
+            cv.LUT(digits, band_lut, dst=labels[y0:y1])
+    return hot, abs_hot, labels
@@ -38,3 +38,9 @@ class DetectionReport:
     scale_applied: float | None
     threshold_source: str
     ratio: float
+    profile: str = 'balanced'          # quality/speed profile (see profiles.py)
+    roi: Tuple[int,int,int,int] | None = None   # processed region x,y,w,h (None = full frame)
+    tile_rows: int | None = None       # band height of the tiled path (None = full frame)
+    warp_init: str | None = None       # ECC start that produced the warp: identity/seeded/fallback
+    skipped_tile_ratio: float | None = None  # share of tiles the change prefilter skipped (None = off)
+    warp: List[List[float]] | None = None    # maintenance -> baseline warp (inverse map) of the processed region
@@ -1,52 +1,34 @@
 import cv2 as cv
-from skimage.metrics import structural_similarity as ssim
 import json
+import time
 import numpy as np
 from dataclasses import asdict
 
 from .data_structures import BlobDet, DetectionReport
 from .io_utils import read_bgr, to_gray
-from .alignment import ecc_align
-from .color_metrics import lab_and_hsv, deltaE_map, hot_color_mask
+from .alignment import SEEDED_MIN_CC_RATIO, ecc_align, ecc_input_mask, warp_to_base
+from .color_metrics import to_lab, to_hsv, deltaE_map, hot_masks, absolute_hot_mask
 from .morphology import morphology_clean
 from .topology import build_wire_skeleton, find_skeleton_nodes
 from .blobs import blob_props
-from .classification import classify_blob_enhanced, summarize_image
+from .classification import classify_blob_enhanced, skeleton_regions, summarize_image
+from .profiles import PipelineProfile, get_profile
+from .roi import cached_roi
+from .buffers import BufferPool, worker_pool
+from .baselines import BaselineFeatures
+from .run_arrays import save_run_arrays
+from .image_stats import image_stats
+from .tiling import (band_rows, tiled_delta_e_mask,
+                     tiled_morphology_clean, tiled_blob_props)
+from .change_tiles import active_tiles, tile_rects, sparse_delta_e_mask
 
 
-def detect_anomalies(baseline_path: str, maintenance_path: str,
-                     out_json_path: str | None = None,
-                     slider_percent: float | None = None) -> DetectionReport:
-    base_bgr = read_bgr(baseline_path)
-    ment_bgr = read_bgr(maintenance_path)
-
-    base_gray = to_gray(base_bgr)
-    ment_gray = to_gray(ment_bgr)
-    if ment_gray.shape != base_gray.shape:
-        Hs, Ws = base_gray.shape
-        ment_bgr = cv.resize(ment_bgr, (Ws, Hs), interpolation=cv.INTER_LINEAR)
-        ment_gray = cv.resize(ment_gray, (Ws, Hs), interpolation=cv.INTER_LINEAR)
-
-    warp, ment_aligned_gray, ok, score = ecc_align(base_gray, ment_gray)
-
-    H, W = base_gray.shape
-    if warp.shape == (3,3):
-        ment_aligned_bgr = cv.warpPerspective(
-            ment_bgr, warp, (W, H),
-            flags=cv.INTER_LINEAR + cv.WARP_INVERSE_MAP
-        )
-        warp_model = 'homography'
-    elif warp.shape == (2,3):
-        ment_aligned_bgr = cv.warpAffine(
-            ment_bgr, warp, (W, H),
-            flags=cv.INTER_LINEAR + cv.WARP_INVERSE_MAP
-        )
-        warp_model = 'affine'
-    else:
-        raise ValueError("Unexpected warp shape")
-
-    mean_ssim, _ = ssim(base_gray, ment_aligned_gray, full=True, data_range=255)
+def adaptive_thresholds(mean_ssim: float, hist_corr: float, slider_percent=None):
+    """Gate thresholds from the image statistics and the optional slider.
 
+    Returns (t_pot, t_fault, base_t_pot, base_t_fault, scale_applied,
+    threshold_source, ratio).
+    """
     base_t_pot  = 8.0  if mean_ssim >= 0.70 else 10.0
     base_t_fault = 12.0 if mean_ssim >= 0.70 else 14.0
     ratio = base_t_fault / base_t_pot
@@ -75,48 +57,258 @@ def detect_anomalies(baseline_path: str, maintenance_path: str,
         t_pot = base_t_pot
         t_fault = base_t_fault
 
-    hist_b = cv.calcHist([base_gray],[0],None,[64],[0,256]);  hist_b = cv.normalize(hist_b, None).flatten()
-    hist_m = cv.calcHist([ment_aligned_gray],[0],None,[64],[0,256]);  hist_m = cv.normalize(hist_m, None).flatten()
-    hist_corr = float(np.corrcoef(hist_b, hist_m)[0,1])
     if hist_corr < 0.60:
         t_pot   = max(6.0,  t_pot   - 2.0)
         t_fault = max(10.0, t_fault - 2.0)
         threshold_source += "+palette_soften"
 
-    base_lab, _ = lab_and_hsv(base_bgr)
-    ment_lab, ment_hsv = lab_and_hsv(ment_aligned_bgr)
-    dE = deltaE_map(base_lab, ment_lab)
+    return t_pot, t_fault, base_t_pot, base_t_fault, scale_applied, threshold_source, ratio
+
+
+class _StageClock:
+    """Adds wall-clock ms since the previous lap to `out[stage]`; no-op when out is None."""
+
+    def __init__(self, out: dict | None):
+        self.out = out
+        self.t = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        if self.out is not None:
+            now = time.perf_counter()
+            self.out[stage] = self.out.get(stage, 0.0) + (now - self.t) * 1000.0
+            self.t = now
+
+
+def detect_anomalies(baseline_path: str, maintenance_path: str,
+                     out_json_path: str | None = None,
+                     slider_percent: float | None = None,
+                     profile: str | PipelineProfile | None = None,
+                     auto_roi: bool | None = None,
+                     memory_budget_mb: float | None = None,
+                     buffers: BufferPool | None = None,
+                     baseline: BaselineFeatures | None = None,
+                     out_arrays_dir: str | None = None,
+                     timings: dict | None = None) -> DetectionReport:
+    """Compare a maintenance image against its baseline and classify hot blobs.
+
+    auto_roi crops alignment and every later stage to the baseline's cached
+    region of interest (legend, overlay text and background margins removed);
+    None defers to the profile. Blob coordinates are always reported in
+    full-image (baseline) space.
+
+    memory_budget_mb switches SSIM, colour difference, masks, morphology and
+    blob extraction to horizontal bands sized to that working-set budget
+    (see `tiling`); results match the full-frame path.
+
+    Unless the profile turns change_tiles off, LAB and deltaE are computed
+    only on tiles holding a hot pixel that differs from the baseline (see
+    `change_tiles`); the report's skipped_tile_ratio gives the share skipped.
+
+    Full-frame intermediates are leased from `buffers` (default: the calling
+    thread's `worker_pool()`) and returned when the call finishes.
+
+    baseline supplies a registered baseline's precomputed features (see
+    `baselines.BaselineRegistry`); baseline_path is then only reported.
+
+    out_arrays_dir persists the ΔE map, aligned maintenance image, masks,
+    skeleton and warp as a memory-mappable bundle (see `run_arrays`).
+
+    timings, if given, receives wall-clock ms per stage: load, align, stats,
+    delta_e, skeleton, blobs (and arrays when out_arrays_dir is set).
+    """
+    pool = buffers if buffers is not None else worker_pool()
+    with pool.session():
+        rep, _ = _detect(pool, baseline_path, maintenance_path, out_json_path,
+                         slider_percent, profile, auto_roi, memory_budget_mb, baseline,
+                         out_arrays_dir, _StageClock(timings))
+        return rep
+
+
+def detect_frame(baseline: BaselineFeatures, frame_bgr: np.ndarray,
+                 frame_label: str = '',
+                 init_warp: np.ndarray | None = None,
+                 init_cc: float | None = None,
+                 slider_percent: float | None = None,
+                 profile: str | PipelineProfile | None = None,
+                 auto_roi: bool | None = None,
+                 memory_budget_mb: float | None = None,
+                 buffers: BufferPool | None = None,
+                 timings: dict | None = None) -> tuple[DetectionReport, np.ndarray]:
+    """`detect_anomalies` for a decoded frame against precomputed baseline features.
 
-    mask_hot = hot_color_mask(ment_hsv)
-    mask_delta = (dE >= t_pot).astype(np.uint8)*255
-    mask = cv.bitwise_and(mask_hot, mask_delta)
-    mask = morphology_clean(mask)
+    init_warp seeds ECC (see `ecc_align`); pass the warp returned for the
+    previous frame of a sequence, and as init_cc the correlation seeded
+    results are held to (see `sequence`).
+    Returns (report, warp); frame_label is reported as the maintenance path.
+    Used by `sequence`.
+    """
+    pool = buffers if buffers is not None else worker_pool()
+    with pool.session():
+        return _detect(pool, baseline.baseline_id, frame_label, None,
+                       slider_percent, profile, auto_roi, memory_budget_mb, baseline,
+                       None, _StageClock(timings), ment_bgr=frame_bgr,
+                       init_warp=init_warp, init_cc=init_cc)
 
-    hch, sch, vch = cv.split(ment_hsv)
-    v98 = float(np.percentile(vch, 98))
-    abs_hot = (
-        ((hch <= 10) | (hch >= 170) | ((hch >= 11) & (hch <= 25))) &
-        (sch >= 80) &
-        (vch >= max(200.0, v98))
-    ).astype(np.uint8) * 255
 
-    skel, wire_band = build_wire_skeleton(ment_aligned_bgr, mask)
+def _detect(pool: BufferPool, baseline_path, maintenance_path, out_json_path,
+            slider_percent, profile, auto_roi, memory_budget_mb,
+            baseline: BaselineFeatures | None, out_arrays_dir,
+            clock: _StageClock, ment_bgr: np.ndarray | None = None,
+            init_warp: np.ndarray | None = None,
+            init_cc: float | None = None) -> tuple[DetectionReport, np.ndarray]:
+    prof = get_profile(profile)
+    use_roi = prof.auto_roi if auto_roi is None else bool(auto_roi)
+    if ment_bgr is None:
+        ment_bgr = read_bgr(maintenance_path)
+    if baseline is not None:
+        base_bgr, base_gray = baseline.bgr, baseline.gray
+        view = baseline.view(use_roi)
+        base_edges, base_hist = baseline.edges[view], baseline.hist[view]
+        base_orb = baseline.orb.get((view, prof.orb_features))
+    else:
+        base_bgr = read_bgr(baseline_path)
+        base_gray = to_gray(base_bgr, dst=pool.take(base_bgr.shape[:2]))
+        base_edges = base_hist = base_orb = None
+
+    ment_gray = to_gray(ment_bgr, dst=pool.take(ment_bgr.shape[:2]))
+    if ment_gray.shape != base_gray.shape:
+        Hs, Ws = base_gray.shape
+        ment_bgr = cv.resize(ment_bgr, (Ws, Hs), dst=pool.take((Hs, Ws, 3)),
+                             interpolation=cv.INTER_LINEAR)
+        ment_gray = cv.resize(ment_gray, (Ws, Hs), dst=pool.take((Hs, Ws)),
+                              interpolation=cv.INTER_LINEAR)
+
+    if not use_roi:
+        roi = None
+    else:
+        roi = baseline.roi if baseline is not None else cached_roi(base_bgr)
+    if roi is not None:
+        ox, oy, W, H = roi
+        ys, xs = slice(oy, oy + H), slice(ox, ox + W)
+        base_bgr, base_gray = base_bgr[ys, xs], base_gray[ys, xs]
+        ecc_mask = ecc_input_mask(base_gray.shape, drop_legend=False)
+        mov_gray = ment_gray[ys, xs]
+    else:
+        ox = oy = 0
+        H, W = base_gray.shape
+        ecc_mask = None
+        mov_gray = ment_gray
+    clock.lap('load')
+
+    # A stored warp only shortcuts the identity search: its result must reach the stored cc
+    min_cc_ratio = SEEDED_MIN_CC_RATIO
+    stored = baseline.seed_warp(view, prof.name) if init_warp is None and baseline is not None else None
+    if stored is not None:
+        (init_warp, init_cc), min_cc_ratio = stored, 1.0
+    align_stats = {}
+    warp, ment_aligned_gray, ok, score = ecc_align(
+        base_gray, mov_gray,
+        max_iter=prof.ecc_max_iter, eps=prof.ecc_eps, n_features=prof.orb_features,
+        input_mask=ecc_mask, base_edges=base_edges, base_orb=base_orb,
+        init_warp=init_warp, init_cc=init_cc, min_cc_ratio=min_cc_ratio, stats=align_stats
+    )
+    if baseline is not None and align_stats['init'] != 'fallback':
+        baseline.remember_warp(view, prof.name, warp, float(score), seeded=align_stats['init'] == 'seeded')
+
+    if warp.shape == (3,3):
+        warp_model = 'homography'
+    elif warp.shape == (2,3):
+        warp_model = 'affine'
+    else:
+        raise ValueError("Unexpected warp shape")
+    ment_aligned_bgr = warp_to_base(ment_bgr, warp, (W, H), offset=(ox, oy),
+                                    dst=pool.take((H, W, 3)))
+    if roi is not None:
+        ment_aligned_gray = warp_to_base(ment_gray, warp, (W, H), offset=(ox, oy),
+                                         dst=pool.take((H, W)))
+    clock.lap('align')
+
+    tile_rows = band_rows(W, memory_budget_mb) if memory_budget_mb else None
+    if tile_rows is not None and tile_rows >= H:
+        tile_rows = None
+
+    ment_hsv = to_hsv(ment_aligned_bgr, dst=pool.take((H, W, 3)))
+    stats = image_stats(base_gray, ment_aligned_gray, ment_hsv, rows=tile_rows, pool=pool,
+                        base_hist=base_hist)
+    mean_ssim = stats.mean_ssim
+
+    (t_pot, t_fault, base_t_pot, base_t_fault, scale_applied,
+     threshold_source, ratio) = adaptive_thresholds(mean_ssim, stats.hist_corr, slider_percent)
+    clock.lap('stats')
+
+    base_lab = baseline.crop(baseline.lab, view) if baseline is not None and baseline.lab is not None else None
+    skipped_tile_ratio = None
+    # The persisted bundle promises the full deltaE map, so it bypasses the prefilter
+    sparse = prof.change_tiles and out_arrays_dir is None
+    v_floor = max(200.0, stats.v98)
+    if sparse or tile_rows is None:
+        # Hot and absolute-hot masks from one LUT pass over the HSV frame
+        mask_hot, abs_hot, _ = hot_masks(ment_hsv, v_floor, out=(pool.take((H, W)), pool.take((H, W))))
+    else:
+        # The tiled deltaE builds its hot mask band by band
+        abs_hot = absolute_hot_mask(ment_hsv, v_floor, dst=pool.take((H, W)))
+    if sparse:
+        active = active_tiles(base_bgr, ment_aligned_bgr, mask_hot)
+        skipped_tile_ratio = 1.0 - float(active.mean())
+        dE, mask = sparse_delta_e_mask(
+            base_bgr, ment_aligned_bgr, mask_hot, t_pot, tile_rects(active, (H, W)),
+            formula=prof.delta_e, out=(pool.take((H, W), np.float32), pool.take((H, W))),
+            base_lab=base_lab
+        )
+        if tile_rows is not None:
+            mask = tiled_morphology_clean(mask, tile_rows, dst=pool.take((H, W)))
+        else:
+            mask = morphology_clean(mask, dst=pool.take((H, W)))
+    elif tile_rows is not None:
+        dE, mask = tiled_delta_e_mask(
+            base_bgr, ment_aligned_bgr, ment_hsv, t_pot, tile_rows, formula=prof.delta_e,
+            out=(pool.take((H, W), np.float32), pool.take((H, W))), base_lab=base_lab
+        )
+        mask = tiled_morphology_clean(mask, tile_rows, dst=pool.take((H, W)))
+    else:
+        if base_lab is None:
+            base_lab = to_lab(base_bgr)
+        ment_lab = to_lab(ment_aligned_bgr)
+        dE = deltaE_map(base_lab, ment_lab, formula=prof.delta_e,
+                        dst=pool.take((H, W), np.float32))
+        del base_lab, ment_lab
+
+        mask_delta = cv.compare(dE, t_pot, cv.CMP_GE, dst=pool.take((H, W)))
+        mask = cv.bitwise_and(mask_hot, mask_delta, dst=pool.take((H, W)))
+        mask = morphology_clean(mask, dst=pool.take((H, W)))
+    clock.lap('delta_e')
+
+    if tile_rows is not None:
+        props = tiled_blob_props(mask, dE, ment_hsv, tile_rows)
+    else:
+        props = blob_props(mask, dE, ment_hsv)
+    clock.lap('blobs')
+
+    # The rules read the skeleton only around the blobs; the persisted
+    # bundle keeps the full-frame one
+    regions = skeleton_regions(props) if out_arrays_dir is None else None
+    skel, wire_band = build_wire_skeleton(ment_aligned_bgr, mask, scale=prof.skeleton_scale,
+                                          out=(pool.take((H, W)), pool.take((H, W))),
+                                          regions=regions)
     endpoints, junctions = find_skeleton_nodes(skel)
     joints = endpoints + junctions
+    clock.lap('skeleton')
 
-    props = blob_props(mask, dE, ment_hsv)
     blobs = []
     for p in props:
         cls, subtype, conf, sev = classify_blob_enhanced(
             p, dE_thr_fault=t_fault, dE_thr_pot=t_pot,
             skel=skel, joints=joints, hot_mask=mask, abs_hot_mask=abs_hot
         )
-        blobs.append(BlobDet(label=p['label'], bbox=p['bbox'], area=p['area'],
-                             centroid=p['centroid'], mean_deltaE=p['mean_deltaE'], peak_deltaE=p['peak_deltaE'],
+        x, y, w, h = p['bbox']
+        cx, cy = p['centroid']
+        blobs.append(BlobDet(label=p['label'], bbox=(x + ox, y + oy, w, h), area=p['area'],
+                             centroid=(cx + ox, cy + oy), mean_deltaE=p['mean_deltaE'], peak_deltaE=p['peak_deltaE'],
                              mean_hsv=p['mean_hsv'], elongation=p['elongation'],
                              classification=cls, subtype=subtype, confidence=conf, severity=sev))
 
     image_label = summarize_image(blobs)
+    clock.lap('blobs')
 
     rep = DetectionReport(
         baseline_path=baseline_path,
@@ -134,25 +326,51 @@ def detect_anomalies(baseline_path: str, maintenance_path: str,
         slider_percent=float(slider_percent) if slider_percent is not None else None,
         scale_applied=float(scale_applied) if scale_applied is not None else None,
         threshold_source=threshold_source,
-        ratio=float(ratio)
+        ratio=float(ratio),
+        profile=prof.name,
+        roi=roi,
+        tile_rows=tile_rows,
+        warp_init=align_stats['init'],
+        skipped_tile_ratio=skipped_tile_ratio,
+        warp=warp.tolist()
     )
 
+    if out_arrays_dir is not None:
+        save_run_arrays(out_arrays_dir, {
+            'dE': dE, 'aligned': ment_aligned_bgr, 'hot_mask': mask,
+            'abs_hot_mask': abs_hot, 'skeleton': skel, 'warp': warp,
+        }, {
+            'baselinePath': baseline_path, 'maintenancePath': maintenance_path,
+            'profile': prof.name, 'deltaE': prof.delta_e, 'warpModel': warp_model,
+            'roi': list(roi) if roi is not None else None, 'offset': [ox, oy],
+            'meanSsim': float(mean_ssim), 'histCorr': float(stats.hist_corr),
+            'v98': float(stats.v98), 'absHotVMin': float(v_floor),
+            'tPot': float(t_pot), 'tFault': float(t_fault),
+            'thresholdSource': threshold_source,
+        })
+        clock.lap('arrays')
+
     if out_json_path is not None:
         with open(out_json_path, "w") as f:
-            json.dump({
-                **{k:v for k,v in asdict(rep).items() if k!='blobs'},
-                "blobs": [asdict(b) for b in blobs],
-                "thresholds_used": {
-                    "t_pot": rep.t_pot,
-                    "t_fault": rep.t_fault,
-                    "base_t_pot": rep.base_t_pot,
-                    "base_t_fault": rep.base_t_fault,
-                    "slider_percent": rep.slider_percent,
-                    "scale_applied": rep.scale_applied,
-                    "source": rep.threshold_source,
-                    "ratio": rep.ratio,
-                    "mean_ssim": rep.mean_ssim
-                }
-            }, f, indent=2)
-
-    return rep
+            json.dump(report_dict(rep), f, indent=2)
+
+    return rep, warp
+
+
+def report_dict(rep: DetectionReport) -> dict:
+    """JSON-ready report: the fields of `rep`, its blobs and a thresholds_used summary."""
+    return {
+        **{k:v for k,v in asdict(rep).items() if k!='blobs'},
+        "blobs": [asdict(b) for b in rep.blobs],
+        "thresholds_used": {
+            "t_pot": rep.t_pot,
+            "t_fault": rep.t_fault,
+            "base_t_pot": rep.base_t_pot,
+            "base_t_fault": rep.base_t_fault,
+            "slider_percent": rep.slider_percent,
+            "scale_applied": rep.scale_applied,
+            "source": rep.threshold_source,
+            "ratio": rep.ratio,
+            "mean_ssim": rep.mean_ssim
+        }
+    }
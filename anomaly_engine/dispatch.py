@@ -0,0 +1,318 @@
+"""Baseline-affinity dispatch of detections to local engine worker processes.
+
+Each worker is a spawned process that keeps the features of the baselines it
+has prepared (an LRU of CACHE_SIZE downloaded ones, plus its own registry's
+cache for registered ids). `Dispatcher` routes every detection by consistent
+hashing of the baseline identity -- the registered id, or the SHA-256 of the
+downloaded baseline bytes -- so the inspections of one transformer keep
+landing on the process that already holds its features, and each baseline
+is held by one worker instead of by all of them. Dispatch only changes where
+a detection runs: downloaded baselines are never warp-seeded, as in the
+front process, and registered ones seed from the registry's stored warp
+when seed_warps is on.
+
+The ring has REPLICAS virtual nodes per worker. A worker that dies is taken
+off the ring: only its keys move (to the next worker on the ring), and the
+request that found it dead is retried there once. A replacement is started
+RESTART_BACKOFF_S later and takes its keys back. With warm_profiles, every
+worker process (replacements included) first runs `warmup.warm_up`; the
+futures of the initial ones are in `Dispatcher.warmups`. Routing uses bounded
+loads: when a key's owner already has more than
+ceil(LOAD_FACTOR * in-flight / workers) requests in flight, the key goes to
+the next worker on the ring, so one hot baseline cannot queue up behind
+itself while other workers idle.
+
+The worker side (`init_worker`, `worker_detect`) is also what fleet lanes
+run (see `fleet`).
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+import atexit
+import bisect
+import hashlib
+import math
+import multiprocessing
+import threading
+import time
+
+from .baselines import BaselineFeatures, BaselineRegistry, compute_features
+from .buffers import merge_stats, pool_stats, set_process_cap
+from .data_structures import DetectionReport
+from .detection import detect_anomalies
+from .io_utils import read_bgr
+from .profiles import get_profile
+from .warmup import warm_up
+
+CACHE_SIZE = 4            # unregistered baselines kept per worker
+REPLICAS = 64             # virtual nodes per worker on the ring
+LOAD_FACTOR = 1.25        # bounded-load slack over the mean in-flight count
+RESTART_BACKOFF_S = 5.0   # delay before a dead worker is replaced
+
+
+# -- worker processes ----------------------------------------------------------
+_REGISTRY: Optional[BaselineRegistry] = None
+_FEATURES: "OrderedDict[str, BaselineFeatures]" = OrderedDict()
+_CACHE_SIZE = CACHE_SIZE
+
+
+def init_worker(baseline_dir: Optional[str], seed_warps: bool = False, cache_size: int = CACHE_SIZE,
+                pool_bytes: Optional[int] = None) -> None:
+    global _REGISTRY, _CACHE_SIZE
+    if pool_bytes is not None:
+        set_process_cap(pool_bytes)
+    _REGISTRY = BaselineRegistry(baseline_dir, seed_warps=seed_warps) if baseline_dir else None
+    if _REGISTRY is not None:
+        atexit.register(_REGISTRY.flush)    # pending lastUsedAt / warps
+    _CACHE_SIZE = max(1, int(cache_size))
+
+
+def _features(key: str, baseline_path: Optional[str], baseline_id: Optional[str],
+              profile: Optional[str]) -> Tuple[BaselineFeatures, bool]:
+    """(features, cache hit) for the baseline identified by key."""
+    if baseline_id is not None:
+        if _REGISTRY is None:
+            raise ValueError("baseline_id needs a worker started with a baseline dir")
+        hit = baseline_id in _REGISTRY.cached_ids()
+        return _REGISTRY.get(baseline_id), hit
+    # Only what the profile reads: one ORB budget, and the full LAB only
+    # when the colour difference runs over the whole frame
+    prof = get_profile(profile)
+    cache_key = f"{key}/{prof.name}"
+    if cache_key in _FEATURES:
+        _FEATURES.move_to_end(cache_key)
+        return _FEATURES[cache_key], True
+    while len(_FEATURES) >= _CACHE_SIZE:    # release before computing the next
+        _FEATURES.popitem(last=False)
+    feats = compute_features(read_bgr(baseline_path), orb_budgets=(prof.orb_features,),
+                             lab=not prof.change_tiles)
+    _FEATURES[cache_key] = feats
+    return feats, False
+
+
+def worker_detect(key: str, baseline_path: Optional[str], baseline_id: Optional[str],
+                  maintenance_path: str, options: Dict[str, Any]
+                  ) -> Tuple[DetectionReport, bool, float, Dict[str, Any]]:
+    """Detect one maintenance image with the baseline's cached features.
+
+    Returns (report, cache hit, milliseconds spent in the worker, the
+    worker's `buffers.pool_stats()`). baseline_path is read only on a cache
+    miss; options are detect_anomalies keyword arguments.
+    """
+    t0 = time.perf_counter()
+    features, hit = _features(key, baseline_path, baseline_id, options.get('profile'))
+    source = str(_REGISTRY.image_path(baseline_id)) if baseline_id is not None else baseline_path
+    report = detect_anomalies(source, maintenance_path, baseline=features, **options)
+    return report, hit, (time.perf_counter() - t0) * 1000.0, pool_stats()
+
+
+def worker_executor(baseline_dir: Optional[str], seed_warps: bool = False,
+                    cache_size: int = CACHE_SIZE, pool_bytes: Optional[int] = None) -> ProcessPoolExecutor:
+    """A single spawned worker process initialised with `init_worker`."""
+    return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=init_worker,
+                               initargs=(baseline_dir, seed_warps, cache_size, pool_bytes))
+
+
+# -- routing -------------------------------------------------------------------
+def _point(label: str) -> int:
+    return int.from_bytes(hashlib.blake2b(label.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hashing ring with `replicas` virtual nodes per node."""
+
+    def __init__(self, replicas: int = REPLICAS):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[int] = []
+
+    def add(self, node: int) -> None:
+        for r in range(self.replicas):
+            p = _point(f"worker-{node}#{r}")
+            i = bisect.bisect(self._points, p)
+            self._points.insert(i, p)
+            self._owners.insert(i, node)
+
+    def remove(self, node: int) -> None:
+        keep = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in keep]
+        self._owners = [o for _, o in keep]
+
+    def successors(self, key: str) -> Iterator[int]:
+        """Distinct nodes clockwise from key's point; the first is its owner."""
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, _point(key))
+        seen: Set[int] = set()
+        for i in range(len(self._points)):
+            node = self._owners[(start + i) % len(self._points)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+
+    def shares(self) -> Dict[int, float]:
+        """Fraction of the hash space each node owns."""
+        out: Dict[int, float] = {}
+        n = len(self._points)
+        for i in range(n):
+            arc = (self._points[i] - self._points[i - 1]) % (1 << 64) if n > 1 else 1 << 64
+            out[self._owners[i]] = out.get(self._owners[i], 0.0) + arc / float(1 << 64)
+        return out
+
+
+@dataclass
+class _Worker:
+    index: int
+    executor: Optional[ProcessPoolExecutor] = None
+    alive: bool = True
+    died_at: float = 0.0
+    restarts: int = 0
+    in_flight: int = 0
+    completed: int = 0
+    failed: int = 0
+    busy_ms: float = 0.0
+    hits: int = 0
+    misses: int = 0
+    keys: Set[str] = field(default_factory=set)
+    pools: Dict[str, Any] = field(default_factory=dict)   # buffer pool stats of the last detection
+
+
+class Dispatcher:
+    """Routes detections to `workers` local engine processes by baseline identity."""
+
+    def __init__(self, workers: int, baseline_dir: Optional[str] = None, seed_warps: bool = False,
+                 replicas: int = REPLICAS, load_factor: float = LOAD_FACTOR,
+                 restart_backoff_s: float = RESTART_BACKOFF_S,
+                 warm_profiles: Optional[Sequence[str]] = None, pool_bytes: Optional[int] = None):
+        self.baseline_dir, self.seed_warps = baseline_dir, seed_warps
+        self.pool_bytes = pool_bytes
+        self.load_factor, self.restart_backoff_s = load_factor, restart_backoff_s
+        self.warm_profiles = tuple(warm_profiles) if warm_profiles else None
+        self.ring = HashRing(replicas)
+        self.workers = [_Worker(i) for i in range(max(1, int(workers)))]
+        self.rerouted = 0
+        self._lock = threading.Lock()
+        self.warmups: List[Future] = [f for f in map(self._start, self.workers) if f is not None]
+        for w in self.workers:
+            self.ring.add(w.index)
+
+    def _start(self, w: _Worker) -> Optional[Future]:
+        """New worker process for w; its warm-up (queued ahead of any detection) if enabled."""
+        w.executor = worker_executor(self.baseline_dir, self.seed_warps, pool_bytes=self.pool_bytes)
+        return w.executor.submit(warm_up, self.warm_profiles) if self.warm_profiles else None
+
+    def _revive(self) -> None:
+        now = time.monotonic()
+        for w in self.workers:
+            if not w.alive and now - w.died_at >= self.restart_backoff_s:
+                self._start(w)
+                w.alive = True
+                w.restarts += 1
+                w.pools = {}
+                self.ring.add(w.index)
+
+    def _mark_dead(self, w: _Worker) -> None:
+        if w.alive:
+            w.alive = False
+            w.died_at = time.monotonic()
+            self.ring.remove(w.index)
+            w.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _route(self, key: str) -> _Worker:
+        self._revive()
+        alive = [w for w in self.workers if w.alive]
+        if not alive:
+            raise RuntimeError("no engine worker is alive")
+        bound = math.ceil(self.load_factor * (sum(w.in_flight for w in alive) + 1) / len(alive))
+        nodes = list(self.ring.successors(key))
+        for node in nodes:
+            if self.workers[node].in_flight < bound:
+                if node != nodes[0]:
+                    self.rerouted += 1
+                return self.workers[node]
+        return self.workers[nodes[0]]
+
+    def submit(self, key: str, baseline_path: Optional[str], baseline_id: Optional[str],
+               maintenance_path: str, options: Dict[str, Any]) -> Future:
+        """Run `worker_detect` on the key's worker; resolves to its (report, cache hit, ms, pool stats)."""
+        outer: Future = Future()
+        self._submit(outer, key, (key, baseline_path, baseline_id, maintenance_path, options), retry=True)
+        return outer
+
+    def _submit(self, outer: Future, key: str, args: tuple, retry: bool) -> None:
+        with self._lock:
+            w = self._route(key)
+            w.in_flight += 1
+            w.keys.add(key)
+            executor = w.executor
+        try:
+            inner = executor.submit(worker_detect, *args)
+        except (BrokenProcessPool, RuntimeError) as exc:   # RuntimeError: shut down meanwhile
+            inner = Future()
+            inner.set_exception(BrokenProcessPool(str(exc)))
+
+        def done(f: Future) -> None:
+            exc = f.exception()
+            with self._lock:
+                w.in_flight -= 1
+                if isinstance(exc, BrokenProcessPool) and w.executor is executor:
+                    self._mark_dead(w)
+                elif exc is None:
+                    w.completed += 1
+                    _, hit, ms, w.pools = f.result()
+                    w.busy_ms += ms
+                    w.hits += hit
+                    w.misses += not hit
+                else:
+                    w.failed += 1
+            if isinstance(exc, BrokenProcessPool) and retry:
+                try:
+                    self._submit(outer, key, args, retry=False)
+                except RuntimeError as err:
+                    outer.set_exception(err)
+            elif exc is not None:
+                outer.set_exception(exc)
+            else:
+                outer.set_result(f.result())
+
+        inner.add_done_callback(done)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._revive()
+            shares = self.ring.shares()
+            workers = []
+            for w in self.workers:
+                lookups = w.hits + w.misses
+                workers.append({
+                    'worker': w.index,
+                    'alive': w.alive,
+                    'restarts': w.restarts,
+                    'inFlight': w.in_flight,
+                    'completed': w.completed,
+                    'failed': w.failed,
+                    'busyMs': w.busy_ms,
+                    'cacheHits': w.hits,
+                    'cacheMisses': w.misses,
+                    'hitRate': w.hits / lookups if lookups else None,
+                    'baselines': len(w.keys),
+                    'ringShare': shares.get(w.index, 0.0),
+                })
+            return {'workers': workers, 'rerouted': self.rerouted,
+                    'loadFactor': self.load_factor, 'replicas': self.ring.replicas}
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Buffer pool stats summed over the workers, as of each one's last detection.
+
+        A replaced worker starts from zero.
+        """
+        with self._lock:
+            return merge_stats(w.pools for w in self.workers if w.pools)
+
+    def close(self) -> None:
+        for w in self.workers:
+            if w.executor is not None:
+                w.executor.shutdown(wait=False, cancel_futures=True)
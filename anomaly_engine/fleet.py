@@ -0,0 +1,112 @@
+"""Fleet sweeps: many (baseline, [maintenance...]) groups in one run.
+
+`plan_lanes` deals the groups to a fixed number of lanes, one worker process
+each. A group stays on one lane, so its baseline is downloaded and its
+features computed once, unless it is larger than the fair share of the
+whole sweep; then it is cut into chunks of at most that size. Chunks are
+dealt largest first, each to the lane with the least work so far (LPT), so
+big groups start early and small ones fill the gaps at the end.
+
+`FleetProgress` tracks every image of every group (pending, result, error
+or expired once the deadline has passed) for polling while the sweep runs.
+
+Each lane is a `dispatch.worker_executor` process running
+`dispatch.worker_detect`, so consecutive images of a chunk reuse the
+baseline's features; registered baselines come from the lane's own registry.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+import heapq
+import threading
+
+
+@dataclass
+class Chunk:
+    group: int      # index of the group in the request
+    start: int      # first maintenance index
+    stop: int       # one past the last
+
+    @property
+    def size(self) -> int:
+        return self.stop - self.start
+
+
+def plan_lanes(sizes: Sequence[int], lanes: int) -> List[List[Chunk]]:
+    """Chunks per lane, in the order each lane runs them (largest first)."""
+    lanes = max(1, int(lanes))
+    total = sum(sizes)
+    share = max(1, -(-total // lanes))
+    chunks = [Chunk(g, start, min(start + share, n))
+              for g, n in enumerate(sizes) for start in range(0, n, share)]
+    chunks.sort(key=lambda c: (-c.size, c.group, c.start))
+    plan: List[List[Chunk]] = [[] for _ in range(lanes)]
+    loads = [(0, lane) for lane in range(lanes)]
+    for chunk in chunks:
+        load, lane = heapq.heappop(loads)
+        plan[lane].append(chunk)
+        heapq.heappush(loads, (load + chunk.size, lane))
+    return plan
+
+
+class FleetProgress:
+    """Thread-safe per-image state of a sweep; `snapshot` is what pollers see."""
+
+    def __init__(self, sizes: Sequence[int]):
+        self._lock = threading.Lock()
+        self._results: List[List[Optional[Dict[str, Any]]]] = [[None] * n for n in sizes]
+        self._started = [False] * len(sizes)
+        self._errors: List[Optional[str]] = [None] * len(sizes)
+        self._info: List[Dict[str, Any]] = [{} for _ in sizes]
+
+    def start(self, group: int, **info: Any) -> None:
+        """Mark a group as running; info (e.g. the baseline digest) is reported with it."""
+        with self._lock:
+            self._started[group] = True
+            self._info[group].update(info)
+
+    def record(self, group: int, index: int, result: Dict[str, Any]) -> None:
+        """Store one image's entry; result['status'] is 'ok', 'error' or 'expired'."""
+        with self._lock:
+            self._results[group][index] = result
+
+    def fail(self, chunk: Chunk, error: str) -> None:
+        """The chunk's baseline could not be prepared: every image of the chunk fails."""
+        with self._lock:
+            self._errors[chunk.group] = error
+            for idx in range(chunk.start, chunk.stop):
+                self._results[chunk.group][idx] = {'imageIndex': idx, 'status': 'error', 'error': error}
+
+    def expire(self, chunk: Chunk, start: Optional[int] = None) -> None:
+        """The deadline passed before the chunk's images from `start` on were dispatched."""
+        with self._lock:
+            for idx in range(chunk.start if start is None else start, chunk.stop):
+                self._results[chunk.group][idx] = {'imageIndex': idx, 'status': 'expired'}
+
+    def _group_status(self, group: int) -> str:
+        results = self._results[group]
+        if self._errors[group] is not None:
+            return 'failed'
+        if any(r is not None and r['status'] == 'expired' for r in results):
+            return 'expired'
+        if all(r is not None for r in results):
+            return 'done'
+        return 'running' if self._started[group] else 'pending'
+
+    def snapshot(self, with_results: bool = True) -> List[Dict[str, Any]]:
+        with self._lock:
+            out = []
+            for g, results in enumerate(self._results):
+                entry = {
+                    'status': self._group_status(g),
+                    'totalImages': len(results),
+                    'completed': sum(r is not None and r['status'] == 'ok' for r in results),
+                    'failed': sum(r is not None and r['status'] == 'error' for r in results),
+                    'expired': sum(r is not None and r['status'] == 'expired' for r in results),
+                    'error': self._errors[g],
+                    **self._info[g],
+                }
+                if with_results:
+                    entry['results'] = [r for r in results if r is not None]
+                out.append(entry)
+            return out
+
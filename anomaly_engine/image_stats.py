@@ -0,0 +1,127 @@
+"""Fused image statistics for threshold gating.
+
+The pipeline only needs a handful of global numbers before it thresholds
+anything: mean SSIM (selects the threshold preset at 0.70), the correlation of
+the 64-bin grayscale histograms (palette check at 0.60) and the 98th
+percentile of the maintenance V channel (absolute-hot floor). `image_stats`
+computes all of them in one stage:
+
+- SSIM with the same definition as scikit-image (uniform 7x7 window, sample
+  covariance, border of win//2 excluded from the mean) but evaluated with
+  OpenCV box filters in float32 straight from the uint8 inputs, at a
+  fraction of the time and memory. float32 accumulation moves the mean: on
+  the 21 fixture pairs it differed from scikit-image by up to 2.2e-6 (the
+  reported meanSsim by up to 3.2e-6), with every other report field identical.
+- 256-bin histograms from cv.calcHist; the 64-bin histograms are their
+  4-bin sums and the V percentile is read off the cumulative counts with
+  NumPy's linear interpolation (bit-identical to np.percentile, no sort).
+"""
+from dataclasses import dataclass
+import cv2 as cv
+import numpy as np
+
+from .tiling import iter_bands
+
+
+@dataclass
+class ImageStats:
+    mean_ssim: float
+    hist_corr: float
+    v98: float
+
+
+def hist256(img, channel: int = 0) -> np.ndarray:
+    return cv.calcHist([img], [channel], None, [256], [0, 256]).ravel()
+
+
+def hist_percentile(hist, q: float) -> float:
+    """np.percentile(values, q) (linear method) from a histogram of integer values."""
+    cum = np.cumsum(hist, dtype=np.int64)
+    n = int(cum[-1])
+    idx = (n - 1) * (q / 100.0)
+    lo = int(np.floor(idx))
+    hi = min(lo + 1, n - 1)
+    a = float(np.searchsorted(cum, lo, side='right'))
+    b = float(np.searchsorted(cum, hi, side='right'))
+    t = idx - lo
+    d = b - a
+    return b - d * (1 - t) if t >= 0.5 else a + d * t
+
+
+def _take(pool, shape):
+    return pool.take(shape, np.float32) if pool is not None else np.empty(shape, np.float32)
+
+
+def _ssim_map(x, y, win_size: int, pool=None) -> np.ndarray:
+    """Per-pixel SSIM (float32) of two uint8 images, data range 255."""
+    k = (win_size, win_size)
+    border = cv.BORDER_REFLECT
+    shape = x.shape
+    ux = cv.boxFilter(x, cv.CV_32F, k, dst=_take(pool, shape), borderType=border)
+    uy = cv.boxFilter(y, cv.CV_32F, k, dst=_take(pool, shape), borderType=border)
+    uxx = cv.sqrBoxFilter(x, cv.CV_32F, k, dst=_take(pool, shape), borderType=border)
+    uyy = cv.sqrBoxFilter(y, cv.CV_32F, k, dst=_take(pool, shape), borderType=border)
+    uxy = cv.multiply(x, y, dst=_take(pool, shape), dtype=cv.CV_32F)
+    cv.boxFilter(uxy, cv.CV_32F, k, dst=uxy, borderType=border)
+
+    n = win_size * win_size
+    cov_norm = np.float32(n / (n - 1))
+    C1 = np.float32((0.01 * 255) ** 2)
+    C2 = np.float32((0.03 * 255) ** 2)
+    # S = (2 ux uy + C1)(2 vxy + C2) / ((ux^2 + uy^2 + C1)(vx + vy + C2)), in place
+    uxuy = np.multiply(ux, uy, out=_take(pool, shape))
+    np.subtract(uxy, uxuy, out=uxy)
+    np.multiply(uxy, 2 * cov_norm, out=uxy)
+    uxy += C2
+    np.multiply(ux, ux, out=ux)
+    np.multiply(uy, uy, out=uy)
+    np.subtract(uxx, ux, out=uxx)
+    np.subtract(uyy, uy, out=uyy)
+    np.add(uxx, uyy, out=uxx)
+    np.multiply(uxx, cov_norm, out=uxx)
+    uxx += C2
+    np.add(ux, uy, out=ux)
+    ux += C1
+    np.multiply(uxuy, 2, out=uxuy)
+    uxuy += C1
+    np.multiply(uxuy, uxy, out=uxuy)
+    np.multiply(ux, uxx, out=ux)
+    return np.divide(uxuy, ux, out=uxuy)
+
+
+def mean_ssim(gray_a, gray_b, win_size: int = 7, rows: int | None = None, pool=None) -> float:
+    """Mean SSIM over the frame minus a win//2 border.
+
+    rows bands the work (halo win//2); band scratch is freed per band instead
+    of being leased from `pool`, which would hold every band until the session ends.
+    """
+    H, W = gray_a.shape
+    if min(H, W) < win_size:
+        raise ValueError(f"win_size {win_size} exceeds image extent {gray_a.shape}")
+    pad = (win_size - 1) // 2
+    total, count = 0.0, 0
+    for y0, y1, h0, h1 in iter_bands(H, rows or H, halo=pad):
+        S = _ssim_map(gray_a[h0:h1], gray_b[h0:h1], win_size, pool if rows is None else None)
+        r0, r1 = max(y0, pad), min(y1, H - pad)
+        if r1 > r0:
+            core = S[r0 - h0:r1 - h0, pad:W - pad]
+            total += float(core.sum(dtype=np.float64))
+            count += core.size
+    return total / count
+
+
+def image_stats(base_gray, ment_gray, ment_hsv, win_size: int = 7,
+                rows: int | None = None, pool=None, base_hist=None) -> ImageStats:
+    """SSIM, 64-bin histogram correlation and V-channel 98th percentile in one stage.
+
+    base_hist is a precomputed hist256(base_gray) (see baselines.py).
+    """
+    h_base = hist256(base_gray) if base_hist is None else base_hist
+    h_ment = hist256(ment_gray)
+    h64_base = h_base.reshape(64, 4).sum(axis=1, dtype=np.float64)
+    h64_ment = h_ment.reshape(64, 4).sum(axis=1, dtype=np.float64)
+    return ImageStats(
+        mean_ssim=mean_ssim(base_gray, ment_gray, win_size, rows=rows, pool=pool),
+        hist_corr=float(np.corrcoef(h64_base, h64_ment)[0, 1]),
+        v98=hist_percentile(hist256(ment_hsv, channel=2), 98),
+    )
@@ -2,6 +2,7 @@
 No functional changes.
 """
 from typing import Tuple
+import hashlib
 import cv2 as cv
 import numpy as np
 
@@ -11,5 +12,16 @@ def read_bgr(path: str) -> np.ndarray:
         raise FileNotFoundError(path)
     return img
 
-def to_gray(img_bgr: np.ndarray) -> np.ndarray:
-    return cv.cvtColor(img_bgr, cv.COLOR_BGR2GRAY)
+def to_gray(img_bgr: np.ndarray, dst: np.ndarray | None = None) -> np.ndarray:
+    return cv.cvtColor(img_bgr, cv.COLOR_BGR2GRAY, dst=dst)
+
+def image_digest(img: np.ndarray) -> str:
+    """Content hash of the decoded pixels (shape and dtype included).
+
+    Used to key per-baseline caches independently of file paths, which are
+    per-request temp files in the service.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.shape}|{img.dtype.str}".encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
@@ -0,0 +1,277 @@
+"""Long-running detection worker fed with JSONL jobs.
+
+One job per line, read from stdin or from connections to a local (Unix)
+socket; one result line per job, written as soon as that job completes (so
+results may come back out of order; match them by "id"). Job fields:
+
+    {"id": "r1", "baseline": "base.png", "maintenance": "ment.png",
+     "slider_percent": 50, "profile": "fast", "auto_roi": true,
+     "memory_budget_mb": 256, "out_json": "r1.json", "save_arrays": "r1/"}
+
+Only "maintenance" and one of "baseline" (path) / "baseline_id" (registered
+in the --baseline-dir registry) are required; "id" defaults to the line
+number. Results are {"id", "status": "ok", "elapsedMs", "report"} with the
+`report_dict` layout, or {"id", "status": "error", "error"}.
+
+Workers are processes that stay up for the whole session: imports, the
+warm-up (`warmup`), the buffer pool, ROI and registered-baseline caches are
+paid once per worker instead of once per pair. --workers 1 runs jobs in
+this process.
+
+CLI:
+python anomaly_cv.py --serve --workers 4 < jobs.jsonl > results.jsonl
+python anomaly_cv.py --serve --socket /tmp/anomaly.sock
+"""
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Optional
+import argparse
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+from .baselines import BaselineRegistry
+from .detection import detect_anomalies, report_dict
+from .warmup import warm_up
+
+JOB_FIELDS = {'id', 'baseline', 'baseline_id', 'maintenance', 'slider_percent', 'profile',
+              'auto_roi', 'memory_budget_mb', 'out_json', 'save_arrays'}
+
+_REGISTRY: Optional[BaselineRegistry] = None
+
+
+def _init_worker(baseline_dir: Optional[str], warm: bool) -> None:
+    global _REGISTRY
+    # No warp seeding: each worker would keep its own seeds, and a job's result
+    # would depend on which earlier jobs that worker happened to run
+    _REGISTRY = BaselineRegistry(baseline_dir, seed_warps=False) if baseline_dir else None
+    if warm:
+        warm_up()
+
+
+def run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one job in the current process; never raises."""
+    t0 = time.perf_counter()
+    try:
+        unknown = set(job) - JOB_FIELDS
+        if unknown:
+            raise ValueError(f"unknown job field(s): {', '.join(sorted(unknown))}")
+        if ('baseline' in job) == ('baseline_id' in job):
+            raise ValueError("provide exactly one of baseline or baseline_id")
+        if 'maintenance' not in job:
+            raise ValueError("missing maintenance")
+        baseline = None
+        baseline_path = job.get('baseline')
+        if 'baseline_id' in job:
+            if _REGISTRY is None:
+                raise ValueError("baseline_id needs a worker started with --baseline-dir")
+            try:
+                baseline = _REGISTRY.get(job['baseline_id'])
+            except KeyError:
+                raise ValueError(f"unknown baseline_id '{job['baseline_id']}'") from None
+            baseline_path = str(_REGISTRY.image_path(job['baseline_id']))
+        rep = detect_anomalies(
+            baseline_path, job['maintenance'],
+            out_json_path=job.get('out_json'),
+            slider_percent=job.get('slider_percent'),
+            profile=job.get('profile'),
+            auto_roi=job.get('auto_roi'),
+            memory_budget_mb=job.get('memory_budget_mb'),
+            baseline=baseline,
+            out_arrays_dir=job.get('save_arrays'),
+        )
+    except Exception as exc:
+        return {'id': job.get('id'), 'status': 'error', 'error': f"{type(exc).__name__}: {exc}"}
+    return {'id': job.get('id'), 'status': 'ok',
+            'elapsedMs': (time.perf_counter() - t0) * 1000.0, 'report': report_dict(rep)}
+
+
+class JobRunner:
+    """Shared pool of warm workers; results are handed to a callback on completion.
+
+    At most `max_in_flight` jobs are queued at once (default 2 per worker), so
+    an endless input stream is read only as fast as it is processed. When a
+    worker process dies, the jobs it took down get error results and the pool
+    is replaced, so later jobs run on fresh workers.
+    """
+
+    def __init__(self, workers: int = 1, baseline_dir: Optional[str] = None, warm: bool = True,
+                 max_in_flight: Optional[int] = None):
+        self.workers = max(1, int(workers))
+        self.baseline_dir, self.warm = baseline_dir, warm
+        self._executor = self._make_executor()
+        self._slots = threading.BoundedSemaphore(max_in_flight or 2 * self.workers)
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self._lock = threading.Lock()
+
+    def _make_executor(self) -> Executor:
+        initargs = (self.baseline_dir, self.warm)
+        if self.workers == 1:
+            # This process, one thread: the caches live here and jobs run one at a time
+            return ThreadPoolExecutor(max_workers=1, initializer=_init_worker, initargs=initargs)
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=initargs)
+
+    def _restart(self, broken: Executor) -> None:
+        """Replace a broken pool, once however many of its jobs report it."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._make_executor()
+            self.restarts += 1
+        broken.shutdown(wait=False)
+
+    def submit(self, job: Dict[str, Any], emit: Callable[[Dict[str, Any]], None]) -> Future:
+        self._slots.acquire()
+        executor = self._executor
+        try:
+            future = executor.submit(run_job, job)
+        except BrokenExecutor as exc:   # broke before this job's done callback could replace it
+            future = Future()
+            future.set_exception(exc)
+
+        def done(f: Future) -> None:
+            try:
+                try:
+                    result = f.result()
+                except Exception as exc:   # a worker process died
+                    if isinstance(exc, BrokenExecutor):
+                        self._restart(executor)
+                    result = {'id': job.get('id'), 'status': 'error',
+                              'error': f"{type(exc).__name__}: {exc}"}
+                with self._lock:
+                    self.completed += 1
+                    self.failed += result['status'] != 'ok'
+                emit(result)
+            finally:
+                self._slots.release()
+
+        future.add_done_callback(done)
+        return future
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+def _parse_job(line: str, lineno: int) -> Dict[str, Any]:
+    job = json.loads(line)
+    if not isinstance(job, dict):
+        raise ValueError("job line must be a JSON object")
+    job.setdefault('id', lineno)
+    return job
+
+
+def serve_stream(runner: JobRunner, infile: IO[str], outfile: IO[str]) -> None:
+    """Read jobs from `infile` until EOF; write results to `outfile` as they complete.
+
+    Returns once every submitted job's result has been written.
+    """
+    cond = threading.Condition()
+    outstanding = 0
+
+    def write(result: Dict[str, Any]) -> None:
+        with cond:
+            outfile.write(json.dumps(result) + '\n')
+            outfile.flush()
+
+    def emit(result: Dict[str, Any]) -> None:
+        nonlocal outstanding
+        try:
+            write(result)
+        finally:
+            with cond:
+                outstanding -= 1
+                cond.notify_all()
+
+    for lineno, line in enumerate(infile, 1):
+        if not line.strip():
+            continue
+        try:
+            job = _parse_job(line, lineno)
+        except ValueError as exc:   # json.JSONDecodeError is a ValueError
+            write({'id': lineno, 'status': 'error', 'error': f"invalid job line: {exc}"})
+            continue
+        with cond:
+            outstanding += 1
+        runner.submit(job, emit)
+    with cond:
+        cond.wait_for(lambda: outstanding == 0)
+
+
+def serve_socket(runner: JobRunner, path: str) -> None:
+    """Accept JSONL connections on a Unix socket; each gets the results of its own jobs."""
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            reader = (line.decode('utf-8') for line in self.rfile)
+            writer = _SocketWriter(self.wfile)
+            try:
+                serve_stream(runner, reader, writer)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    if os.path.exists(path):
+        os.unlink(path)
+    # SIGTERM (service managers, containers) stops the server like Ctrl-C
+    previous = signal.signal(signal.SIGTERM, stop)
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        server.daemon_threads = True
+        print(f"Listening on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+            signal.signal(signal.SIGTERM, previous)
+
+
+class _SocketWriter:
+    """Text-mode write/flush over a socket's binary file."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text: str) -> None:
+        self.wfile.write(text.encode('utf-8'))
+
+    def flush(self) -> None:
+        self.wfile.flush()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Persistent detection worker reading JSONL jobs")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes (1 = this process)")
+    parser.add_argument('--socket', help="Serve a Unix socket at this path instead of stdin/stdout")
+    parser.add_argument('--baseline-dir', help="Baseline registry for jobs that give baseline_id")
+    parser.add_argument('--no-warmup', action='store_true', help="Skip the per-worker warm-up")
+    args = parser.parse_args(argv)
+    if args.baseline_dir and not Path(args.baseline_dir).is_dir():
+        parser.error(f"baseline dir does not exist: {args.baseline_dir}")
+
+    t0 = time.perf_counter()
+    runner = JobRunner(args.workers, args.baseline_dir, warm=not args.no_warmup)
+    try:
+        if args.socket:
+            serve_socket(runner, args.socket)
+        else:
+            serve_stream(runner, sys.stdin, sys.stdout)
+    finally:
+        runner.close()
+    wall = time.perf_counter() - t0
+    print(f"{runner.completed} job(s), {runner.failed} failed in {wall:.1f} s "
+          f"({runner.completed / wall if wall > 0 else 0.0:.2f} jobs/s)", file=sys.stderr)
+    if runner.restarts:
+        print(f"worker pool restarted {runner.restarts} time(s) after a worker died", file=sys.stderr)
+    return 1 if runner.failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
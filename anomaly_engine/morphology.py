@@ -3,8 +3,7 @@ No functional changes.
 """
 import cv2 as cv
 
-def morphology_clean(mask):
+def morphology_clean(mask, dst=None):
     k = cv.getStructuringElement(cv.MORPH_ELLIPSE, (3,3))
-    mask = cv.morphologyEx(mask, cv.MORPH_OPEN, k, iterations=1)
-    mask = cv.morphologyEx(mask, cv.MORPH_CLOSE, k, iterations=2)
-    return mask
+    out = cv.morphologyEx(mask, cv.MORPH_OPEN, k, dst=dst, iterations=1)
+    return cv.morphologyEx(out, cv.MORPH_CLOSE, k, dst=out, iterations=2)
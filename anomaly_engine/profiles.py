@@ -0,0 +1,57 @@
+"""Named quality/speed profiles for the detection pipeline.
+
+A profile bundles the knobs that trade accuracy for latency (ECC termination
+criteria, ORB feature budget, colour-difference formula, the resolution used
+for wire skeletonization, whether the baseline ROI crop is applied and whether
+unchanged tiles skip the colour difference). `balanced` reproduces the
+original hard-coded pipeline exactly and is the default everywhere.
+"""
+from dataclasses import dataclass
+from typing import Dict
+
+DEFAULT_PROFILE = 'balanced'
+
+
+@dataclass(frozen=True)
+class PipelineProfile:
+    name: str
+    ecc_max_iter: int        # ECC iteration budget
+    ecc_eps: float           # ECC correlation-delta termination
+    orb_features: int        # ORB corners detected for the fallback (<= FALLBACK_MAX_FEATURES matched)
+    delta_e: str             # 'ciede2000' | 'ciede94' | 'cie76'
+    skeleton_scale: float    # resolution factor for skeletonize (1.0 = full frame)
+    auto_roi: bool           # crop every per-pixel stage to the cached baseline ROI
+    change_tiles: bool = True  # skip LAB/deltaE on tiles without a changed hot pixel (exact, see change_tiles.py)
+
+
+PROFILES: Dict[str, PipelineProfile] = {
+    'fast': PipelineProfile(
+        name='fast', ecc_max_iter=100, ecc_eps=1e-4, orb_features=1500,
+        delta_e='ciede94', skeleton_scale=0.5, auto_roi=True,
+    ),
+    'balanced': PipelineProfile(
+        name='balanced', ecc_max_iter=300, ecc_eps=1e-6, orb_features=5000,
+        delta_e='ciede2000', skeleton_scale=1.0, auto_roi=False,
+    ),
+    'accurate': PipelineProfile(
+        name='accurate', ecc_max_iter=500, ecc_eps=1e-7, orb_features=5000,
+        delta_e='ciede2000', skeleton_scale=1.0, auto_roi=False,
+    ),
+}
+
+
+def get_profile(profile=None) -> PipelineProfile:
+    """Resolve a profile name (or an already-built profile) to a PipelineProfile.
+
+    None selects the default profile; unknown names raise ValueError.
+    """
+    if profile is None:
+        return PROFILES[DEFAULT_PROFILE]
+    if isinstance(profile, PipelineProfile):
+        return profile
+    try:
+        return PROFILES[str(profile).lower()]
+    except KeyError:
+        raise ValueError(
+            f"Unknown profile '{profile}' (available: {', '.join(PROFILES)})"
+        ) from None
@@ -0,0 +1,266 @@
+"""Offline replay of stored runs and vectorized threshold / classifier sweeps.
+
+Tuning thresholds or the classification constants used to mean re-running
+`detect_anomalies` from images for every candidate. Replay splits the work by
+what each stage depends on:
+
+A. per run, once: alignment, ΔE, HSV and the absolute-hot mask. This is a
+   regular detection with `out_arrays_dir`; bundles are cached on disk
+   (`run_arrays`) and reused by later sweeps.
+B. per run and distinct t_pot: hot ∧ ΔE ≥ t_pot mask, morphology, skeleton,
+   blob properties and the rule inputs (`classification.blob_features`).
+C. per grid point: t_fault, hue bands and coverage / absolute-heat constants
+   evaluated with `classification.classify_blobs` over the blobs of all runs
+   at once.
+
+Stages A and B run in a process pool; C is vectorized NumPy. With the default
+parameters and no slider, replay reproduces `detect_anomalies` labels
+exactly (checked by `--verify`).
+
+Grid files are JSON objects mapping a parameter to its candidate values:
+`slider_percent`, `t_pot`, `t_fault` (absolute overrides; null keeps the
+adaptive value) and any `ClassifierParams` field, e.g.
+
+    {"slider_percent": [null, 25, 50, 75], "full_cover_thr": [0.5, 0.6, 0.7]}
+
+CLI:
+python -m anomaly_engine.replay --root inspections --grid grid.json --output sweep.json
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields, replace
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import cv2 as cv
+import numpy as np
+
+from .artifact_store import ArtifactStore
+from .blobs import blob_props
+from .classification import (DEFAULT_PARAMS, LABELS, SUBTYPES, ClassifierParams,
+                             blob_features, classify_blobs, skeleton_regions)
+from .color_metrics import hot_color_mask, to_hsv
+from .detection import adaptive_thresholds, detect_anomalies
+from .morphology import morphology_clean
+from .profiles import get_profile
+from .run_arrays import META_FILE, load_run_arrays
+from .topology import build_wire_skeleton, find_skeleton_nodes
+
+DEFAULT_CACHE_DIR = '.replay_cache'
+THRESHOLD_KEYS = ('slider_percent', 't_pot', 't_fault')
+PARAM_KEYS = tuple(f.name for f in fields(ClassifierParams))
+
+
+def discover_runs(root='inspections') -> List[Tuple[str, Path, Path]]:
+    """(run_id, baseline, maintenance) for every stored run, `inspection_logs/` mirror skipped."""
+    store = ArtifactStore(root)
+    runs = []
+    for run_dir in store.iter_runs():
+        if 'inspection_logs' in run_dir.relative_to(store.root).parts:
+            continue
+        base, maint = store.resolve(run_dir, 'baseline'), store.resolve(run_dir, 'maintenance')
+        if base.exists() and maint.exists():
+            runs.append((run_dir.name, base, maint))
+    return runs
+
+
+# -- stage A -----------------------------------------------------------------
+def _bundle_dir(cache_dir, run_id: str, profile, auto_roi) -> Path:
+    prof = get_profile(profile)
+    tag = prof.name + ('-roi' if (prof.auto_roi if auto_roi is None else auto_roi) else '')
+    return Path(cache_dir) / tag / run_id
+
+
+def prepare_run(run: Tuple[str, Path, Path], cache_dir, profile=None, auto_roi=None) -> Path:
+    """Stage A: the run's threshold-independent arrays (cached)."""
+    run_id, base, maint = run
+    bundle = _bundle_dir(cache_dir, run_id, profile, auto_roi)
+    if not (bundle / META_FILE).exists():
+        detect_anomalies(str(base), str(maint), profile=profile, auto_roi=auto_roi,
+                         out_arrays_dir=str(bundle))
+    return bundle
+
+
+# -- stage B -----------------------------------------------------------------
+def run_features(bundle, t_pots: Iterable[float]) -> Dict[float, Dict[str, np.ndarray]]:
+    """Stage B: blob rule inputs of one run for each t_pot."""
+    arrays = load_run_arrays(bundle)
+    dE = np.asarray(arrays['dE'])
+    aligned = np.asarray(arrays['aligned'])
+    abs_hot = np.asarray(arrays['abs_hot_mask'])
+    scale = get_profile(arrays['meta']['profile']).skeleton_scale
+    hsv = to_hsv(aligned)
+    hot = hot_color_mask(hsv)
+    out = {}
+    for t_pot in t_pots:
+        mask = morphology_clean(cv.bitwise_and(hot, cv.compare(dE, t_pot, cv.CMP_GE)))
+        props = blob_props(mask, dE, hsv)
+        skel, _ = build_wire_skeleton(aligned, mask, scale=scale, regions=skeleton_regions(props))
+        endpoints, junctions = find_skeleton_nodes(skel)
+        out[t_pot] = blob_features(props, skel, endpoints + junctions, mask, abs_hot)
+    return out
+
+
+def _stage_b(args):
+    bundle, t_pots = args
+    return run_features(bundle, t_pots)
+
+
+# -- grid --------------------------------------------------------------------
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of the grid; unknown keys raise ValueError."""
+    unknown = set(grid) - set(THRESHOLD_KEYS) - set(PARAM_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameter(s): {', '.join(sorted(unknown))}")
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _run_thresholds(meta: Dict[str, Any], point: Dict[str, Any]) -> Tuple[float, float]:
+    t_pot, t_fault, *_ = adaptive_thresholds(meta['meanSsim'], meta['histCorr'],
+                                             point.get('slider_percent'))
+    if point.get('t_pot') is not None:
+        t_pot = float(point['t_pot'])
+    if point.get('t_fault') is not None:
+        t_fault = float(point['t_fault'])
+    return t_pot, t_fault
+
+
+def _params(point: Dict[str, Any]) -> ClassifierParams:
+    kw = {k: (tuple(v) if isinstance(v, list) else v) for k, v in point.items() if k in PARAM_KEYS}
+    return replace(DEFAULT_PARAMS, **kw)
+
+
+def _counts(codes: np.ndarray, names) -> Dict[str, int]:
+    counts = np.bincount(codes, minlength=len(names))
+    return {name: int(c) for name, c in zip(names, counts)}
+
+
+def sweep(runs: List[Tuple[str, Path, Path]], grid: Dict[str, List[Any]],
+          cache_dir=DEFAULT_CACHE_DIR, profile=None, auto_roi=None,
+          workers: int | None = None) -> Dict[str, Any]:
+    """Evaluate every grid point over every run; label counts and per-run diffs
+    against the reference point (default parameters, adaptive thresholds)."""
+    points = expand_grid(grid)
+    reference = {}
+    workers = workers or os.cpu_count() or 1
+    timings = {}
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        bundles = list(ex.map(prepare_run, runs, itertools.repeat(cache_dir),
+                              itertools.repeat(profile), itertools.repeat(auto_roi)))
+    metas = [load_run_arrays(b)['meta'] for b in bundles]
+    timings['stageA_s'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    thresholds = [[_run_thresholds(m, p) for m in metas] for p in [reference] + points]
+    t_pots = [sorted({th[i][0] for th in thresholds}) for i in range(len(runs))]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        feats = list(ex.map(_stage_b, zip(bundles, t_pots)))
+    timings['stageB_s'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    concat_cache: Dict[Tuple[float, ...], Tuple[Dict[str, np.ndarray], np.ndarray]] = {}
+
+    def evaluate(point, point_thresholds):
+        key = tuple(t for t, _ in point_thresholds)
+        if key not in concat_cache:
+            # No runs: the empty feature arrays of no blobs
+            per_run = [feats[i][t] for i, t in enumerate(key)] or [blob_features([], None, [], None, None)]
+            run_idx = np.concatenate([np.full(len(f['h']), i) for i, f in enumerate(per_run)])
+            concat_cache[key] = ({k: np.concatenate([f[k] for f in per_run]) for k in per_run[0]},
+                                 run_idx.astype(np.intp))
+        blob_feats, run_idx = concat_cache[key]
+        t_pot = np.array(key)[run_idx]
+        t_fault = np.array([t for _, t in point_thresholds])[run_idx]
+        label, subtype = classify_blobs(blob_feats, t_fault, t_pot, _params(point))
+        run_label = np.zeros(len(runs), np.int8)
+        np.maximum.at(run_label, run_idx, label)
+        return label, subtype, run_label
+
+    ref_blob_label, _, ref_label = evaluate(reference, thresholds[0])
+    results = []
+    for point, point_thresholds in zip(points, thresholds[1:]):
+        label, subtype, run_label = evaluate(point, point_thresholds)
+        changed = np.flatnonzero(run_label != ref_label)
+        results.append({
+            'params': point,
+            'labels': _counts(run_label, LABELS),
+            'blobLabels': _counts(label, LABELS),
+            'subtypes': _counts(subtype[label > 0], SUBTYPES),
+            'changed': [{'runId': runs[i][0], 'from': LABELS[ref_label[i]],
+                         'to': LABELS[run_label[i]]} for i in changed],
+        })
+    timings['stageC_s'] = time.perf_counter() - t0
+
+    return {
+        'runs': len(runs),
+        'gridPoints': len(points),
+        'reference': {
+            'labels': _counts(ref_label, LABELS),
+            'blobLabels': _counts(ref_blob_label, LABELS),
+            'perRun': {runs[i][0]: LABELS[ref_label[i]] for i in range(len(runs))},
+        },
+        'results': results,
+        'timings': timings,
+    }
+
+
+def verify(runs, cache_dir=DEFAULT_CACHE_DIR, profile=None, auto_roi=None) -> List[str]:
+    """Run ids whose replayed reference labels differ from detect_anomalies (should be empty)."""
+    mismatched = []
+    for run in runs:
+        bundle = prepare_run(run, cache_dir, profile, auto_roi)
+        meta = load_run_arrays(bundle)['meta']
+        t_pot, t_fault = _run_thresholds(meta, {})
+        label, subtype = classify_blobs(run_features(bundle, [t_pot])[t_pot], t_fault, t_pot)
+        rep = detect_anomalies(str(run[1]), str(run[2]), profile=profile, auto_roi=auto_roi)
+        got = [(LABELS[l], SUBTYPES[s]) for l, s in zip(label, subtype)]
+        if got != [(b.classification, b.subtype) for b in rep.blobs]:
+            mismatched.append(run[0])
+    return mismatched
+
+
+def _cli() -> int:
+    parser = argparse.ArgumentParser(description="Replay stored runs over a threshold / classifier grid")
+    parser.add_argument("--root", default="inspections", help="Inspections root")
+    parser.add_argument("--grid", help="JSON file mapping parameters to candidate values")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Stage A bundle cache")
+    parser.add_argument("--profile", help="Pipeline profile used for stage A")
+    parser.add_argument("--auto-roi", action="store_true", default=None)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--limit", type=int, help="Only replay the first N runs")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check replayed reference labels against detect_anomalies")
+    parser.add_argument("--output", help="Write the sweep JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    runs = discover_runs(args.root)[:args.limit]
+    if not runs:
+        print(f"No runs with baseline and maintenance images under {args.root}", file=sys.stderr)
+        return 2
+    if args.verify:
+        bad = verify(runs, args.cache_dir, args.profile, args.auto_roi)
+        print(json.dumps({"runs": len(runs), "mismatched": bad}, indent=2))
+        return 1 if bad else 0
+    grid = {}
+    if args.grid:
+        with open(args.grid, encoding="utf-8") as f:
+            grid = json.load(f)
+    result = sweep(runs, grid, args.cache_dir, args.profile, args.auto_roi, args.workers)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
@@ -0,0 +1,112 @@
+"""Baseline region-of-interest (ROI) detection.
+
+The palette legend, overlay text and uniform background margins never carry
+anomalies, yet every per-pixel stage used to process them. `detect_roi` finds
+the rectangle that excludes them once per baseline; `cached_roi` memoizes it by
+baseline content digest so later inspections of the same transformer skip the
+detection entirely.
+"""
+from collections import OrderedDict
+from typing import Tuple
+import threading
+import cv2 as cv
+import numpy as np
+
+from .io_utils import image_digest
+
+LEGEND_STRIP = 0.20   # legend is searched in the outer 20% of columns on each side
+LEGEND_RUN = 0.40     # a legend edge is a straight vertical step spanning >= 40% of the height
+LEGEND_STEP = 40      # min per-channel intensity step across a legend edge
+LEGEND_PAD = 0.01     # extra cut past the legend edge (fraction of width); camera shifts move it
+BG_TOL = 12           # max per-channel deviation from the border colour for background
+BG_NOISE = 0.001      # a row/column may hold this fraction of non-background pixels
+MARGIN = 0.02         # padding added back around the trimmed rectangle (fraction of size)
+
+ROI_CACHE_SIZE = 128
+
+_cache: "OrderedDict[str, Tuple[int,int,int,int]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _longest_true_run(mask: np.ndarray) -> np.ndarray:
+    """Longest vertical run of True per column of a 2D bool array."""
+    run = np.zeros(mask.shape[1], np.int32)
+    best = np.zeros(mask.shape[1], np.int32)
+    for row in mask:
+        run = (run + 1) * row
+        np.maximum(best, run, out=best)
+    return best
+
+
+def _legend_bounds(bgr) -> Tuple[int, int]:
+    """Return [x0, x1) left after cutting a legend found near either border."""
+    H, W = bgr.shape[:2]
+    strip = max(1, int(LEGEND_STRIP * W))
+    pad = int(LEGEND_PAD * W)
+    x0, x1 = 0, W
+    for lo, hi in ((0, strip), (W - strip - 1, W - 1)):
+        a = bgr[:, lo:hi].astype(np.int16)
+        b = bgr[:, lo + 1:hi + 1].astype(np.int16)
+        step = np.abs(a - b).max(axis=2) >= LEGEND_STEP   # edge between x and x+1
+        cols = np.flatnonzero(_longest_true_run(step) >= LEGEND_RUN * H) + lo
+        if cols.size == 0:
+            continue
+        if lo == 0:
+            x0 = int(cols.max()) + 1 + pad
+        else:
+            x1 = int(cols.min()) + 1 - pad
+    return x0, x1
+
+
+def _leading(flags: np.ndarray) -> int:
+    idx = np.flatnonzero(~flags)
+    return int(idx[0]) if idx.size else len(flags)
+
+
+def _background_bounds(bgr) -> Tuple[int, int, int, int]:
+    """Trim border rows/columns that hold only the border colour or overlay text."""
+    H, W = bgr.shape[:2]
+    img = bgr.astype(np.int16)
+    border = np.concatenate([img[0], img[-1], img[:, 0], img[:, -1]])
+    ref = np.median(border, axis=0)
+    hsv = cv.cvtColor(bgr, cv.COLOR_BGR2HSV)
+    overlay = (hsv[..., 1] <= 40) & ((hsv[..., 2] >= 200) | (hsv[..., 2] <= 30))
+    content = (np.abs(img - ref).max(axis=2) > BG_TOL) & ~overlay
+    rows = content.sum(axis=1) <= max(2, BG_NOISE * W)
+    cols = content.sum(axis=0) <= max(2, BG_NOISE * H)
+    top, left = _leading(rows), _leading(cols)
+    if top == H or left == W:   # nothing but background
+        return 0, 0, W, H
+    bottom = H - _leading(rows[::-1])
+    right = W - _leading(cols[::-1])
+    return left, top, right, bottom
+
+
+def detect_roi(base_bgr) -> Tuple[int, int, int, int]:
+    """Return the processing rectangle (x, y, w, h) for a baseline image."""
+    H, W = base_bgr.shape[:2]
+    lx0, lx1 = _legend_bounds(base_bgr)
+    if lx1 - lx0 < W // 2:   # implausible legend, keep the full width
+        lx0, lx1 = 0, W
+    l, t, r, b = _background_bounds(base_bgr[:, lx0:lx1])
+    mx, my = int(MARGIN * W), int(MARGIN * H)
+    x0 = max(lx0, lx0 + l - mx)
+    x1 = min(lx1, lx0 + r + mx)
+    y0 = max(0, t - my)
+    y1 = min(H, b + my)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def cached_roi(base_bgr, key: str | None = None) -> Tuple[int, int, int, int]:
+    """detect_roi memoized by baseline content digest (or an explicit key)."""
+    key = key or image_digest(base_bgr)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    roi = detect_roi(base_bgr)
+    with _lock:
+        _cache[key] = roi
+        while len(_cache) > ROI_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return roi
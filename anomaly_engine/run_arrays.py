@@ -0,0 +1,67 @@
+"""Per-run analysis array bundles.
+
+A detection can persist its intermediate arrays next to the run so offline
+re-analysis, audits and threshold tuning do not have to redo alignment and
+CIEDE2000. A bundle is a directory of uncompressed `.npy` files
+
+    dE.npy               float32 (H, W)     colour difference (CIEDE2000 / CIE94)
+    aligned.npy          uint8 (H, W, 3)    maintenance image warped onto the baseline
+    hot_mask.npy         uint8 (H, W)       cleaned hot AND deltaE >= t_pot mask
+    abs_hot_mask.npy     uint8 (H, W)       absolute-hot mask
+    skeleton.npy         uint8 (H, W)       wire skeleton
+    warp.npy             float32 (2,3)|(3,3)
+
+plus `meta.json` (thresholds, gating statistics, ROI offset, profile), which
+is written last and marks the bundle complete. Arrays cover the processed
+region: with an ROI crop, pixel (x, y) of a bundle array is (x + roi.x,
+y + roi.y) in the baseline frame.
+
+`load_run_arrays(path)` memory-maps every array (np.load(mmap_mode='r')), so
+slicing a region reads only the pages it touches.
+"""
+from pathlib import Path
+from typing import Any, Dict
+import json
+import os
+import numpy as np
+
+BUNDLE_VERSION = 1
+META_FILE = 'meta.json'
+ARRAY_NAMES = ('dE', 'aligned', 'hot_mask', 'abs_hot_mask', 'skeleton', 'warp')
+
+
+def save_run_arrays(path, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> Path:
+    """Write a bundle; an existing bundle at path is replaced array by array."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    meta_path = path / META_FILE
+    if meta_path.exists():
+        meta_path.unlink()   # incomplete until the new meta is written
+    for name, arr in arrays.items():
+        tmp = path / f'.{name}.tmp.npy'
+        np.save(tmp, np.ascontiguousarray(arr))
+        os.replace(tmp, path / f'{name}.npy')
+    meta = {**meta, 'bundleVersion': BUNDLE_VERSION, 'arrays': sorted(arrays)}
+    tmp = path / f'.{META_FILE}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, meta_path)
+    return path
+
+
+def load_run_arrays(path, mmap: bool = True) -> Dict[str, Any]:
+    """Bundle arrays (memory-mapped unless mmap=False) and its metadata under 'meta'.
+
+    Raises FileNotFoundError when the bundle is missing or incomplete.
+    """
+    path = Path(path)
+    with open(path / META_FILE, encoding='utf-8') as f:
+        meta = json.load(f)
+    out: Dict[str, Any] = {'meta': meta}
+    for name in meta['arrays']:
+        out[name] = np.load(path / f'{name}.npy', mmap_mode='r' if mmap else None)
+    return out
+
+
+def bundle_bytes(path) -> int:
+    return sum(p.stat().st_size for p in Path(path).glob('*.npy'))
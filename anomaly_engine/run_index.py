@@ -0,0 +1,295 @@
+"""SQLite index over stored inspection runs.
+
+The JSON layout (`<inspection>/index.json` plus per-run `report.json` and
+`anomalies.json`) is the source of truth, but answering "all Faulty runs of
+transformer X last month" from it means parsing every file. `RunIndex`
+mirrors it into one SQLite file with indexed tables
+
+    inspections(inspection_id, transformer_id, dir)
+    runs(run_id, inspection_id, transformer_id, timestamp, label, thresholds, warp, ...)
+    anomalies(run_id, idx, severity, subtype, severity_score, bbox, deltaE, ...)
+
+Ingest is incremental and append-only: an `index.json` is only re-read when its
+size or mtime changed, and runs already indexed are never rewritten. Run
+directories are stored relative to the inspections root with forward slashes;
+the Windows-style paths embedded in the JSON files are not used. The
+`inspection_logs/` mirror is skipped.
+
+CLI:
+python -m anomaly_engine.run_index ingest --root inspections
+python -m anomaly_engine.run_index query --transformer 1759682386388 --label Faulty --since 2025-10-01
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List
+import argparse
+import json
+import sqlite3
+import threading
+
+SCHEMA_VERSION = 1
+DEFAULT_DB_NAME = 'runs.sqlite'
+MIRROR_DIR = 'inspection_logs'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS ingested (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS inspections (
+    inspection_id TEXT PRIMARY KEY, transformer_id TEXT, dir TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    inspection_id TEXT NOT NULL,
+    transformer_id TEXT,
+    timestamp TEXT,
+    image_level_label TEXT,
+    num_anomalies INTEGER,
+    slider_percent REAL,
+    baseline_source_type TEXT,
+    mean_ssim REAL,
+    t_pot REAL, t_fault REAL, base_t_pot REAL, base_t_fault REAL,
+    scale_applied REAL, ratio REAL, threshold_source TEXT,
+    warp_model TEXT, warp_success INTEGER, warp_score REAL,
+    run_dir TEXT
+);
+CREATE TABLE IF NOT EXISTS anomalies (
+    run_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    anomaly_id TEXT,
+    severity TEXT,
+    subtype TEXT,
+    severity_score REAL,
+    confidence REAL,
+    x INTEGER, y INTEGER, w INTEGER, h INTEGER,
+    area INTEGER, mean_delta_e REAL, peak_delta_e REAL, elongation REAL,
+    source TEXT, comment TEXT,
+    PRIMARY KEY (run_id, idx)
+);
+CREATE INDEX IF NOT EXISTS runs_transformer_time ON runs (transformer_id, timestamp);
+CREATE INDEX IF NOT EXISTS runs_label_time ON runs (image_level_label, timestamp);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (timestamp);
+CREATE INDEX IF NOT EXISTS anomalies_subtype ON anomalies (subtype, severity_score);
+CREATE INDEX IF NOT EXISTS anomalies_severity ON anomalies (severity, severity_score);
+"""
+
+_RUN_COLUMNS = ('run_id', 'inspection_id', 'transformer_id', 'timestamp', 'image_level_label',
+                'num_anomalies', 'slider_percent', 'baseline_source_type', 'mean_ssim',
+                't_pot', 't_fault', 'base_t_pot', 'base_t_fault', 'scale_applied', 'ratio',
+                'threshold_source', 'warp_model', 'warp_success', 'warp_score', 'run_dir')
+_ANOMALY_COLUMNS = ('run_id', 'idx', 'anomaly_id', 'severity', 'subtype', 'severity_score',
+                    'confidence', 'x', 'y', 'w', 'h', 'area', 'mean_delta_e', 'peak_delta_e',
+                    'elongation', 'source', 'comment')
+
+
+def _timestamp(value: str | None) -> str | None:
+    """ISO 8601 without the trailing Z, so plain string comparison orders it."""
+    return value[:-1] if value and value.endswith('Z') else value
+
+
+def _load_json(path: Path) -> Dict[str, Any] | None:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _anomaly_rows(run_id: str, anomalies: Dict[str, Any] | None,
+                  report: Dict[str, Any] | None) -> List[tuple]:
+    """One row per anomaly; AI entries ("ai_<n>") are joined to report blob n-1."""
+    blobs = (report or {}).get('blobs', [])
+    entries = (anomalies or {}).get('anomalies')
+    if entries is None:   # no anomalies.json: index the detector output directly
+        entries = [{'id': f'ai_{i + 1}', 'x': b['bbox'][0], 'y': b['bbox'][1], 'w': b['bbox'][2],
+                    'h': b['bbox'][3], 'confidence': b.get('confidence'),
+                    'severity': b.get('classification'), 'classification': b.get('subtype'),
+                    'source': 'ai'} for i, b in enumerate(blobs)]
+    rows = []
+    for idx, a in enumerate(entries):
+        blob = {}
+        aid = str(a.get('id', ''))
+        if aid.startswith('ai_') and aid[3:].isdigit() and int(aid[3:]) <= len(blobs):
+            blob = blobs[int(aid[3:]) - 1]
+        rows.append((run_id, idx, aid, a.get('severity'), a.get('classification'),
+                     blob.get('severity'), a.get('confidence'),
+                     a.get('x'), a.get('y'), a.get('w'), a.get('h'),
+                     blob.get('area'), blob.get('mean_deltaE'), blob.get('peak_deltaE'),
+                     blob.get('elongation'), a.get('source'), a.get('comment')))
+    return rows
+
+
+class RunIndex:
+    def __init__(self, root='inspections', db_path=None):
+        self.root = Path(root)
+        self.db_path = Path(db_path) if db_path is not None else self.root / DEFAULT_DB_NAME
+        self._ingest_lock = threading.Lock()   # service threads ingest one at a time
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+            db.execute("INSERT OR IGNORE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+    @contextmanager
+    def _connect(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.db_path)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute('PRAGMA journal_mode=WAL')
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # -- ingest ------------------------------------------------------------
+    def _index_files(self) -> List[Path]:
+        return sorted(p for p in self.root.glob('*/index.json') if p.parent.name != MIRROR_DIR)
+
+    def ingest(self) -> Dict[str, int]:
+        """Index runs added since the last ingest (unchanged index.json files are skipped)."""
+        summary = dict(index_files=0, skipped=0, runs_added=0, anomalies_added=0)
+        with self._ingest_lock, self._connect() as db:
+            for index_path in self._index_files():
+                summary['index_files'] += 1
+                st = index_path.stat()
+                rel = index_path.relative_to(self.root).as_posix()
+                seen = db.execute('SELECT size, mtime_ns FROM ingested WHERE path = ?', (rel,)).fetchone()
+                if seen is not None and (seen['size'], seen['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+                    summary['skipped'] += 1
+                    continue
+                runs, anomalies = self._ingest_inspection(db, index_path)
+                summary['runs_added'] += runs
+                summary['anomalies_added'] += anomalies
+                db.execute('INSERT OR REPLACE INTO ingested VALUES (?, ?, ?)',
+                           (rel, st.st_size, st.st_mtime_ns))
+        return summary
+
+    def _ingest_inspection(self, db, index_path: Path):
+        index = _load_json(index_path)
+        if index is None:
+            return 0, 0
+        insp_dir = index_path.parent
+        inspection_id = str(index.get('inspection_id', insp_dir.name))
+        known = {r[0] for r in db.execute('SELECT run_id FROM runs WHERE inspection_id = ?',
+                                          (inspection_id,))}
+        transformer_id = None
+        n_runs = n_anomalies = 0
+        for entry in index.get('runs', []):
+            run_id = entry.get('run_id')
+            if not run_id or run_id in known:
+                continue
+            run_dir = insp_dir / 'runs' / run_id
+            report = _load_json(run_dir / 'report.json') or {}
+            anomalies = _load_json(run_dir / 'anomalies.json')
+            thr = entry.get('thresholdsUsed') or report.get('thresholds_used') or {}
+            transformer_id = str(report.get('transformer_id') or inspection_id)
+            warp_success = report.get('warp_success')
+            row = (run_id, inspection_id, transformer_id, _timestamp(entry.get('timestamp')),
+                   entry.get('image_level_label', report.get('image_level_label')),
+                   entry.get('num_anomalies'), entry.get('slider_percent'),
+                   entry.get('baseline_source_type'), thr.get('mean_ssim', report.get('mean_ssim')),
+                   thr.get('t_pot'), thr.get('t_fault'), thr.get('base_t_pot'), thr.get('base_t_fault'),
+                   thr.get('scale_applied'), thr.get('ratio'), thr.get('source'),
+                   report.get('warp_model'), None if warp_success is None else int(warp_success),
+                   report.get('warp_score'), run_dir.relative_to(self.root).as_posix())
+            db.execute(f"INSERT OR IGNORE INTO runs ({', '.join(_RUN_COLUMNS)}) "
+                       f"VALUES ({', '.join('?' * len(_RUN_COLUMNS))})", row)
+            rows = _anomaly_rows(run_id, anomalies, report)
+            db.executemany(f"INSERT OR IGNORE INTO anomalies ({', '.join(_ANOMALY_COLUMNS)}) "
+                           f"VALUES ({', '.join('?' * len(_ANOMALY_COLUMNS))})", rows)
+            n_runs += 1
+            n_anomalies += len(rows)
+        db.execute('INSERT INTO inspections VALUES (?, ?, ?) ON CONFLICT (inspection_id) '
+                   'DO UPDATE SET transformer_id = COALESCE(excluded.transformer_id, transformer_id)',
+                   (inspection_id, transformer_id, insp_dir.relative_to(self.root).as_posix()))
+        return n_runs, n_anomalies
+
+    # -- queries -------------------------------------------------------------
+    def query_runs(self, transformer: str | None = None, label: str | None = None,
+                   subtype: str | None = None, since: str | None = None, until: str | None = None,
+                   min_severity: float | None = None, limit: int | None = None) -> List[Dict[str, Any]]:
+        """Runs matching every given filter, newest first.
+
+        since/until are ISO 8601 prefixes (until is exclusive); subtype and
+        min_severity (anomaly severity score, 0-100) match runs that have at
+        least one such anomaly.
+        """
+        where, args = [], []
+        if transformer is not None:
+            where.append('r.transformer_id = ?')
+            args.append(transformer)
+        if label is not None:
+            where.append('r.image_level_label = ?')
+            args.append(label)
+        if since is not None:
+            where.append('r.timestamp >= ?')
+            args.append(_timestamp(since))
+        if until is not None:
+            where.append('r.timestamp < ?')
+            args.append(_timestamp(until))
+        if subtype is not None or min_severity is not None:
+            sub, sub_args = ['a.run_id = r.run_id'], []
+            if subtype is not None:
+                sub.append('a.subtype = ?')
+                sub_args.append(subtype)
+            if min_severity is not None:
+                sub.append('a.severity_score >= ?')
+                sub_args.append(float(min_severity))
+            where.append(f"EXISTS (SELECT 1 FROM anomalies a WHERE {' AND '.join(sub)})")
+            args.extend(sub_args)
+        sql = 'SELECT r.* FROM runs r'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY r.timestamp DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(int(limit))
+        with self._connect() as db:
+            return [dict(row) for row in db.execute(sql, args)]
+
+    def get_run(self, run_id: str) -> Dict[str, Any] | None:
+        """One run with its anomalies, or None."""
+        with self._connect() as db:
+            row = db.execute('SELECT * FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+            if row is None:
+                return None
+            run = dict(row)
+            run['anomalies'] = [dict(a) for a in db.execute(
+                'SELECT * FROM anomalies WHERE run_id = ? ORDER BY idx', (run_id,))]
+        return run
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as db:
+            return {t: db.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0]
+                    for t in ('inspections', 'runs', 'anomalies')}
+
+
+def _cli() -> int:
+    parser = argparse.ArgumentParser(description="SQLite index over inspection runs")
+    parser.add_argument("command", choices=["ingest", "query", "show"])
+    parser.add_argument("--root", default="inspections", help="Inspections root")
+    parser.add_argument("--db", help=f"Index file (default: <root>/{DEFAULT_DB_NAME})")
+    parser.add_argument("--transformer")
+    parser.add_argument("--label", help="Image-level label, e.g. Faulty")
+    parser.add_argument("--subtype", help="Anomaly subtype, e.g. LooseJoint")
+    parser.add_argument("--since", help="ISO 8601 start (inclusive)")
+    parser.add_argument("--until", help="ISO 8601 end (exclusive)")
+    parser.add_argument("--min-severity", type=float, help="Minimum anomaly severity score")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--run-id", help="show: run to print")
+    args = parser.parse_args()
+
+    index = RunIndex(args.root, args.db)
+    if args.command == "ingest":
+        result: Any = {**index.ingest(), **index.counts()}
+    elif args.command == "show":
+        result = index.get_run(args.run_id)
+    else:
+        result = index.query_runs(args.transformer, args.label, args.subtype, args.since,
+                                  args.until, args.min_severity, args.limit)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
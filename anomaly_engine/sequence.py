@@ -0,0 +1,181 @@
+"""Streaming inspection of thermal video or frame sequences against one baseline.
+
+Frames come from a local video file, a printf-style image pattern
+(`frames/%04d.png`, both read with `cv.VideoCapture`) or a directory of
+images (sorted by name). The baseline's features are computed once
+(`baselines.compute_features`); each processed frame goes through
+`detection.detect_frame` with ECC seeded from the previous processed frame's
+warp, so a slowly moving camera converges in a few iterations instead of
+re-aligning from the identity. A seed is accepted while it keeps 90% of the
+correlation of the last identity convergence (or of a better seeded frame).
+
+A frame whose downscaled grey thumbnail differs from the last processed one
+by less than `min_change` grey levels (mean absolute difference) is skipped
+as a near-duplicate. Results are yielded one `FrameResult` per frame; only
+the current frame, the previous thumbnail and warp, and the worker's buffer
+pool are held, so memory does not grow with the length of the sequence.
+
+CLI:
+python -m anomaly_engine.sequence --baseline baseline.png --source survey.mp4 --output frames.jsonl
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+import argparse
+import json
+import sys
+import time
+import cv2 as cv
+import numpy as np
+
+from .baselines import compute_features
+from .data_structures import DetectionReport
+from .detection import detect_frame, report_dict
+from .io_utils import read_bgr, to_gray
+from .profiles import PROFILES, PipelineProfile
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+THUMB_WIDTH = 64         # near-duplicate test runs on thumbnails this wide
+MIN_CHANGE = 1.0         # mean |Δgrey| (0-255) below which a frame is a near-duplicate
+
+
+@dataclass
+class FrameResult:
+    index: int                         # frame number in the source (0-based)
+    timestamp_ms: float                # position in the video; 0 for image sequences
+    report: Optional[DetectionReport]  # None when skipped
+    skipped: bool
+    change: float                      # mean |Δgrey| of the thumbnail vs the last processed frame
+    elapsed_ms: float
+
+
+def iter_frames(source: str, stride: int = 1) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """(index, timestamp_ms, bgr) for every `stride`-th frame of a video, pattern or directory."""
+    stride = max(1, int(stride))
+    path = Path(source)
+    if path.is_dir():
+        images = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for index in range(0, len(images), stride):
+            yield index, 0.0, read_bgr(str(images[index]))
+        return
+    cap = cv.VideoCapture(source)
+    if not cap.isOpened():
+        raise FileNotFoundError(source)
+    try:
+        index = 0
+        while True:
+            if index % stride:
+                if not cap.grab():
+                    break
+            else:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                yield index, float(cap.get(cv.CAP_PROP_POS_MSEC)), frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def _thumbnail(bgr: np.ndarray) -> np.ndarray:
+    h, w = bgr.shape[:2]
+    size = (THUMB_WIDTH, max(1, round(h * THUMB_WIDTH / w)))
+    return cv.resize(to_gray(bgr), size, interpolation=cv.INTER_AREA).astype(np.int16)
+
+
+def detect_sequence(baseline_path: str, source: str,
+                    slider_percent: float | None = None,
+                    profile: str | PipelineProfile | None = None,
+                    auto_roi: bool | None = None,
+                    memory_budget_mb: float | None = None,
+                    stride: int = 1,
+                    min_change: float = MIN_CHANGE,
+                    reuse_warp: bool = True) -> Iterator[FrameResult]:
+    """Yield a FrameResult per frame of `source`, compared against `baseline_path`.
+
+    min_change=0 processes every frame; reuse_warp=False aligns every frame
+    from the identity (the per-frame `detect_anomalies` behaviour).
+    """
+    baseline = compute_features(read_bgr(baseline_path), baseline_id=baseline_path)
+    last_thumb = None
+    warp = cc = None
+    for index, timestamp_ms, frame in iter_frames(source, stride):
+        t0 = time.perf_counter()
+        thumb = _thumbnail(frame)
+        change = float('inf') if last_thumb is None else float(np.mean(np.abs(thumb - last_thumb)))
+        if change < min_change:
+            yield FrameResult(index, timestamp_ms, None, True, change,
+                              (time.perf_counter() - t0) * 1000.0)
+            continue
+        report, new_warp = detect_frame(
+            baseline, frame, frame_label=f"{source}#{index}",
+            init_warp=warp if reuse_warp else None, init_cc=cc,
+            slider_percent=slider_percent, profile=profile, auto_roi=auto_roi,
+            memory_budget_mb=memory_budget_mb,
+        )
+        # Only an ECC warp seeds the next frame (not a homography or a failed alignment).
+        # The reference cc comes from the last identity convergence and is only raised
+        # by a seeded frame, so accepted seeds cannot lower the floor frame after frame.
+        if report.warp_init == 'identity' or (report.warp_init == 'seeded' and report.warp_score >= cc):
+            warp, cc = new_warp, report.warp_score
+        elif report.warp_init == 'seeded':
+            warp = new_warp
+        else:
+            warp = cc = None
+        last_thumb = thumb
+        yield FrameResult(index, timestamp_ms, report, False, change,
+                          (time.perf_counter() - t0) * 1000.0)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect a thermal video / frame sequence against one baseline")
+    parser.add_argument('--baseline', required=True, help="Baseline image")
+    parser.add_argument('--source', required=True, help="Video file, printf image pattern or image directory")
+    parser.add_argument('--output', help="JSONL output, one line per frame (reports for processed frames)")
+    parser.add_argument('--stride', type=int, default=1, help="Read every Nth frame")
+    parser.add_argument('--min-change', type=float, default=MIN_CHANGE,
+                        help="Skip frames whose thumbnail changed less than this (mean grey levels; 0 = never)")
+    parser.add_argument('--no-reuse-warp', action='store_true', help="Align every frame from the identity")
+    parser.add_argument('--slider-percent', type=float)
+    parser.add_argument('--profile', choices=sorted(PROFILES))
+    parser.add_argument('--auto-roi', action='store_true', default=None)
+    parser.add_argument('--memory-budget-mb', type=float)
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else None
+    processed = skipped = 0
+    t0 = time.perf_counter()
+    try:
+        for res in detect_sequence(args.baseline, args.source, args.slider_percent, args.profile,
+                                   args.auto_roi, args.memory_budget_mb, stride=args.stride,
+                                   min_change=args.min_change, reuse_warp=not args.no_reuse_warp):
+            if res.skipped:
+                skipped += 1
+                status = f"skipped (change {res.change:.2f})"
+            else:
+                processed += 1
+                rep = res.report
+                status = (f"{rep.image_level_label} blobs={len(rep.blobs)} "
+                          f"warp_score={rep.warp_score:.3f} {res.elapsed_ms:.0f} ms")
+            print(f"frame {res.index} @ {res.timestamp_ms:.0f} ms: {status}")
+            if out is not None:
+                out.write(json.dumps({
+                    'frame': res.index, 'timestampMs': res.timestamp_ms, 'skipped': res.skipped,
+                    'change': None if res.change == float('inf') else res.change,
+                    'elapsedMs': res.elapsed_ms,
+                    'report': report_dict(res.report) if res.report is not None else None,
+                }) + '\n')
+    except FileNotFoundError as exc:
+        print(f"Cannot open {exc}", file=sys.stderr)
+        return 2
+    finally:
+        if out is not None:
+            out.close()
+    wall = time.perf_counter() - t0
+    print(f"{processed} processed, {skipped} skipped in {wall:.1f} s "
+          f"({(processed + skipped) / wall if wall > 0 else 0.0:.2f} frames/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,243 @@
+"""Synthetic thermal baseline/maintenance pairs with ground truth.
+
+Scenes are drawn in HSV with a palette whose hot hues fall inside the bands of
+`color_metrics.hot_color_mask`: a cool background with smooth texture, a
+wire network (jittered grid with dropped segments, so it has junctions, bends
+and dead ends) and, in the maintenance frame only, hotspots of known subtype:
+
+- PointOverload     short hot section in the middle of a wire segment
+- LooseJoint        spot centred on a junction or wire end
+- FullWireOverload  a whole segment between two joints heated
+
+Red/orange hotspots are labelled Faulty and yellow ones Potentially Faulty;
+a heated wire is Potentially Faulty as in `classify_blob_enhanced`. The
+maintenance frame is then moved by a camera transform (shift, rotation,
+scale) and both frames get independent sensor noise. Ground-truth boxes are
+in baseline coordinates, like detection output, in the `anomalies.json`
+layout.
+
+CLI:
+python -m anomaly_engine.synthetic --out synthetic/ --count 4 --width 3840 --height 2160 --point-overloads 120
+"""
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import argparse
+import json
+import cv2 as cv
+import numpy as np
+
+from .color_metrics import _HOT_RANGES
+
+
+@dataclass(frozen=True)
+class Palette:
+    """HSV colours (OpenCV ranges). Hot hues are validated against hot_color_mask."""
+    background: Tuple[int, int, int] = (125, 200, 80)   # V is modulated by the texture
+    wire: Tuple[int, int, int] = (100, 150, 150)
+    faulty_hues: Tuple[int, ...] = (4, 176, 18)         # red, red (wrap-around), orange
+    potential_hues: Tuple[int, ...] = (30,)             # yellow
+    hot_saturation: int = 230
+    hot_value: int = 245
+
+    def __post_init__(self):
+        def in_bands(h, bands):
+            return any(lo[0] <= h <= hi[0] and self.hot_saturation >= lo[1]
+                       and self.hot_value >= lo[2] for lo, hi in bands)
+        red_orange, yellow = _HOT_RANGES[:3], _HOT_RANGES[3:]
+        for h in self.faulty_hues:
+            if not in_bands(h, red_orange):
+                raise ValueError(f"faulty hue {h} is outside the red/orange hot bands")
+        for h in self.potential_hues:
+            if not in_bands(h, yellow):
+                raise ValueError(f"potential hue {h} is outside the yellow hot band")
+
+
+@dataclass(frozen=True)
+class SceneConfig:
+    width: int = 1280
+    height: int = 960
+    wire_spacing: int | None = None       # mean node spacing (default: min(W, H) / 10)
+    wire_thickness: int | None = None     # default: spacing / 16, at least 2
+    wire_keep: float = 0.8                # probability that a grid segment is drawn
+    point_overloads: int = 4
+    loose_joints: int = 2
+    full_wire_overloads: int = 1
+    potential_fraction: float = 0.3       # share of hotspots drawn yellow
+    shift: Tuple[float, float] = (3.0, 2.0)
+    rotation_deg: float = 0.0
+    scale: float = 1.0
+    noise_sigma: float = 2.0
+    texture: float = 30.0                 # background V texture amplitude
+    palette: Palette = field(default_factory=Palette)
+    seed: int = 0
+
+
+def mixed_scene(width: int, height: int, hotspots: int, seed: int = 0, **kw) -> SceneConfig:
+    """SceneConfig with `hotspots` split 60/25/15 over point / joint / full-wire."""
+    joints = round(hotspots * 0.25)
+    wires = round(hotspots * 0.15)
+    return SceneConfig(width=width, height=height, point_overloads=hotspots - joints - wires,
+                       loose_joints=joints, full_wire_overloads=wires, seed=seed, **kw)
+
+
+@dataclass
+class SyntheticPair:
+    baseline: np.ndarray        # BGR
+    maintenance: np.ndarray     # BGR
+    ground_truth: Dict[str, Any]
+
+    def save(self, out_dir) -> Path:
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        cv.imwrite(str(out_dir / 'baseline.png'), self.baseline)
+        cv.imwrite(str(out_dir / 'maintenance.png'), self.maintenance)
+        with open(out_dir / 'ground_truth.json', 'w', encoding='utf-8') as f:
+            json.dump(self.ground_truth, f, indent=2)
+        return out_dir
+
+
+def _wire_network(cfg: SceneConfig, spacing: int, rng):
+    """Jittered grid nodes and the kept segments between 4-neighbours."""
+    nx = max(2, cfg.width // spacing + 1)
+    ny = max(2, cfg.height // spacing + 1)
+    gx = (np.arange(nx) + 0.5) * cfg.width / nx
+    gy = (np.arange(ny) + 0.5) * cfg.height / ny
+    jitter = spacing * 0.2
+    nodes = np.stack(np.meshgrid(gx, gy), -1).reshape(-1, 2)
+    nodes = np.rint(nodes + rng.uniform(-jitter, jitter, nodes.shape)).astype(int)
+    edges = []
+    for j in range(ny):
+        for i in range(nx):
+            a = j * nx + i
+            if i + 1 < nx and rng.random() < cfg.wire_keep:
+                edges.append((a, a + 1))
+            if j + 1 < ny and rng.random() < cfg.wire_keep:
+                edges.append((a, a + nx))
+    return nodes, edges
+
+
+def _hot_colour(pal: Palette, potential: bool, rng) -> Tuple[Tuple[int, int, int], str]:
+    hues = pal.potential_hues if potential else pal.faulty_hues
+    h = int(hues[int(rng.integers(len(hues)))])
+    return (h, pal.hot_saturation, pal.hot_value), ('Potentially Faulty' if potential else 'Faulty')
+
+
+def generate_pair(cfg: SceneConfig = SceneConfig()) -> SyntheticPair:
+    """Draw one pair; raises ValueError when the network cannot host the hotspots."""
+    rng = np.random.default_rng(cfg.seed)
+    pal = cfg.palette
+    W, H = cfg.width, cfg.height
+    spacing = cfg.wire_spacing or max(24, min(W, H) // 10)
+    thick = cfg.wire_thickness or max(2, spacing // 16)
+    radius = max(3, 2 * thick)
+
+    scene = np.empty((H, W, 3), np.uint8)
+    scene[..., 0], scene[..., 1] = pal.background[0], pal.background[1]
+    # Smooth texture: real scenes have structure, and ECC runs on Canny edges
+    tex = cv.resize(rng.normal(0, cfg.texture, (H // 16 + 1, W // 16 + 1)).astype(np.float32),
+                    (W, H), interpolation=cv.INTER_CUBIC)
+    scene[..., 2] = np.clip(pal.background[2] + tex, 0, 255).astype(np.uint8)
+
+    nodes, edges = _wire_network(cfg, spacing, rng)
+    for a, b in edges:
+        cv.line(scene, tuple(map(int, nodes[a])), tuple(map(int, nodes[b])), pal.wire, thick, cv.LINE_AA)
+    degree = np.bincount(np.array(edges).ravel(), minlength=len(nodes)) if edges else np.zeros(len(nodes), int)
+    base_hsv = scene.copy()
+
+    # Hotspot sites: each joint / segment hosts at most one hotspot
+    joint_ids = [int(n) for n in rng.permutation(np.flatnonzero((degree == 1) | (degree >= 3)))]
+    edge_ids = [int(e) for e in rng.permutation(len(edges))]
+    if cfg.loose_joints > len(joint_ids) or \
+            cfg.point_overloads + cfg.full_wire_overloads > len(edge_ids):
+        raise ValueError(f"{W}x{H} network has {len(joint_ids)} joints and {len(edge_ids)} segments; "
+                         "lower the hotspot counts or the wire spacing")
+
+    anomalies: List[Dict[str, Any]] = []
+    spot = np.zeros((H, W), np.uint8)
+
+    def add(subtype, severity, draw):
+        spot[...] = 0
+        draw(spot)
+        x, y, w, h = cv.boundingRect(spot)
+        anomalies.append({'id': f'gt_{len(anomalies) + 1}', 'x': x, 'y': y, 'w': w, 'h': h,
+                          'severity': severity, 'classification': subtype, 'source': 'synthetic'})
+
+    for n in joint_ids[:cfg.loose_joints]:
+        colour, severity = _hot_colour(pal, rng.random() < cfg.potential_fraction, rng)
+        c = tuple(map(int, nodes[n]))
+        cv.circle(scene, c, radius, colour, -1)
+        add('LooseJoint', severity, lambda m: cv.circle(m, c, radius, 255, -1))
+
+    for e in edge_ids[:cfg.full_wire_overloads]:
+        colour, _ = _hot_colour(pal, rng.random() < cfg.potential_fraction, rng)
+        p, q = nodes[edges[e][0]].astype(float), nodes[edges[e][1]].astype(float)
+        d = (q - p) / max(1.0, np.linalg.norm(q - p)) * (radius + thick)   # stop short of the joints
+        p0, p1 = tuple(map(int, np.rint(p + d))), tuple(map(int, np.rint(q - d)))
+        cv.line(scene, p0, p1, colour, thick + 2)
+        add('FullWireOverload', 'Potentially Faulty', lambda m: cv.line(m, p0, p1, 255, thick + 2))
+
+    for e in edge_ids[cfg.full_wire_overloads:cfg.full_wire_overloads + cfg.point_overloads]:
+        colour, severity = _hot_colour(pal, rng.random() < cfg.potential_fraction, rng)
+        p, q = nodes[edges[e][0]], nodes[edges[e][1]]
+        c = tuple(map(int, np.rint(p + (q - p) * rng.uniform(0.4, 0.6))))
+        # Elongated along the conductor: a disc across the wire skeletonizes to a junction
+        axes, angle = (radius, thick), float(np.degrees(np.arctan2(q[1] - p[1], q[0] - p[0])))
+        cv.ellipse(scene, c, axes, angle, 0, 360, colour, -1)
+        add('PointOverload', severity, lambda m: cv.ellipse(m, c, axes, angle, 0, 360, 255, -1))
+
+    M = cv.getRotationMatrix2D((W / 2.0, H / 2.0), cfg.rotation_deg, cfg.scale)
+    M[:, 2] += cfg.shift
+    maint = cv.warpAffine(cv.cvtColor(scene, cv.COLOR_HSV2BGR), M, (W, H),
+                          flags=cv.INTER_LINEAR, borderMode=cv.BORDER_REPLICATE)
+    base = cv.cvtColor(base_hsv, cv.COLOR_HSV2BGR)
+    if cfg.noise_sigma > 0:
+        base = np.clip(base + rng.normal(0, cfg.noise_sigma, base.shape), 0, 255).astype(np.uint8)
+        maint = np.clip(maint + rng.normal(0, cfg.noise_sigma, maint.shape), 0, 255).astype(np.uint8)
+
+    labels = {a['severity'] for a in anomalies}
+    image_label = next((l for l in ('Faulty', 'Potentially Faulty') if l in labels), 'Normal')
+    config = asdict(cfg)
+    ground_truth = {
+        'imageLevelLabel': image_label,
+        'anomalies': anomalies,
+        'camera': {'matrix': M.tolist(), 'shift': list(cfg.shift),
+                   'rotationDeg': cfg.rotation_deg, 'scale': cfg.scale},
+        'config': config,
+    }
+    return SyntheticPair(base, maint, ground_truth)
+
+
+def _cli() -> int:
+    d = SceneConfig()
+    parser = argparse.ArgumentParser(description="Generate synthetic thermal pairs with ground truth")
+    parser.add_argument("--out", required=True, help="Output directory (one pair_NNN/ per pair)")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--width", type=int, default=d.width)
+    parser.add_argument("--height", type=int, default=d.height)
+    parser.add_argument("--wire-spacing", type=int)
+    parser.add_argument("--point-overloads", type=int, default=d.point_overloads)
+    parser.add_argument("--loose-joints", type=int, default=d.loose_joints)
+    parser.add_argument("--full-wire-overloads", type=int, default=d.full_wire_overloads)
+    parser.add_argument("--potential-fraction", type=float, default=d.potential_fraction)
+    parser.add_argument("--shift", type=float, nargs=2, default=d.shift, metavar=("DX", "DY"))
+    parser.add_argument("--rotation", type=float, default=d.rotation_deg, help="Degrees")
+    parser.add_argument("--scale", type=float, default=d.scale)
+    parser.add_argument("--noise", type=float, default=d.noise_sigma, help="Gaussian sigma")
+    parser.add_argument("--seed", type=int, default=d.seed, help="Seed of the first pair")
+    args = parser.parse_args()
+
+    cfg = SceneConfig(width=args.width, height=args.height, wire_spacing=args.wire_spacing,
+                      point_overloads=args.point_overloads, loose_joints=args.loose_joints,
+                      full_wire_overloads=args.full_wire_overloads,
+                      potential_fraction=args.potential_fraction, shift=tuple(args.shift),
+                      rotation_deg=args.rotation, scale=args.scale, noise_sigma=args.noise)
+    for i in range(args.count):
+        pair = generate_pair(replace(cfg, seed=args.seed + i))
+        out = pair.save(Path(args.out) / f"pair_{i:03d}")
+        print(f"{out}: {len(pair.ground_truth['anomalies'])} anomalies, {pair.ground_truth['imageLevelLabel']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(_cli())
@@ -0,0 +1,188 @@
+"""Tiled, bounded-memory execution of the per-pixel stages.
+
+The LAB/deltaE colour difference, the hot/delta masks and morphology run over
+horizontal bands of the frame, each extended by a halo wide enough for the
+stage's neighbourhood, so their float64 temporaries scale with the band height
+instead of the frame size (SSIM uses the same bands, see `image_stats`). Only
+the per-pixel outputs (deltaE as float32, the uint8 masks) are held at full
+resolution.
+
+Blobs are labelled band by band and stitched across the seams with a
+union-find. Labels, statistics and per-blob pixel order match `blob_props` on
+the full mask exactly: OpenCV numbers components by the first 2x2 block they
+touch in raster order, so seams are kept on even rows and components are
+ordered by (first band, local label).
+"""
+from typing import Any, Dict, Iterator, List, Tuple
+import cv2 as cv
+import numpy as np
+
+from .color_metrics import to_lab, deltaE_map, hot_color_mask
+from .morphology import morphology_clean
+
+BYTES_PER_PIXEL = 288   # measured peak of rgb2lab x2 + CIEDE2000 per pixel (float64 temporaries)
+MIN_BAND_ROWS = 32
+MORPH_HALO = 8          # morphology_clean reaches 1 (open) + 1 (open) + 2 (close) + 2 (close) rows
+MIN_BLOB_AREA = 25      # same cut as blob_props
+
+
+def band_rows(width: int, memory_budget_mb: float,
+              bytes_per_pixel: int = BYTES_PER_PIXEL) -> int:
+    """Even band height whose working set fits in memory_budget_mb."""
+    rows = int(memory_budget_mb * 1024 * 1024 // (max(1, width) * bytes_per_pixel))
+    return max(MIN_BAND_ROWS, rows - rows % 2)
+
+
+def iter_bands(height: int, rows: int, halo: int = 0) -> Iterator[Tuple[int, int, int, int]]:
+    """Yield (y0, y1, h0, h1): core rows [y0, y1) and halo-extended rows [h0, h1).
+
+    Band starts are multiples of `rows` (even), and a short last band is merged
+    into its predecessor so every band is at least rows/2 high.
+    """
+    starts = list(range(0, height, rows))
+    if len(starts) > 1 and height - starts[-1] < rows // 2:
+        starts.pop()
+    ends = starts[1:] + [height]
+    for y0, y1 in zip(starts, ends):
+        yield y0, y1, max(0, y0 - halo), min(height, y1 + halo)
+
+
+def tiled_delta_e_mask(base_bgr, ment_bgr, ment_hsv, t_pot: float, rows: int,
+                       formula: str = 'ciede2000', out=None,
+                       base_lab=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Band-wise deltaE map and the raw (hot AND deltaE >= t_pot) mask.
+
+    out=(dE float32, mask uint8) supplies preallocated full-frame outputs;
+    base_lab is a precomputed LAB of base_bgr (read band by band).
+    """
+    H, W = base_bgr.shape[:2]
+    dE, mask = out if out is not None else (np.empty((H, W), np.float32), np.empty((H, W), np.uint8))
+    for y0, y1, _, _ in iter_bands(H, rows):
+        lab_b = to_lab(base_bgr[y0:y1]) if base_lab is None else base_lab[y0:y1]
+        d = deltaE_map(lab_b, to_lab(ment_bgr[y0:y1]), formula=formula,
+                       dst=dE[y0:y1])
+        mask_delta = cv.compare(d, t_pot, cv.CMP_GE)
+        cv.bitwise_and(hot_color_mask(ment_hsv[y0:y1]), mask_delta, dst=mask[y0:y1])
+    return dE, mask
+
+
+def tiled_morphology_clean(mask, rows: int, dst=None) -> np.ndarray:
+    """morphology_clean over halo-extended bands; identical to the full-frame call."""
+    H = mask.shape[0]
+    out = np.empty_like(mask) if dst is None else dst
+    for y0, y1, h0, h1 in iter_bands(H, rows, halo=MORPH_HALO):
+        out[y0:y1] = morphology_clean(mask[h0:h1])[y0 - h0:y1 - h0]
+    return out
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+def _band_components(bin_mask, rows: int):
+    for y0, y1, _, _ in iter_bands(bin_mask.shape[0], rows):
+        n, labels, stats, _ = cv.connectedComponentsWithStats(bin_mask[y0:y1], connectivity=8)
+        yield y0, y1, n, labels, stats
+
+
+def tiled_blob_props(bin_mask, dE, hsv, rows: int) -> List[Dict[str, Any]]:
+    """blob_props computed band by band with components stitched across seams."""
+    # pass 1: per-band components, global ids = band offset + local label - 1
+    offsets, stats_all, tops = [], [], []
+    seams = []   # (global ids of the row above the seam, of the row below)
+    prev_last = None
+    total = 0
+    for y0, y1, n, labels, stats in _band_components(bin_mask, rows):
+        offsets.append(total)
+        stats_all.append(stats[1:])
+        tops.append(stats[1:, cv.CC_STAT_TOP].astype(np.int64) + y0)
+        first = np.where(labels[0] > 0, labels[0] + total - 1, -1)
+        if prev_last is not None:
+            seams.append((prev_last, first))
+        prev_last = np.where(labels[-1] > 0, labels[-1] + total - 1, -1)
+        total += n - 1
+
+    parent = np.arange(total, dtype=np.int64)
+    for above, below in seams:
+        for dx in (-1, 0, 1):   # 8-connectivity across the seam
+            a = above[max(0, -dx):len(above) - max(0, dx)]
+            b = below[max(0, dx):len(below) - max(0, -dx)]
+            hit = (a >= 0) & (b >= 0)
+            for i, j in zip(a[hit].tolist(), b[hit].tolist()):
+                ri, rj = _find(parent, i), _find(parent, j)
+                if ri != rj:
+                    # keep the earliest part as root: it fixes the component's label order
+                    parent[max(ri, rj)] = min(ri, rj)
+    roots = np.array([_find(parent, i) for i in range(total)], dtype=np.int64)
+
+    # global ids are already in (band, local label) order, so roots sort into cv labels
+    order = np.unique(roots)
+    label_of = np.zeros(total, np.int64)
+    label_of[order] = np.arange(1, len(order) + 1)
+    glabel = label_of[roots]
+
+    stats = np.concatenate(stats_all)
+    ys = np.concatenate(tops)
+    n_lab = len(order) + 1
+    x0 = np.full(n_lab, np.iinfo(np.int64).max); y0g = x0.copy()
+    x1 = np.zeros(n_lab, np.int64); y1g = x1.copy()
+    area = np.zeros(n_lab, np.int64)
+    np.minimum.at(x0, glabel, stats[:, cv.CC_STAT_LEFT])
+    np.minimum.at(y0g, glabel, ys)
+    np.maximum.at(x1, glabel, stats[:, cv.CC_STAT_LEFT] + stats[:, cv.CC_STAT_WIDTH])
+    np.maximum.at(y1g, glabel, ys + stats[:, cv.CC_STAT_HEIGHT])
+    np.add.at(area, glabel, stats[:, cv.CC_STAT_AREA])
+
+    # pass 2: gather each kept blob's pixels in raster order
+    keep = [lab for lab in range(1, n_lab) if area[lab] >= MIN_BLOB_AREA]
+    parts = {lab: ([], [], []) for lab in keep}
+    for b, (y0, y1, n, labels, _) in enumerate(_band_components(bin_mask, rows)):
+        band_lut = np.zeros(n, np.int64)
+        band_lut[1:] = glabel[offsets[b]:offsets[b] + n - 1]
+        g = band_lut[labels]
+        for lab in np.unique(g[g > 0]).tolist():
+            if lab not in parts:
+                continue
+            ry0, ry1 = max(y0, int(y0g[lab])), min(y1, int(y1g[lab]))
+            bx0, bx1 = int(x0[lab]), int(x1[lab])
+            roi = g[ry0 - y0:ry1 - y0, bx0:bx1] == lab
+            dE_p, hsv_p, pts_p = parts[lab]
+            dE_p.append(dE[ry0:ry1, bx0:bx1][roi])
+            hsv_p.append(hsv[ry0:ry1, bx0:bx1][roi])
+            py, px = np.where(roi)
+            pts_p.append(np.column_stack((py + (ry0 - int(y0g[lab])), px)))
+
+    out = []
+    for lab in keep:
+        dE_p, hsv_p, pts_p = parts[lab]
+        dE_roi = np.concatenate(dE_p)
+        hsv_roi = np.concatenate(hsv_p)
+        pts = np.concatenate(pts_p)
+        x, y = int(x0[lab]), int(y0g[lab])
+        w, h = int(x1[lab]) - x, int(y1g[lab]) - y
+        a = int(area[lab])
+        mean_dE = float(dE_roi.mean()) if dE_roi.size else 0.0
+        peak_dE = float(dE_roi.max()) if dE_roi.size else 0.0
+        mean_h = float(hsv_roi[:,0].mean()) if hsv_roi.size else 0.0
+        mean_s = float(hsv_roi[:,1].mean()) if hsv_roi.size else 0.0
+        mean_v = float(hsv_roi[:,2].mean()) if hsv_roi.size else 0.0
+
+        if len(pts) >= 10:
+            cov = np.cov(pts.astype(np.float32).T)
+            eigvals,_ = np.linalg.eig(cov)
+            eigvals = np.sort(np.abs(eigvals))
+            elong = float((eigvals[-1]+1e-6)/(eigvals[0]+1e-6))
+        else:
+            elong = 1.0
+
+        cx = float(pts[:, 1].sum(dtype=np.int64) + x * a) / a
+        cy = float(pts[:, 0].sum(dtype=np.int64) + y * a) / a
+        out.append(dict(label=lab, bbox=(x, y, w, h), area=a, centroid=(cx, cy),
+                        mean_deltaE=mean_dE, peak_deltaE=peak_dE,
+                        mean_hsv=(mean_h, mean_s, mean_v), elongation=elong))
+    return out
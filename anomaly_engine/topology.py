@@ -1,23 +1,112 @@
 """Topology helpers: wire skeleton, joints, coverage analysis.
-No functional changes.
+
+`build_wire_skeleton` thins the Canny edges united with the hot mask,
+optionally at reduced resolution and only on the components reaching given
+regions. `find_skeleton_nodes` lists its endpoints and junctions, which
+`is_near_joint` and `wire_hot_coverage` check each blob against.
 """
-from typing import List, Tuple, Iterable
+from typing import List, Optional, Sequence, Tuple, Iterable
 import numpy as np
 import cv2 as cv
-from skimage.morphology import skeletonize
+
+Rect = Tuple[int, int, int, int]     # x, y, w, h
+
+
+def _touching(binary, regions: Sequence[Rect]):
+    """Labels, stats and the 8-connected components of binary that touch any region."""
+    n, labels, stats, _ = cv.connectedComponentsWithStats(binary, connectivity=8, ltype=cv.CV_32S)
+    H, W = binary.shape
+    keep = set()
+    for x, y, w, h in regions:
+        x0, y0, x1, y1 = max(0, x), max(0, y), min(W, x + w), min(H, y + h)
+        if x0 < x1 and y0 < y1:
+            keep.update(np.unique(labels[y0:y1, x0:x1]).tolist())
+    keep.discard(0)
+    return labels, stats, sorted(keep)
+
+
+def _skeletonize_near(binary, regions: Sequence[Rect], dst=None):
+    """skeletonize(binary > 0) as uint8 0/255, on the components touching regions only.
+
+    Thinning only removes pixels and looks at 3x3 neighbourhoods, so
+    8-connected components never influence each other: each one is thinned
+    in its own bounding box, and the result equals the full-frame skeleton
+    on every component kept (all others are left empty).
+    """
+    from skimage.morphology import skeletonize   # deferred: ~0.2 s import
+    labels, stats, keep = _touching(binary, regions)
+    out = np.zeros(binary.shape, np.uint8) if dst is None else dst
+    out.fill(0)
+    for k in keep:
+        x, y, w, h = stats[k, :4]
+        comp = labels[y:y + h, x:x + w] == k
+        out[y:y + h, x:x + w][skeletonize(comp)] = 255
+    return out
 
 
-def build_wire_skeleton(img_bgr, hot_mask):
-    gray = cv.cvtColor(img_bgr, cv.COLOR_BGR2GRAY)
-    edges = cv.Canny(gray, 50, 150)
+def build_wire_skeleton(img_bgr, hot_mask, scale: float = 1.0, out=None,
+                        regions: Optional[Sequence[Rect]] = None):
+    """Skeletonize Canny edges united with the dilated hot mask.
+
+    With scale < 1 the union is thinned at reduced resolution, upsampled and
+    thinned once more (cheap, the upsampled lines are ~1/scale px wide).
+    out=(skel, wire_band) supplies preallocated uint8 outputs; they also serve
+    as scratch for the gray/edge/union stages.
+
+    regions, a list of (x, y, w, h) rects, restricts thinning to the
+    connected parts of the union that reach into them. Inside the regions
+    skeleton, wire band and skeleton nodes equal the full-frame result;
+    elsewhere only the parts kept are filled in. None thins the whole frame.
+    """
+    from skimage.morphology import skeletonize   # deferred: ~0.2 s import
+    skel, wire_band = out if out is not None else (None, None)
+    gray = cv.cvtColor(img_bgr, cv.COLOR_BGR2GRAY, dst=skel)
+    edges = cv.Canny(gray, 50, 150, edges=wire_band)
     k3 = cv.getStructuringElement(cv.MORPH_RECT, (3,3))
     k5 = cv.getStructuringElement(cv.MORPH_RECT, (5,5))
-    edges = cv.dilate(edges, k3, iterations=1)
-    hot_dil = cv.dilate(hot_mask, k5, iterations=1)
-    union = cv.bitwise_or(edges, hot_dil)
+    edges = cv.dilate(edges, k3, dst=edges, iterations=1)
+    hot_dil = cv.dilate(hot_mask, k5, dst=gray, iterations=1)
+    union = cv.bitwise_or(edges, hot_dil, dst=edges)
+    if regions is not None:
+        return _restricted_skeleton(union, scale, regions, skel, k3)
+    if scale < 1.0:
+        H, W = union.shape
+        small = cv.resize(union, (max(1, int(round(W*scale))), max(1, int(round(H*scale)))),
+                          interpolation=cv.INTER_AREA)
+        skel_small = skeletonize(small > 0).astype(np.uint8) * 255
+        union = cv.resize(skel_small, (W, H), interpolation=cv.INTER_NEAREST)
     skel_bool = skeletonize((union > 0).astype(np.uint8).astype(bool))
-    skel = (skel_bool.astype(np.uint8) * 255)
-    wire_band = cv.dilate(skel, k3, iterations=1)
+    if skel is None:
+        skel = np.empty(skel_bool.shape, np.uint8)
+    np.multiply(skel_bool, np.uint8(255), out=skel)
+    wire_band = cv.dilate(skel, k3, dst=wire_band, iterations=1)
+    return skel, wire_band
+
+
+def _restricted_skeleton(union, scale: float, regions: Sequence[Rect], skel, k3):
+    """build_wire_skeleton from the union on, thinning only components that reach regions.
+
+    The union is the caller's scratch (the wire_band output), so skel is
+    filled before wire_band is written over it.
+    """
+    H, W = union.shape
+    # One more pixel: the wire band and node degrees look one pixel out
+    regions = [(x - 1, y - 1, w + 2, h + 2) for x, y, w, h in regions]
+    if scale < 1.0:
+        sw, sh = max(1, int(round(W*scale))), max(1, int(round(H*scale)))
+        small = cv.resize(union, (sw, sh), interpolation=cv.INTER_AREA)
+        # A full-res pixel upsamples (nearest) from the small pixel at
+        # floor(X * sw / W); one small pixel of margin covers the rounding
+        fx, fy = sw / W, sh / H
+        small_regions = []
+        for x, y, w, h in regions:
+            x0, y0 = int(x*fx) - 1, int(y*fy) - 1
+            small_regions.append((x0, y0, int((x + w)*fx) + 2 - x0, int((y + h)*fy) + 2 - y0))
+        cv.threshold(small, 0, 255, cv.THRESH_BINARY, dst=small)
+        skel_small = _skeletonize_near(small, small_regions, dst=small)
+        union = cv.resize(skel_small, (W, H), dst=union, interpolation=cv.INTER_NEAREST)
+    skel = _skeletonize_near(union, regions, dst=skel)
+    wire_band = cv.dilate(skel, k3, dst=union, iterations=1)
     return skel, wire_band
 
 
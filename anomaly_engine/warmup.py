@@ -0,0 +1,47 @@
+"""Worker warm-up: the detection pipeline once on a tiny synthetic pair.
+
+Importing the engine leaves scikit-image unloaded (`color_metrics`,
+`topology` import it on first use), and OpenCV / NumPy pay one-time costs on
+their first calls (ECC, ORB, PNG/JPEG codecs, thread pools). `warm_up` pays
+all of them before the worker reports ready, so the first real request
+does not.
+"""
+from pathlib import Path
+from typing import Dict, Iterable
+import tempfile
+import time
+import cv2 as cv
+import numpy as np
+
+from .color_metrics import _DELTA_E, deltaE_map
+from .detection import detect_anomalies
+from .profiles import DEFAULT_PROFILE
+from .synthetic import SceneConfig, generate_pair
+from .visualization import overlay_detections
+
+WARMUP_SCENE = SceneConfig(width=160, height=120, wire_spacing=40, point_overloads=1,
+                           loose_joints=1, full_wire_overloads=0, seed=0)
+
+
+def warm_up(profiles: Iterable[str] = (DEFAULT_PROFILE,)) -> Dict[str, float]:
+    """Run detection per profile on WARMUP_SCENE; returns ms per step and 'total'."""
+    t0 = time.perf_counter()
+    timings: Dict[str, float] = {}
+    pair = generate_pair(WARMUP_SCENE)
+    with tempfile.TemporaryDirectory(prefix='anomaly-warmup-') as tmp:
+        out = Path(pair.save(tmp))
+        report = None
+        for name in profiles:
+            t = time.perf_counter()
+            report = detect_anomalies(str(out / 'baseline.png'), str(out / 'maintenance.png'),
+                                      profile=name)
+            timings[name] = (time.perf_counter() - t) * 1000.0
+    t = time.perf_counter()
+    if report is not None:
+        cv.imencode('.jpg', overlay_detections(pair.maintenance, report.blobs))
+    lab = np.zeros((8, 8, 3), np.float64)
+    for formula in _DELTA_E:
+        deltaE_map(lab, lab, formula=formula)
+    timings['overlay_and_formulas'] = (time.perf_counter() - t) * 1000.0
+    timings['total'] = (time.perf_counter() - t0) * 1000.0
+    return timings
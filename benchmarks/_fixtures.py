@@ -0,0 +1,71 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run against the stored `inspections/<id>/runs/<run_id>/` pairs; the
+`inspections/inspection_logs/` mirror is skipped because it duplicates them.
+Images are resolved through the artifact store, so a migrated tree works too.
+"""
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from anomaly_engine.artifact_store import ArtifactStore
+
+INSPECTIONS_ROOT = PROJECT_ROOT / "inspections"
+
+
+def fixture_pairs(root: Path = INSPECTIONS_ROOT, limit: int | None = None) -> List[Tuple[Path, Path]]:
+    """Return (baseline.png, maintenance.png) for every stored run that has both."""
+    store = ArtifactStore(root)
+    pairs = []
+    for run_dir in sorted(root.glob("*/runs/*")):
+        if run_dir.parts[-3] == "inspection_logs":
+            continue
+        base, maint = store.resolve(run_dir, "baseline"), store.resolve(run_dir, "maintenance")
+        if base.exists() and maint.exists():
+            pairs.append((base, maint))
+    return pairs[:limit] if limit else pairs
+
+
+def timed(fn: Callable, *args, repeat: int = 1, **kwargs):
+    """Run fn `repeat` times; return (last_result, list_of_durations_ms)."""
+    durations = []
+    result = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn(*args, **kwargs)
+        durations.append((time.perf_counter() - t0) * 1000.0)
+    return result, durations
+
+
+def bbox_iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_blobs(ref, cand, iou_thr: float = 0.5) -> Iterator[Tuple[int, int]]:
+    """Greedy one-to-one matching of blob bboxes by IoU (highest first)."""
+    scored = sorted(
+        ((bbox_iou(r.bbox, c.bbox), i, j) for i, r in enumerate(ref) for j, c in enumerate(cand)),
+        reverse=True,
+    )
+    used_r, used_c = set(), set()
+    for iou, i, j in scored:
+        if iou < iou_thr:
+            break
+        if i in used_r or j in used_c:
+            continue
+        used_r.add(i)
+        used_c.add(j)
+        yield i, j
@@ -0,0 +1,64 @@
+"""Detection against a registered baseline vs. passing the baseline path.
+
+Every fixture baseline is registered into a temporary registry; each pair is
+then detected both from paths and with the registry's precomputed features
+(decoded image, edges, ORB descriptors, ROI, LAB, histogram), and the reports
+are compared for equality.
+
+Example:
+python benchmarks/bench_baselines.py --repeat 3 --profile balanced
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+from dataclasses import asdict
+
+from _fixtures import fixture_pairs, timed
+
+from anomaly_engine import detect_anomalies
+from anomaly_engine.baselines import BaselineRegistry
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark detection with registered baselines")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per pair and mode")
+    parser.add_argument("--limit", type=int, help="Only use the first N fixture pairs")
+    parser.add_argument("--profile", help="Pipeline profile (default: balanced)")
+    parser.add_argument("--auto-roi", action="store_true", help="Crop to the baseline ROI")
+    args = parser.parse_args()
+
+    pairs = fixture_pairs(limit=args.limit)
+    if not pairs:
+        print("No fixture pairs found under inspections/", file=sys.stderr)
+        return 2
+
+    kwargs = dict(profile=args.profile, auto_roi=True if args.auto_roi else None)
+    path_ms, reg_ms, register_ms = [], [], []
+    identical = 0
+    with tempfile.TemporaryDirectory() as root:
+        registry = BaselineRegistry(root, seed_warps=False)
+        for i, (base, maint) in enumerate(pairs):
+            _, t_reg = timed(registry.register, base, f"fixture-{i}")
+            register_ms.append(t_reg[0])
+            features = registry.get(f"fixture-{i}")
+
+            ref, t_path = timed(detect_anomalies, str(base), str(maint), repeat=args.repeat, **kwargs)
+            got, t_feat = timed(detect_anomalies, str(base), str(maint), repeat=args.repeat,
+                                baseline=features, **kwargs)
+            path_ms.append(statistics.median(t_path))
+            reg_ms.append(statistics.median(t_feat))
+            identical += asdict(ref) == asdict(got)
+
+    print(f"{len(pairs)} pairs")
+    print(f"register (one-off): median {statistics.median(register_ms):8.1f} ms")
+    print(f"baseline path:      median {statistics.median(path_ms):8.1f} ms  mean {statistics.fmean(path_ms):8.1f} ms")
+    print(f"registered:         median {statistics.median(reg_ms):8.1f} ms  mean {statistics.fmean(reg_ms):8.1f} ms")
+    print(f"identical reports {identical}/{len(pairs)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+"""RSS drift over many requests with and without the buffer pool.
+
+Each mode runs in a fresh subprocess that cycles through the fixture pairs and
+samples the current RSS every `--every` requests. `--no-pool` is emulated
+with a pool that retains nothing (max_bytes=0), so every array is freshly
+allocated as before.
+
+Example:
+python benchmarks/bench_buffers.py --requests 1000 --every 100
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from _fixtures import fixture_pairs
+
+
+def _current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _child(mode: str, requests: int, every: int, max_pixels: float) -> None:
+    import cv2 as cv
+    from anomaly_engine import BufferPool, detect_anomalies
+
+    pairs = [p for p in fixture_pairs()
+             if cv.imread(str(p[0]), cv.IMREAD_GRAYSCALE).size <= max_pixels]
+    pool = BufferPool() if mode == "pool" else BufferPool(max_bytes=0)
+    samples = []
+    t0 = time.perf_counter()
+    for i in range(requests):
+        base, maint = pairs[i % len(pairs)]
+        detect_anomalies(str(base), str(maint), buffers=pool)
+        if (i + 1) % every == 0:
+            samples.append({"request": i + 1, "rssMb": _current_rss_mb()})
+    print(json.dumps({
+        "mode": mode,
+        "pairs": len(pairs),
+        "msPerRequest": (time.perf_counter() - t0) * 1000.0 / requests,
+        "samples": samples,
+        "pool": pool.stats(),
+    }))
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure RSS drift with and without the buffer pool")
+    parser.add_argument("--requests", type=int, default=300, help="Detections per mode")
+    parser.add_argument("--every", type=int, default=50, help="Sample RSS every N requests")
+    parser.add_argument("--max-pixels", type=float, default=1e6,
+                        help="Only cycle through pairs up to this baseline size (keeps runs short)")
+    parser.add_argument("--output-json", help="Optional path for the raw results")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    if args.child:
+        _child(args.child, args.requests, args.every, args.max_pixels)
+        return 0
+
+    results = []
+    for mode in ("pool", "no-pool"):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--requests", str(args.requests),
+             "--every", str(args.every), "--max-pixels", str(args.max_pixels)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            return proc.returncode
+        res = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(res)
+        rss = [s["rssMb"] for s in res["samples"]]
+        pool = res["pool"]
+        print(f"{mode:<8} pairs={res['pairs']} {res['msPerRequest']:7.1f} ms/request "
+              f"rss first={rss[0]:6.1f} MB last={rss[-1]:6.1f} MB max={max(rss):6.1f} MB "
+              f"hit_rate={pool['hit_rate']:.3f} reused={pool['bytes_reused'] / 2**20:.0f} MB "
+              f"allocated={pool['bytes_allocated'] / 2**20:.0f} MB")
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+"""Colour-difference stage with and without the tile-change prefilter.
+
+Every fixture pair is detected with the profile's `change_tiles` off and on.
+Per pair, the script reports the share of skipped tiles, the `delta_e` stage
+time and the end-to-end time for both settings. It also checks that the two
+reports are identical apart from `skipped_tile_ratio`.
+
+Example:
+python benchmarks/bench_change_tiles.py --repeat 3 --profile balanced
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+from dataclasses import asdict, replace
+
+from _fixtures import fixture_pairs
+
+from anomaly_engine import detect_anomalies
+from anomaly_engine.io_utils import read_bgr
+from anomaly_engine.profiles import PROFILES, get_profile
+
+
+def run(base, maint, profile, repeat: int, memory_budget_mb):
+    """(report, median delta_e ms, median total ms) over `repeat` runs."""
+    stage, total, rep = [], [], None
+    for _ in range(max(1, repeat)):
+        timings = {}
+        rep = detect_anomalies(str(base), str(maint), profile=profile,
+                               memory_budget_mb=memory_budget_mb, timings=timings)
+        stage.append(timings["delta_e"])
+        total.append(sum(timings.values()))
+    return rep, statistics.median(stage), statistics.median(total)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the tile-change prefilter")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per pair and setting")
+    parser.add_argument("--limit", type=int, help="Only use the first N fixture pairs")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="balanced")
+    parser.add_argument("--memory-budget-mb", type=float, help="Also apply the banded path")
+    args = parser.parse_args()
+
+    pairs = fixture_pairs(limit=args.limit)
+    if not pairs:
+        print("No fixture pairs found under inspections/", file=sys.stderr)
+        return 2
+
+    on = get_profile(args.profile)
+    off = replace(on, change_tiles=False)
+    print(f"{'pair':>4} {'size':>10} {'skipped':>8} {'ΔE off ms':>10} {'ΔE on ms':>9} "
+          f"{'total off ms':>13} {'total on ms':>12} {'same':>5}")
+    rows = []
+    for i, (base, maint) in enumerate(pairs):
+        ref, stage_off, total_off = run(base, maint, off, args.repeat, args.memory_budget_mb)
+        got, stage_on, total_on = run(base, maint, on, args.repeat, args.memory_budget_mb)
+        a, b = asdict(ref), asdict(got)
+        a.pop("skipped_tile_ratio")
+        ratio = b.pop("skipped_tile_ratio")
+        rows.append((ratio, stage_off, stage_on, total_off, total_on, a == b))
+        h, w = read_bgr(str(base)).shape[:2]
+        print(f"{i:4d} {f'{w}x{h}':>10} {ratio:8.1%} {stage_off:10.0f} {stage_on:9.0f} "
+              f"{total_off:13.0f} {total_on:12.0f} {'yes' if a == b else 'NO':>5}")
+
+    ratios, s_off, s_on, t_off, t_on, same = zip(*rows)
+    print(f"\n{len(rows)} pairs, profile {args.profile}: median skipped {statistics.median(ratios):.1%}")
+    print(f"delta_e stage: off {sum(s_off) / 1000:.1f} s, on {sum(s_on) / 1000:.1f} s "
+          f"({sum(s_off) / max(sum(s_on), 1e-9):.1f}x)")
+    print(f"end to end:    off {sum(t_off) / 1000:.1f} s, on {sum(t_on) / 1000:.1f} s")
+    print(f"identical reports {sum(same)}/{len(rows)}")
+    return 0 if all(same) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
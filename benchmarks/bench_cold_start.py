@@ -0,0 +1,93 @@
+"""Service cold start: import time, readiness and time-to-first-response.
+
+For each setting of ANOMALY_WARMUP the service is started as a fresh uvicorn
+process and timed from spawn to the first 200 of /health (listening), to the
+first 200 of /ready (warmed up), and then over the first and second
+/api/v1/detect requests against a fixture pair served by the load-test
+object-store stand-in. `import main` is timed separately in fresh
+interpreters.
+
+Example:
+python benchmarks/bench_cold_start.py --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from _fixtures import PROJECT_ROOT, fixture_pairs
+from loadtest import ObjectStore, _free_port, start_service
+
+import httpx
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+
+
+def import_ms() -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=PROJECT_ROOT,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def cold_start(warmup: bool, store: ObjectStore, store_url: str) -> dict:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = start_service(1, port, {"ANOMALY_WARMUP": "1" if warmup else "0"})
+    try:
+        t_health = time.perf_counter() - t0
+        while httpx.get(f"{url}/ready", timeout=5.0).status_code != 200:
+            time.sleep(0.05)
+        t_ready = time.perf_counter() - t0
+        body = {
+            "baseline_url": store.get_url(store_url, "baseline.png"),
+            "maintenance_url": store.get_url(store_url, "maintenance.png"),
+            "annotated_upload_url": store.put_url(store_url, "annotated.jpg"),
+        }
+        requests = []
+        for _ in range(2):
+            t = time.perf_counter()
+            resp = httpx.post(f"{url}/api/v1/detect", json=body, timeout=300.0)
+            resp.raise_for_status()
+            requests.append((time.perf_counter() - t) * 1000.0)
+        return {"health": t_health * 1000.0, "ready": t_ready * 1000.0,
+                "first": requests[0], "second": requests[1],
+                "first_response": t_ready * 1000.0 + requests[0]}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark service cold start")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold starts per setting")
+    args = parser.parse_args()
+
+    pairs = fixture_pairs(limit=1)
+    if not pairs:
+        print("No fixture pairs found under inspections/", file=sys.stderr)
+        return 2
+    base, maint = pairs[0]
+    store = ObjectStore({"baseline.png": base.read_bytes(), "maintenance.png": maint.read_bytes()})
+    store_url = store.start()
+
+    imports = [import_ms() for _ in range(args.repeat)]
+    print(f"import main: median {statistics.median(imports):.0f} ms (min {min(imports):.0f})\n")
+    print(f"{'warm-up':>8} {'/health ms':>11} {'/ready ms':>10} {'1st detect ms':>14} "
+          f"{'2nd detect ms':>14} {'spawn->1st response ms':>23}")
+    try:
+        for warmup in (False, True):
+            runs = [cold_start(warmup, store, store_url) for _ in range(args.repeat)]
+            med = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+            print(f"{'on' if warmup else 'off':>8} {med['health']:11.0f} {med['ready']:10.0f} "
+                  f"{med['first']:14.0f} {med['second']:14.0f} {med['first_response']:23.0f}")
+    finally:
+        store.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,207 @@
+"""Baseline-affinity dispatch (ANOMALY_ENGINE_WORKERS) vs. spreading requests.
+
+A stream of detect requests over --baselines synthetic transformers (each
+requested --repeat times, shuffled) is run through:
+
+  * routing: `Dispatcher` directly, with consistent-hash routing ("affinity")
+    and with a random alive worker per request ("random", what a pool of
+    uvicorn workers amounts to). Reported: wall time, summed detection time
+    and the baseline feature cache hit rate. The affinity run is then
+    repeated with one worker killed halfway: the keys that moved, the
+    requests retried and the hit rate afterwards;
+  * service: `/api/v1/detect` end to end, served by `uvicorn --workers N`
+    and by one uvicorn worker with ANOMALY_ENGINE_WORKERS=N, --concurrency
+    clients at a time. Reported: wall time, CPU time and peak RSS of the
+    service process tree, p50/p95 latency and (dispatch) the per-worker
+    cache hit rates.
+
+Inputs are served by the local object store from `loadtest.py`; every URL
+carries a fresh presign-style signature, so baselines are identified by
+their content hash.
+
+Example:
+python benchmarks/bench_dispatch.py --workers 3 --baselines 8 --repeat 4
+python benchmarks/bench_dispatch.py --workers 2 --size 1600x1200 --skip-service
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import statistics
+import tempfile
+import time
+from concurrent.futures import wait
+from typing import Dict, List, Tuple
+
+import cv2 as cv
+import httpx
+
+from loadtest import ObjectStore, ProcessSampler, _free_port, start_service
+
+from anomaly_engine.dispatch import Dispatcher
+from anomaly_engine.io_utils import image_digest
+from anomaly_engine.synthetic import generate_pair, mixed_scene
+
+PROFILE = "balanced"
+
+
+class RandomDispatcher(Dispatcher):
+    """Same workers, but each request goes to a random alive one."""
+
+    def _route(self, key):
+        self._revive()
+        return random.choice([w for w in self.workers if w.alive])
+
+
+def make_inputs(n: int, w: int, h: int, tmp: str, objects: Dict[str, bytes]) -> List[Tuple[str, str, str]]:
+    """(key, baseline path, maintenance path) per transformer; objects get the encoded images."""
+    inputs = []
+    for g in range(n):
+        pair = generate_pair(mixed_scene(w, h, 8, seed=100 + g))
+        paths = []
+        for kind, img in (("base", pair.baseline), ("maint", pair.maintenance)):
+            data = cv.imencode(".png", img)[1].tobytes()
+            objects[f"g{g}_{kind}.png"] = data
+            paths.append(os.path.join(tmp, f"g{g}_{kind}.png"))
+            with open(paths[-1], "wb") as f:
+                f.write(data)
+        inputs.append((f"sha256:{image_digest(pair.baseline)}", *paths))
+    return inputs
+
+
+def run_routing(dispatcher: Dispatcher, inputs, order: List[int], kill_at: int = -1):
+    """Wall s, summed detection ms and (hits, misses) before / after a kill at request kill_at."""
+    options = dict(profile=PROFILE)
+    t0 = time.perf_counter()
+    before, futures = None, []
+    for i, g in enumerate(order):
+        if i == kill_at:
+            wait(futures)
+            before = dispatcher.stats()
+            victim = max(before["workers"], key=lambda w: w["completed"])["worker"]
+            for pid in dispatcher.workers[victim].executor._processes:
+                os.kill(pid, signal.SIGKILL)
+            time.sleep(0.5)
+        futures.append(dispatcher.submit(inputs[g][0], inputs[g][1], None, inputs[g][2], options))
+    wait(futures)
+    wall = time.perf_counter() - t0
+    stats = dispatcher.stats()
+    busy = sum(w["busyMs"] for w in stats["workers"])
+    return wall, busy, before, stats
+
+
+def totals(stats) -> Tuple[int, int]:
+    return (sum(w["cacheHits"] for w in stats["workers"]), sum(w["cacheMisses"] for w in stats["workers"]))
+
+
+def routing(args, inputs, order) -> None:
+    print(f"routing: {len(order)} detections over {len(inputs)} baselines, {args.workers} workers")
+    print(f"{'mode':<22} {'wall s':>8} {'busy s':>8} {'hits':>6} {'misses':>7} {'hit rate':>9}")
+    for name, cls in (("random", RandomDispatcher), ("affinity", Dispatcher)):
+        d = cls(args.workers)
+        try:
+            wall, busy, _, stats = run_routing(d, inputs, order)
+        finally:
+            d.close()
+        hits, misses = totals(stats)
+        print(f"{name:<22} {wall:8.1f} {busy / 1000:8.1f} {hits:6d} {misses:7d} {hits / (hits + misses):9.0%}")
+
+    d = Dispatcher(args.workers, restart_backoff_s=3600.0)
+    try:
+        owners = {key: next(d.ring.successors(key)) for key, _, _ in inputs}
+        wall, busy, before, stats = run_routing(d, inputs, order, kill_at=len(order) // 2)
+        moved = sum(owners[key] != next(d.ring.successors(key)) for key, _, _ in inputs)
+    finally:
+        d.close()
+    h0, m0 = totals(before)
+    h1, m1 = totals(stats)
+    dead = [w["worker"] for w in stats["workers"] if not w["alive"]]
+    print(f"{'affinity, kill at 1/2':<22} {wall:8.1f} {busy / 1000:8.1f} {h1:6d} {m1:7d} {h1 / (h1 + m1):9.0%}")
+    print(f"  worker {dead} killed: {moved}/{len(inputs)} baselines moved, "
+          f"{sum(w['failed'] for w in stats['workers'])} failed requests, "
+          f"hit rate after the kill {(h1 - h0) / max(1, h1 - h0 + m1 - m0):.0%}\n")
+
+
+async def drive(url: str, store, base: str, order: List[int], concurrency: int) -> Tuple[float, List[float], int]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(client, i, g):
+        nonlocal errors
+        async with sem:
+            body = {"baseline_url": store.get_url(base, f"g{g}_base.png"), "profile": PROFILE,
+                    "maintenance_url": store.get_url(base, f"g{g}_maint.png"),
+                    "annotated_upload_url": store.put_url(base, f"r{i}.jpg")}
+            t0 = time.perf_counter()
+            r = await client.post(f"{url}/api/v1/detect", json=body)
+            latencies.append(time.perf_counter() - t0)
+            errors += r.status_code != 200
+
+    t0 = time.perf_counter()
+    async with httpx.AsyncClient(timeout=600.0) as client:
+        await asyncio.gather(*(one(client, i, g) for i, g in enumerate(order)))
+    return time.perf_counter() - t0, latencies, errors
+
+
+def service(args, objects, order) -> None:
+    store = ObjectStore(objects)
+    base = store.start()
+    tmp = tempfile.mkdtemp(prefix="bench_dispatch_")
+    env = {"ANOMALY_WARMUP": "0", "ANOMALY_BASELINE_DIR": f"{tmp}/baselines",
+           "ANOMALY_INSPECTIONS_DIR": f"{tmp}/inspections"}
+    print(f"service: {len(order)} /detect requests, concurrency {args.concurrency}")
+    print(f"{'mode':<26} {'wall s':>8} {'CPU s':>7} {'p50 s':>7} {'p95 s':>7} {'peak RSS MB':>12} {'errors':>7}")
+    try:
+        for name, workers, extra in ((f"uvicorn --workers {args.workers}", args.workers, {}),
+                                     (f"ENGINE_WORKERS={args.workers}", 1,
+                                      {"ANOMALY_ENGINE_WORKERS": str(args.workers)})):
+            port = _free_port()
+            proc = start_service(workers, port, {**env, **extra})
+            sampler = ProcessSampler(proc.pid)
+            try:
+                sampler.start()
+                wall, lat, errors = asyncio.run(drive(f"http://127.0.0.1:{port}", store, base, order,
+                                                      args.concurrency))
+                sampler.stop()
+                stats = httpx.get(f"http://127.0.0.1:{port}/api/v1/stats/workers").json()
+            finally:
+                proc.terminate()
+                proc.wait()
+            lat.sort()
+            print(f"{name:<26} {wall:8.1f} {sampler.cpu_s:7.1f} {statistics.median(lat):7.2f} "
+                  f"{lat[int(0.95 * (len(lat) - 1))]:7.2f} {max(sampler.rss_samples):12.0f} {errors:7d}")
+            if stats["enabled"]:
+                print("  per worker: " + ", ".join(
+                    f"#{w['worker']} {w['completed']} req {w['baselines']} baselines "
+                    f"hit {w['hitRate'] or 0:.0%}" for w in stats["workers"]))
+    finally:
+        store.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark baseline-affinity dispatch")
+    parser.add_argument("--workers", type=int, default=3, help="Engine worker processes")
+    parser.add_argument("--baselines", type=int, default=8, help="Distinct synthetic transformers")
+    parser.add_argument("--repeat", type=int, default=4, help="Requests per transformer")
+    parser.add_argument("--size", default="1280x960", help="Synthetic frame size WxH")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent /detect clients")
+    parser.add_argument("--skip-service", action="store_true", help="Only run the routing comparison")
+    args = parser.parse_args()
+
+    w, h = map(int, args.size.split("x"))
+    objects: Dict[str, bytes] = {}
+    inputs = make_inputs(args.baselines, w, h, tempfile.mkdtemp(prefix="bench_dispatch_"), objects)
+    order = [g for g in range(args.baselines) for _ in range(args.repeat)]
+    random.Random(0).shuffle(order)
+
+    routing(args, inputs, order)
+    if not args.skip_service:
+        service(args, objects, order)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
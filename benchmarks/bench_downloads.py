@@ -0,0 +1,127 @@
+"""Image downloads: buffered `client.get` vs. the streaming `_download_image`.
+
+Objects of increasing size are served by the local object store from
+`loadtest.py`. Each is fetched by the original approach (the whole body read
+into `resp.content`, then written to disk) and by `main._download_image`,
+which writes chunks to disk and hashes them as they arrive. Per size the
+script reports the median wall time, throughput and the tracemalloc peak of
+one download. It then times how quickly an object above the size cap and a
+non-image response are turned away.
+
+Example:
+python benchmarks/bench_downloads.py --sizes-mb 1,16,64,128 --cap-mb 128 --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+_tmp = tempfile.mkdtemp(prefix="bench_downloads_")
+os.environ.setdefault("ANOMALY_BASELINE_DIR", os.path.join(_tmp, "baselines"))
+os.environ.setdefault("ANOMALY_INSPECTIONS_DIR", os.path.join(_tmp, "inspections"))
+
+import httpx
+from fastapi import HTTPException
+
+from loadtest import ObjectStore
+
+import main as service
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def legacy_download(client: httpx.AsyncClient, url: str, dest_path: str) -> str:
+    """The original download: buffer the body, then write it (hash added for parity)."""
+    resp = await client.get(url)
+    resp.raise_for_status()
+    with open(dest_path, "wb") as f:
+        f.write(resp.content)
+    return hashlib.sha256(resp.content).hexdigest()
+
+
+async def streamed_download(client: httpx.AsyncClient, url: str, dest_path: str) -> str:
+    return (await service._download_image(client, url, dest_path)).sha256
+
+
+async def measure(fn, client, store, base, name, dest, repeat):
+    """(median ms, tracemalloc peak bytes, digest) of `repeat` downloads."""
+    times, digest = [], None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        digest = await fn(client, store.get_url(base, name), dest)
+        times.append((time.perf_counter() - t0) * 1000)
+    tracemalloc.start()
+    await fn(client, store.get_url(base, name), dest)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak, digest
+
+
+async def rejection(client, store, base, name, dest):
+    """(ms, HTTP status) until _download_image gives up on `name`."""
+    t0 = time.perf_counter()
+    try:
+        await service._download_image(client, store.get_url(base, name), dest)
+        status = 200
+    except HTTPException as exc:
+        status = exc.status_code
+    return (time.perf_counter() - t0) * 1000, status
+
+
+async def run(args) -> int:
+    sizes = [float(s) for s in args.sizes_mb.split(",")]
+    if args.cap_mb is not None:
+        service.MAX_DOWNLOAD_MB = args.cap_mb
+    cap = service.MAX_DOWNLOAD_MB
+    objects = {f"{s:g}MB.png": os.urandom(int(s * 1024 * 1024)) for s in sizes}
+    oversize = (cap or max(sizes)) * 2
+    objects["oversize.png"] = os.urandom(int(oversize * 1024 * 1024))
+    objects["error.xml"] = b"<Error><Code>AccessDenied</Code></Error>"
+    store = ObjectStore(objects, content_types={"error.xml": "application/xml"})
+    base = store.start()
+    dest = os.path.join(_tmp, "download.bin")
+    ok = True
+    try:
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            print(f"download cap {cap:g} MB; times in ms, peaks in MB\n")
+            print(f"{'size MB':>8} {'legacy ms':>10} {'stream ms':>10} {'legacy MB/s':>12} "
+                  f"{'stream MB/s':>12} {'legacy peak':>12} {'stream peak':>12} {'same':>5}")
+            for s in sizes:
+                name = f"{s:g}MB.png"
+                t_old, p_old, d_old = await measure(legacy_download, client, store, base, name, dest, args.repeat)
+                t_new, p_new, d_new = await measure(streamed_download, client, store, base, name, dest, args.repeat)
+                same = d_old == d_new == hashlib.sha256(objects[name]).hexdigest()
+                ok &= same
+                print(f"{s:8g} {t_old:10.0f} {t_new:10.0f} {s / t_old * 1000:12.0f} "
+                      f"{s / t_new * 1000:12.0f} {p_old / 2**20:12.1f} {p_new / 2**20:12.1f} "
+                      f"{'yes' if same else 'NO':>5}")
+
+            print()
+            t_full, _, _ = await measure(legacy_download, client, store, base, "oversize.png", dest, 1)
+            t_rej, status = await rejection(client, store, base, "oversize.png", dest)
+            print(f"{oversize:g} MB object: legacy downloads it in {t_full:.0f} ms, "
+                  f"streaming rejects it in {t_rej:.1f} ms (HTTP {status})")
+            t_rej, status = await rejection(client, store, base, "error.xml", dest)
+            print(f"application/xml body: rejected in {t_rej:.1f} ms (HTTP {status})")
+    finally:
+        store.stop()
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark streaming image downloads")
+    parser.add_argument("--sizes-mb", default="1,16,64", help="Comma-separated object sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed downloads per size and method")
+    parser.add_argument("--cap-mb", type=float, help="Override ANOMALY_MAX_DOWNLOAD_MB (must cover --sizes-mb)")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
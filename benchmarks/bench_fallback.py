@@ -0,0 +1,132 @@
+"""Feature-matching fallback of `ecc_align`: reworked vs. the original brute-force path.
+
+The fallback is called directly, so every case is a forced fallback:
+
+  * synthetic pairs with a known camera transform (rotation, scale, shift) at
+    several sizes, scored by the median distance between the estimated and the
+    true mapping over an 8x8 grid of frame points;
+  * fixture pairs, where the two implementations are compared with each other;
+  * unrelated pairs (a synthetic baseline against another scene), which
+    should be rejected.
+
+`reference` is the original implementation: ORB with n_features, brute-force
+KNN, a Python ratio filter and RANSAC (in the base-to-maintenance direction
+the pipeline warps with). `feature_align` is timed with the baseline's
+keypoints computed per call, and again with them precomputed, as a
+registered baseline supplies them.
+
+Example:
+python benchmarks/bench_fallback.py --limit 4 --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+
+import cv2 as cv
+import numpy as np
+
+from _fixtures import fixture_pairs, timed
+
+from anomaly_engine.alignment import feature_align, orb_keypoints
+from anomaly_engine.io_utils import read_bgr, to_gray
+from anomaly_engine.profiles import get_profile
+from anomaly_engine.synthetic import generate_pair, mixed_scene
+
+SYNTHETIC = [  # (width, height, rotation_deg, scale, shift)
+    (640, 480, 3.0, 1.02, (10, -8)),
+    (1280, 960, 6.0, 0.97, (20, 15)),
+    (3077, 1920, 4.0, 1.02, (35, -20)),
+    (3077, 1920, -8.0, 1.05, (-60, 40)),
+]
+
+
+def reference(base_gray, mov_gray, n_features: int):
+    """The original fallback (base -> maintenance homography or None)."""
+    orb = cv.ORB_create(n_features)
+    k1, d1 = orb.detectAndCompute(base_gray, None)
+    k2, d2 = orb.detectAndCompute(mov_gray, None)
+    if d1 is None or d2 is None:
+        return None
+    knn = cv.BFMatcher(cv.NORM_HAMMING, crossCheck=False).knnMatch(d1, d2, k=2)
+    good = [m for m, n in (x for x in knn if len(x) == 2) if m.distance < 0.75 * n.distance]
+    if len(good) < 8:
+        return None
+    pts1 = np.float32([k1[m.queryIdx].pt for m in good])
+    pts2 = np.float32([k2[m.trainIdx].pt for m in good])
+    Hm, _ = cv.findHomography(pts1, pts2, cv.RANSAC, 3.0)
+    return Hm
+
+
+def grid_error(Hm, M, shape) -> float:
+    """Median distance (px) between Hm and M (2x3 or 3x3) over an 8x8 grid."""
+    if Hm is None:
+        return float("inf")
+    H, W = shape
+    ys, xs = np.mgrid[0:H:H / 8, 0:W:W / 8]
+    p = np.stack([xs.ravel(), ys.ravel(), np.ones(xs.size)])
+
+    def project(T):
+        q = np.asarray(T, np.float64) @ p
+        return q[:2] / q[2] if q.shape[0] == 3 else q
+
+    return float(np.median(np.linalg.norm(project(Hm) - project(M), axis=0)))
+
+
+def run_case(name, base_gray, mov_gray, n_features, repeat, truth=None):
+    ref, t_ref = timed(reference, base_gray, mov_gray, n_features, repeat=repeat)
+    stats = {}
+    new, t_new = timed(feature_align, base_gray, mov_gray, n_features, stats=stats, repeat=repeat)
+    base_orb = orb_keypoints(base_gray, n_features)
+    _, t_cached = timed(feature_align, base_gray, mov_gray, n_features, base_orb=base_orb, repeat=repeat)
+    if truth is not None:
+        err_ref, err_new = grid_error(ref, truth, base_gray.shape), grid_error(new, truth, base_gray.shape)
+        score = f"{err_ref:8.2f} {err_new:8.2f}"
+    else:
+        score = f"{'':>8} {grid_error(new, ref, base_gray.shape) if ref is not None else float('nan'):8.2f}"
+    print(f"{name:<28} {statistics.median(t_ref):8.0f} {statistics.median(t_new):8.0f} "
+          f"{statistics.median(t_cached):8.0f} {stats['inliers']:8d} {score} "
+          f"{'ok' if new is not None else 'rejected':>9}")
+    return statistics.median(t_ref), statistics.median(t_new), statistics.median(t_cached)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ecc_align feature fallback")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per case")
+    parser.add_argument("--limit", type=int, help="Only use the first N fixture pairs")
+    parser.add_argument("--profile", default="balanced", help="Profile whose orb_features budget is used")
+    args = parser.parse_args()
+    n_features = get_profile(args.profile).orb_features
+
+    print(f"ORB budget {n_features} ({args.profile}); times in ms, errors in px\n")
+    print(f"{'case':<28} {'ref ms':>8} {'new ms':>8} {'cached':>8} {'inliers':>8} "
+          f"{'ref err':>8} {'new err':>8} {'result':>9}")
+    totals = []
+    for i, (w, h, rot, scale, shift) in enumerate(SYNTHETIC):
+        pair = generate_pair(mixed_scene(w, h, 12, seed=i + 1, rotation_deg=rot, scale=scale, shift=shift))
+        truth = np.array(pair.ground_truth["camera"]["matrix"])
+        totals.append(run_case(f"synthetic {w}x{h} rot {rot:+.0f}", to_gray(pair.baseline),
+                               to_gray(pair.maintenance), n_features, args.repeat, truth))
+
+    for i, (base, maint) in enumerate(fixture_pairs(limit=args.limit)):
+        base_gray, mov_gray = to_gray(read_bgr(str(base))), to_gray(read_bgr(str(maint)))
+        if mov_gray.shape != base_gray.shape:
+            mov_gray = cv.resize(mov_gray, base_gray.shape[::-1])
+        h, w = base_gray.shape
+        totals.append(run_case(f"fixture {i} {w}x{h} (vs ref)", base_gray, mov_gray,
+                               n_features, args.repeat))
+
+    for w, h in ((1280, 960), (3077, 1920)):
+        a = generate_pair(mixed_scene(w, h, 12, seed=10))
+        b = generate_pair(mixed_scene(w, h, 12, seed=11, rotation_deg=20.0))
+        run_case(f"unrelated {w}x{h}", to_gray(a.baseline), to_gray(b.maintenance),
+                 n_features, args.repeat)
+
+    ref, new, cached = (sum(col) for col in zip(*totals))
+    print(f"\nmatched cases: reference {ref / 1000:.2f} s, feature_align {new / 1000:.2f} s "
+          f"({ref / new:.1f}x), with cached baseline keypoints {cached / 1000:.2f} s ({ref / cached:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
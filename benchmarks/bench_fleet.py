@@ -0,0 +1,192 @@
+"""Fleet sweep (`POST /api/v1/fleet`) vs. one `/detect-batch` request per group.
+
+The groups have skewed sizes, as a nightly sweep does: a few transformers
+with many inspections and many with one or two. Synthetic groups (one scene
+per group, its maintenance image repeated) are used by default; --fixtures
+groups the fixture pairs by baseline content instead. Inputs are served by
+the local object store from `loadtest.py`.
+
+  * batch: a service with `--workers W` receives one `/detect-batch` per
+    group, in request order, W at a time (what the nightly job does now);
+  * fleet: a single-worker service with ANOMALY_FLEET_WORKERS=W receives all
+    groups in one `/api/v1/fleet` call and is polled until done.
+
+Both report wall time and must agree on every image's label and anomaly
+count. On a machine with fewer than W cores the wall times mostly measure
+contention, so the per-image times of the fleet run are also replayed through
+a schedule simulation: makespan for 2, 4 and 8 lanes with groups taken in
+request order (first free lane) vs. `plan_lanes`.
+
+Example:
+python benchmarks/bench_fleet.py --workers 1
+python benchmarks/bench_fleet.py --workers 2 --sizes 20,1,1,3,1,8,2,1,1,5,1,1 --size 640x480
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import cv2 as cv
+import httpx
+
+from _fixtures import fixture_pairs
+from loadtest import ObjectStore, _free_port, start_service
+
+from anomaly_engine.fleet import plan_lanes
+from anomaly_engine.io_utils import image_digest, read_bgr
+from anomaly_engine.synthetic import generate_pair, mixed_scene
+
+PROFILE = "balanced"
+
+
+def synthetic_groups(sizes: List[int], w: int, h: int, objects: Dict[str, bytes]) -> List[Tuple[str, List[str]]]:
+    groups = []
+    for g, n in enumerate(sizes):
+        pair = generate_pair(mixed_scene(w, h, 6, seed=g))
+        objects[f"g{g}_base.png"] = cv.imencode(".png", pair.baseline)[1].tobytes()
+        objects[f"g{g}_maint.png"] = cv.imencode(".png", pair.maintenance)[1].tobytes()
+        groups.append((f"g{g}_base.png", [f"g{g}_maint.png"] * n))
+    return groups
+
+
+def fixture_groups(limit, objects: Dict[str, bytes]) -> List[Tuple[str, List[str]]]:
+    by_base = defaultdict(list)
+    for base, maint in fixture_pairs(limit=limit):
+        by_base[image_digest(read_bgr(str(base)))].append((base, maint))
+    groups = []
+    for g, pairs in enumerate(by_base.values()):
+        objects[f"g{g}_base.png"] = Path(pairs[0][0]).read_bytes()
+        names = []
+        for i, (_, maint) in enumerate(pairs):
+            objects[f"g{g}_m{i}.png"] = Path(maint).read_bytes()
+            names.append(f"g{g}_m{i}.png")
+        groups.append((f"g{g}_base.png", names))
+    return groups
+
+
+async def run_batches(url: str, store, base: str, groups, workers: int):
+    """Wall seconds and {(group, image): (label, count)} for one detect-batch per group."""
+    sem = asyncio.Semaphore(workers)
+    outcome = {}
+
+    async def one(g, baseline, maints):
+        async with sem:
+            body = {"baseline_url": store.get_url(base, baseline), "profile": PROFILE,
+                    "maintenance_urls": [store.get_url(base, m) for m in maints]}
+            r = await client.post(f"{url}/api/v1/detect-batch", json=body)
+            r.raise_for_status()
+            for res in r.json()["results"]:
+                outcome[g, res["imageIndex"]] = (res["imageLevelLabel"], res["anomalyCount"])
+
+    t0 = time.perf_counter()
+    async with httpx.AsyncClient(timeout=3600.0) as client:
+        await asyncio.gather(*(one(g, b, m) for g, (b, m) in enumerate(groups)))
+    return time.perf_counter() - t0, outcome
+
+
+def run_fleet(url: str, store, base: str, groups):
+    """Wall seconds, outcome and per-image detection ms [[...] per group] of one fleet sweep."""
+    body = {"profile": PROFILE, "groups": [
+        {"group_id": f"g{g}", "baseline_url": store.get_url(base, b),
+         "maintenance_urls": [store.get_url(base, m) for m in maints]}
+        for g, (b, maints) in enumerate(groups)]}
+    t0 = time.perf_counter()
+    r = httpx.post(f"{url}/api/v1/fleet", json=body, timeout=60.0)
+    r.raise_for_status()
+    fleet_id = r.json()["fleetId"]
+    while True:
+        time.sleep(0.5)
+        status = httpx.get(f"{url}/api/v1/fleet/{fleet_id}", params={"results": "false"}, timeout=60.0).json()
+        if status["status"] != "running":
+            break
+    wall = time.perf_counter() - t0
+    status = httpx.get(f"{url}/api/v1/fleet/{fleet_id}", timeout=60.0).json()
+    outcome, times = {}, []
+    for g, group in enumerate(status["groups"]):
+        ms = [0.0] * group["totalImages"]
+        for res in group["results"]:
+            if res["status"] == "ok":
+                outcome[g, res["imageIndex"]] = (res["imageLevelLabel"], res["anomalyCount"])
+                ms[res["imageIndex"]] = res["elapsedMs"]
+        times.append(ms)
+    return wall, outcome, times
+
+
+def simulate(times: List[List[float]], n_lanes: int) -> Tuple[float, float]:
+    """(request-order makespan, plan_lanes makespan) in ms for n_lanes lanes."""
+    free = [(0.0, lane) for lane in range(n_lanes)]
+    for ms in times:                      # each group whole, to the first free lane
+        t, lane = heapq.heappop(free)
+        heapq.heappush(free, (t + sum(ms), lane))
+    fifo = max(t for t, _ in free)
+    plan = plan_lanes([len(ms) for ms in times], n_lanes)
+    planned = max(sum(sum(times[c.group][c.start:c.stop]) for c in chunks) for chunks in plan)
+    return fifo, planned
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the fleet sweep endpoint")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (batch) / fleet lanes")
+    parser.add_argument("--sizes", default="12,1,3,1,6,2,1,1,4,1", help="Synthetic group sizes")
+    parser.add_argument("--size", default="640x480", help="Synthetic frame size WxH")
+    parser.add_argument("--fixtures", action="store_true", help="Group the fixture pairs instead")
+    parser.add_argument("--limit", type=int, help="Only use the first N fixture pairs")
+    args = parser.parse_args()
+
+    objects: Dict[str, bytes] = {}
+    if args.fixtures:
+        groups = fixture_groups(args.limit, objects)
+    else:
+        w, h = map(int, args.size.split("x"))
+        groups = synthetic_groups([int(n) for n in args.sizes.split(",")], w, h, objects)
+    if not groups:
+        print("No input groups", file=sys.stderr)
+        return 2
+    print(f"{len(groups)} groups, {sum(len(m) for _, m in groups)} images "
+          f"(sizes {[len(m) for _, m in groups]}), {args.workers} worker(s)\n")
+
+    store = ObjectStore(objects)
+    base = store.start()
+    tmp = tempfile.mkdtemp(prefix="bench_fleet_")
+    env = {"ANOMALY_WARMUP": "0", "ANOMALY_BASELINE_DIR": f"{tmp}/baselines",
+           "ANOMALY_INSPECTIONS_DIR": f"{tmp}/inspections"}
+    try:
+        port = _free_port()
+        proc = start_service(args.workers, port, env)
+        try:
+            t_batch, batch = asyncio.run(run_batches(f"http://127.0.0.1:{port}", store, base, groups, args.workers))
+        finally:
+            proc.terminate()
+            proc.wait()
+        port = _free_port()
+        proc = start_service(1, port, {**env, "ANOMALY_FLEET_WORKERS": str(args.workers)})
+        try:
+            t_fleet, fleet, times = run_fleet(f"http://127.0.0.1:{port}", store, base, groups)
+        finally:
+            proc.terminate()
+            proc.wait()
+    finally:
+        store.stop()
+
+    same = batch == fleet
+    print(f"detect-batch per group: {t_batch:7.1f} s")
+    print(f"fleet sweep:            {t_fleet:7.1f} s")
+    print(f"identical labels and counts: {'yes' if same else 'NO'} ({len(fleet)}/{len(batch)} images)\n")
+    print(f"schedule simulation from the fleet's per-image times ({sum(map(sum, times)) / 1000:.1f} s of work):")
+    print(f"{'lanes':>5} {'request order s':>16} {'plan_lanes s':>13} {'ideal s':>8}")
+    for n in (2, 4, 8):
+        fifo, planned = simulate(times, n)
+        ideal = max(sum(map(sum, times)) / n, max(max(ms, default=0.0) for ms in times))
+        print(f"{n:5d} {fifo / 1000:16.1f} {planned / 1000:13.1f} {ideal / 1000:8.1f}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,74 @@
+"""Fused image-statistics stage vs. the previous separate computations.
+
+For every fixture pair (maintenance resized to the baseline, no alignment) the
+previous gating inputs (scikit-image SSIM, two 64-bin cv.calcHist histograms
+with np.corrcoef, np.percentile of V) are timed against `image_stats`, and the
+threshold decisions they drive (SSIM >= 0.70, histogram correlation < 0.60)
+are compared.
+
+Example:
+python benchmarks/bench_image_stats.py --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+
+from _fixtures import fixture_pairs, timed
+
+import cv2 as cv
+import numpy as np
+from skimage.metrics import structural_similarity as ssim
+
+from anomaly_engine.image_stats import image_stats
+
+
+def _previous_stats(base_gray, ment_gray, ment_hsv):
+    mean_ssim, _ = ssim(base_gray, ment_gray, full=True, data_range=255)
+    hist_b = cv.normalize(cv.calcHist([base_gray], [0], None, [64], [0, 256]), None).flatten()
+    hist_m = cv.normalize(cv.calcHist([ment_gray], [0], None, [64], [0, 256]), None).flatten()
+    hist_corr = float(np.corrcoef(hist_b, hist_m)[0, 1])
+    v98 = float(np.percentile(cv.split(ment_hsv)[2], 98))
+    return mean_ssim, hist_corr, v98
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the fused image-statistics stage")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per pair")
+    parser.add_argument("--limit", type=int, help="Only use the first N fixture pairs")
+    args = parser.parse_args()
+
+    pairs = fixture_pairs(limit=args.limit)
+    if not pairs:
+        print("No fixture pairs found under inspections/", file=sys.stderr)
+        return 2
+
+    old_ms, new_ms, ssim_err = [], [], []
+    decisions = v98_exact = 0
+    for base_path, maint_path in pairs:
+        base = cv.imread(str(base_path))
+        maint = cv.resize(cv.imread(str(maint_path)), (base.shape[1], base.shape[0]))
+        base_gray = cv.cvtColor(base, cv.COLOR_BGR2GRAY)
+        ment_gray = cv.cvtColor(maint, cv.COLOR_BGR2GRAY)
+        ment_hsv = cv.cvtColor(maint, cv.COLOR_BGR2HSV)
+
+        (s_old, c_old, v_old), t_old = timed(_previous_stats, base_gray, ment_gray, ment_hsv,
+                                             repeat=args.repeat)
+        new, t_new = timed(image_stats, base_gray, ment_gray, ment_hsv, repeat=args.repeat)
+        old_ms.append(statistics.median(t_old))
+        new_ms.append(statistics.median(t_new))
+        ssim_err.append(abs(new.mean_ssim - s_old))
+        decisions += ((new.mean_ssim >= 0.70) == (s_old >= 0.70)) and ((new.hist_corr < 0.60) == (c_old < 0.60))
+        v98_exact += new.v98 == v_old
+
+    print(f"{len(pairs)} pairs")
+    print(f"previous: median {statistics.median(old_ms):8.1f} ms  mean {statistics.fmean(old_ms):8.1f} ms")
+    print(f"fused:    median {statistics.median(new_ms):8.1f} ms  mean {statistics.fmean(new_ms):8.1f} ms")
+    print(f"max |SSIM difference| {max(ssim_err):.2e}; same decisions {decisions}/{len(pairs)}; "
+          f"identical v98 {v98_exact}/{len(pairs)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+"""Hot / absolute-hot masks: separate inRange passes vs. the fused LUT stage.
+
+The current pair, `hot_color_mask` (four inRange passes and three ORs) and
+`absolute_hot_mask` (two inRange passes and an OR), is timed against
+`hot_masks`, which runs each strip of rows through one channel LUT, a
+channel sum and one LUT per output; with --bands it also writes the hue-band
+labels. Both write into preallocated outputs, as detection does. Peak
+temporary memory is measured with tracemalloc (numpy and OpenCV outputs are
+both numpy allocations).
+
+Every case checks the fused masks are bit-identical to the separate ones.
+Synthetic maintenance frames are used by default; --fixtures uses the
+maintenance image of each fixture pair.
+
+Example:
+python benchmarks/bench_masks.py --sizes 640x480,1280x960,3077x1920
+python benchmarks/bench_masks.py --fixtures --limit 8 --bands
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tracemalloc
+
+import cv2 as cv
+import numpy as np
+
+from _fixtures import fixture_pairs, timed
+
+from anomaly_engine.color_metrics import absolute_hot_mask, hot_color_mask, hot_masks, to_hsv
+from anomaly_engine.image_stats import hist_percentile
+from anomaly_engine.io_utils import read_bgr
+from anomaly_engine.synthetic import generate_pair, mixed_scene
+
+
+def separate(hsv, v_floor, out):
+    hot_color_mask(hsv, dst=out[0])
+    absolute_hot_mask(hsv, v_floor, dst=out[1])
+    return out
+
+
+def peak_mb(fn, *args, **kwargs) -> float:
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(name, img, bands, repeat) -> bool:
+    hsv = to_hsv(img)
+    v_hist = cv.calcHist([hsv], [2], None, [256], [0, 256]).ravel()
+    v_floor = max(200.0, hist_percentile(v_hist, 98.0))   # as detection's stats.v98
+    H, W = hsv.shape[:2]
+    out_a = (np.empty((H, W), np.uint8), np.empty((H, W), np.uint8))
+    out_b = (np.empty((H, W), np.uint8), np.empty((H, W), np.uint8))
+    _, t_sep = timed(separate, hsv, v_floor, out_a, repeat=repeat)
+    _, t_lut = timed(hot_masks, hsv, v_floor, out=out_b, bands=bands, repeat=repeat)
+    same = np.array_equal(out_a[0], out_b[0]) and np.array_equal(out_a[1], out_b[1])
+    sep, lut = statistics.median(t_sep), statistics.median(t_lut)
+    print(f"{name:<28} {v_floor:6.0f} {(out_a[0] > 0).mean():6.1%} {sep:8.1f} {lut:8.1f} {sep / lut:7.2f}x "
+          f"{peak_mb(separate, hsv, v_floor, out_a):9.1f} "
+          f"{peak_mb(hot_masks, hsv, v_floor, out=out_b, bands=bands):9.1f} {'yes' if same else 'NO':>5}")
+    return same
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the fused hot / abs-hot mask stage")
+    parser.add_argument("--sizes", default="640x480,1280x960,3077x1920", help="Synthetic frame sizes WxH")
+    parser.add_argument("--bands", action="store_true", help="Also write the hue-band labels")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case")
+    parser.add_argument("--fixtures", action="store_true", help="Use the fixture maintenance images instead")
+    parser.add_argument("--limit", type=int, help="Only use the first N fixture pairs")
+    args = parser.parse_args()
+
+    print(f"times in ms (median of {args.repeat}); temporaries in MB beyond the outputs"
+          f"{' ; fused run writes band labels' if args.bands else ''}\n")
+    print(f"{'case':<28} {'v_min':>6} {'hot':>6} {'sep ms':>8} {'lut ms':>8} {'speedup':>8} "
+          f"{'sep tmp':>9} {'lut tmp':>9} {'same':>5}")
+    ok = True
+    if args.fixtures:
+        for i, (_, maint) in enumerate(fixture_pairs(limit=args.limit)):
+            img = read_bgr(str(maint))
+            ok &= run_case(f"fixture {i} {img.shape[1]}x{img.shape[0]}", img, args.bands, args.repeat)
+    else:
+        for size in args.sizes.split(","):
+            w, h = map(int, size.split("x"))
+            img = generate_pair(mixed_scene(w, h, 8, seed=w)).maintenance
+            ok &= run_case(f"synthetic {w}x{h}", img, args.bands, args.repeat)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""Peak-RSS benchmark for the full-frame and tiled (memory-budgeted) pipeline.
+
+One fixture pair is rescaled to each requested size and every (size, budget)
+combination runs in a fresh subprocess, so `ru_maxrss` reflects that run
+alone. The RSS after imports and image decoding is reported separately; the
+difference is what the pipeline itself adds.
+
+Example:
+python benchmarks/bench_memory.py --megapixels 1.5 6 12 --budgets 0 64 256
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _fixtures import fixture_pairs
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0   # KiB on Linux
+
+
+def _child(base: str, maint: str, budget: float) -> None:
+    from anomaly_engine import detect_anomalies
+    from anomaly_engine.io_utils import read_bgr
+    read_bgr(base), read_bgr(maint)
+    ready = _rss_mb()
+    t0 = time.perf_counter()
+    rep = detect_anomalies(base, maint, memory_budget_mb=budget or None)
+    print(json.dumps({
+        "readyRssMb": ready,
+        "peakRssMb": _rss_mb(),
+        "ms": (time.perf_counter() - t0) * 1000.0,
+        "tileRows": rep.tile_rows,
+        "blobs": len(rep.blobs),
+        "label": rep.image_level_label,
+    }))
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure peak RSS per image size and memory budget")
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1.5, 6.0, 12.0],
+                        help="Target frame sizes (the pair is rescaled, aspect ratio kept)")
+    parser.add_argument("--budgets", type=float, nargs="+", default=[0, 64, 256],
+                        help="memory_budget_mb values to compare; 0 = full frame")
+    parser.add_argument("--pair", type=int, default=0, help="Index of the fixture pair to rescale")
+    parser.add_argument("--output-json", help="Optional path for the raw results")
+    parser.add_argument("--child", nargs=3, metavar=("BASE", "MAINT", "BUDGET"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    if args.child:
+        base, maint, budget = args.child
+        _child(base, maint, float(budget))
+        return 0
+
+    import cv2 as cv
+    pairs = fixture_pairs()
+    if not pairs:
+        print("No fixture pairs found under inspections/", file=sys.stderr)
+        return 2
+    base_src, maint_src = (cv.imread(str(p)) for p in pairs[args.pair])
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mp in args.megapixels:
+            h, w = base_src.shape[:2]
+            f = (mp * 1e6 / (h * w)) ** 0.5
+            size = (round(w * f), round(h * f))
+            base, maint = Path(tmp) / "baseline.png", Path(tmp) / "maintenance.png"
+            cv.imwrite(str(base), cv.resize(base_src, size, interpolation=cv.INTER_CUBIC))
+            cv.imwrite(str(maint), cv.resize(maint_src, size, interpolation=cv.INTER_CUBIC))
+            for budget in args.budgets:
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--child", str(base), str(maint), str(budget)],
+                    capture_output=True, text=True,
+                )
+                row = {"width": size[0], "height": size[1], "budgetMb": budget or None}
+                if proc.returncode == 0:
+                    row.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+                else:
+                    row["error"] = f"exit {proc.returncode}"
+                rows.append(row)
+                if "error" in row:
+                    print(f"{size[0]}x{size[1]} budget={budget or '-'}: {row['error']}")
+                else:
+                    print(f"{size[0]}x{size[1]} budget={budget or '-':>5} rows={row['tileRows'] or '-':>5} "
+                          f"ready={row['readyRssMb']:7.0f} MB peak={row['peakRssMb']:7.0f} MB "
+                          f"pipeline={row['peakRssMb'] - row['readyRssMb']:7.0f} MB "
+                          f"{row['ms']:8.0f} ms blobs={row['blobs']}")
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,83 @@
+"""Latency vs blob-agreement benchmark for the quality/speed profiles.
+
+Every profile is run over the stored inspection pairs. Agreement is measured
+against the `accurate` profile: blobs are matched one-to-one by bbox IoU and
+summarised as precision/recall/F1, plus image-level label agreement.
+
+Example:
+python benchmarks/bench_profiles.py --repeat 3 --output-json bench_profiles.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+
+from _fixtures import fixture_pairs, match_blobs, timed
+
+from anomaly_engine import PROFILES, detect_anomalies
+
+REFERENCE = "accurate"
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark detection profiles")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per pair and profile")
+    parser.add_argument("--limit", type=int, help="Only use the first N fixture pairs")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed to count two blobs as the same")
+    parser.add_argument("--output-json", help="Optional path for the raw results")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = _parse_args()
+    pairs = fixture_pairs(limit=args.limit)
+    if not pairs:
+        print("No fixture pairs found under inspections/", file=sys.stderr)
+        return 2
+
+    order = [REFERENCE] + [name for name in PROFILES if name != REFERENCE]
+    reports = {name: [] for name in order}
+    latency = {name: [] for name in order}
+    for base, maint in pairs:
+        for name in order:
+            rep, durations = timed(detect_anomalies, str(base), str(maint),
+                                   profile=name, repeat=args.repeat)
+            reports[name].append(rep)
+            latency[name].append(statistics.median(durations))
+
+    summary = {}
+    for name in order:
+        tp = n_ref = n_cand = label_hits = 0
+        for ref, cand in zip(reports[REFERENCE], reports[name]):
+            tp += sum(1 for _ in match_blobs(ref.blobs, cand.blobs, args.iou))
+            n_ref += len(ref.blobs)
+            n_cand += len(cand.blobs)
+            label_hits += ref.image_level_label == cand.image_level_label
+        precision = tp / n_cand if n_cand else 1.0
+        recall = tp / n_ref if n_ref else 1.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        summary[name] = {
+            "medianMs": statistics.median(latency[name]),
+            "meanMs": statistics.fmean(latency[name]),
+            "blobPrecision": precision,
+            "blobRecall": recall,
+            "blobF1": f1,
+            "labelAgreement": label_hits / len(pairs),
+        }
+
+    print(f"{len(pairs)} pairs, reference profile: {REFERENCE}")
+    print(f"{'profile':<10} {'median ms':>10} {'mean ms':>10} {'precision':>10} {'recall':>8} {'F1':>6} {'labels':>7}")
+    for name, row in summary.items():
+        print(f"{name:<10} {row['medianMs']:>10.1f} {row['meanMs']:>10.1f} {row['blobPrecision']:>10.3f} "
+              f"{row['blobRecall']:>8.3f} {row['blobF1']:>6.3f} {row['labelAgreement']:>7.2f}")
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump({"pairs": len(pairs), "reference": REFERENCE, "profiles": summary}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,97 @@
+"""Storage size and load time of per-run analysis array bundles.
+
+For every fixture pair a detection is run with `out_arrays_dir`, then the
+bundle is measured against recomputing it (the detection itself) and against
+a compressed `.npz` of the same arrays:
+
+- size on disk (uncompressed .npy vs. np.savez_compressed)
+- full load (np.load into memory) vs. memory-mapped open
+- reading a 256x256 region of dE and the aligned image from the memmaps
+  vs. from the compressed archive (which must inflate whole arrays)
+
+Example:
+python benchmarks/bench_run_arrays.py --limit 6 --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+from _fixtures import fixture_pairs, timed
+
+import numpy as np
+
+from anomaly_engine import detect_anomalies
+from anomaly_engine.run_arrays import bundle_bytes, load_run_arrays
+
+REGION = 256
+
+
+def _region(arrays):
+    H, W = arrays["dE"].shape
+    y, x = max(0, H // 2 - REGION // 2), max(0, W // 2 - REGION // 2)
+    return (float(arrays["dE"][y:y + REGION, x:x + REGION].sum())
+            + int(arrays["aligned"][y:y + REGION, x:x + REGION].sum()))
+
+
+def _npz_region(path):
+    with np.load(path) as npz:
+        return _region({"dE": npz["dE"], "aligned": npz["aligned"]})
+
+
+def _full_load(path):
+    arrays = load_run_arrays(path, mmap=False)
+    return sum(a.nbytes for k, a in arrays.items() if k != "meta")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark per-run analysis array bundles")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per measurement")
+    parser.add_argument("--limit", type=int, help="Only use the first N fixture pairs")
+    args = parser.parse_args()
+
+    pairs = fixture_pairs(limit=args.limit)
+    if not pairs:
+        print("No fixture pairs found under inspections/", file=sys.stderr)
+        return 2
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (base, maint) in enumerate(pairs):
+            bundle = os.path.join(tmp, f"run{i}")
+            _, t_detect = timed(detect_anomalies, str(base), str(maint), out_arrays_dir=bundle)
+            arrays = load_run_arrays(bundle)
+            npz_path = os.path.join(tmp, f"run{i}.npz")
+            _, t_npz_save = timed(np.savez_compressed, npz_path,
+                                  **{k: v for k, v in arrays.items() if k != "meta"})
+
+            _, t_full = timed(_full_load, bundle, repeat=args.repeat)
+            _, t_mmap = timed(load_run_arrays, bundle, repeat=args.repeat)
+            _, t_region = timed(_region, arrays, repeat=args.repeat)
+            _, t_npz_region = timed(_npz_region, npz_path, repeat=args.repeat)
+            rows.append({
+                "pixels": arrays["dE"].size,
+                "detect": t_detect[0],
+                "npy_mb": bundle_bytes(bundle) / 2**20,
+                "npz_mb": os.path.getsize(npz_path) / 2**20,
+                "npz_save": t_npz_save[0],
+                "full": statistics.median(t_full),
+                "mmap": statistics.median(t_mmap),
+                "region": statistics.median(t_region),
+                "npz_region": statistics.median(t_npz_region),
+            })
+
+    print(f"{'MPix':>6} {'detect ms':>10} {'npy MB':>8} {'npz MB':>8} {'npz save':>9} "
+          f"{'full load':>10} {'mmap open':>10} {'region mmap':>12} {'region npz':>11}")
+    for r in rows:
+        print(f"{r['pixels'] / 1e6:6.2f} {r['detect']:10.0f} {r['npy_mb']:8.1f} {r['npz_mb']:8.1f} "
+              f"{r['npz_save']:9.0f} {r['full']:10.1f} {r['mmap']:10.2f} {r['region']:12.2f} "
+              f"{r['npz_region']:11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
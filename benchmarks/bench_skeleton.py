@@ -0,0 +1,101 @@
+"""Wire skeleton: full-frame vs. restricted to the blob regions.
+
+`build_wire_skeleton` followed by `find_skeleton_nodes` is timed on the whole
+frame (the original behaviour) and with `regions=skeleton_regions(props)`,
+which thins only the connected parts of the edge/hot union that reach a
+blob's rule window. Synthetic maintenance frames are swept over size and
+hotspot count; the candidate mask is the cleaned hot-colour mask, as the
+pipeline sees it before the ΔE threshold. With --fixtures the aligned frame
+and final mask of each fixture pair are used instead.
+
+Every case checks that skeleton, wire band and skeleton nodes are identical
+inside the regions, and reports the share of the frame that was thinned.
+
+Example:
+python benchmarks/bench_skeleton.py --sizes 640x480,1280x960,3077x1920 --hotspots 2,8,32
+python benchmarks/bench_skeleton.py --fixtures --limit 8 --profile fast
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+
+import numpy as np
+
+from _fixtures import fixture_pairs, timed
+
+from anomaly_engine.blobs import blob_props
+from anomaly_engine.classification import skeleton_regions
+from anomaly_engine.color_metrics import hot_color_mask, to_hsv
+from anomaly_engine.detection import detect_anomalies
+from anomaly_engine.morphology import morphology_clean
+from anomaly_engine.profiles import get_profile
+from anomaly_engine.run_arrays import load_run_arrays
+from anomaly_engine.synthetic import generate_pair, mixed_scene
+from anomaly_engine.topology import build_wire_skeleton, find_skeleton_nodes
+
+
+def skeleton_and_nodes(img, mask, scale, regions=None):
+    skel, band = build_wire_skeleton(img, mask, scale=scale, regions=regions)
+    return skel, band, find_skeleton_nodes(skel)
+
+
+def run_case(name, img, mask, scale, repeat) -> bool:
+    hsv = to_hsv(img)
+    props = blob_props(mask, np.zeros(mask.shape, np.float32), hsv)
+    regions = skeleton_regions(props)
+    (skel, band, nodes), t_full = timed(skeleton_and_nodes, img, mask, scale, repeat=repeat)
+    (r_skel, r_band, r_nodes), t_roi = timed(skeleton_and_nodes, img, mask, scale, regions, repeat=repeat)
+
+    inside = np.zeros(mask.shape, bool)
+    for x, y, w, h in regions:
+        inside[max(0, y):y + h, max(0, x):x + w] = True
+
+    def near(points):
+        return sorted(p for p in points if inside[p[1], p[0]])
+
+    same = (np.array_equal(skel[inside], r_skel[inside]) and np.array_equal(band[inside], r_band[inside])
+            and all(near(a) == near(b) for a, b in zip(nodes, r_nodes)))
+    thinned = float((r_band > 0).sum()) / max(1, int((band > 0).sum()))
+    full, roi = statistics.median(t_full), statistics.median(t_roi)
+    print(f"{name:<30} {len(props):6d} {inside.mean():8.1%} {thinned:9.1%} {full:9.0f} {roi:9.0f} "
+          f"{full / roi:7.1f}x {'yes' if same else 'NO':>5}")
+    return same
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the region-restricted wire skeleton")
+    parser.add_argument("--sizes", default="640x480,1280x960,3077x1920", help="Synthetic frame sizes WxH")
+    parser.add_argument("--hotspots", default="2,8,32", help="Synthetic hotspot counts")
+    parser.add_argument("--profile", default="balanced", help="Profile whose skeleton_scale is used")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--fixtures", action="store_true", help="Use the fixture pairs instead")
+    parser.add_argument("--limit", type=int, help="Only use the first N fixture pairs")
+    args = parser.parse_args()
+    scale = get_profile(args.profile).skeleton_scale
+    skeleton_and_nodes(np.zeros((8, 8, 3), np.uint8), np.zeros((8, 8), np.uint8), scale)  # skimage import
+
+    print(f"skeleton_scale {scale} ({args.profile}); times in ms, skeleton + nodes\n")
+    print(f"{'case':<30} {'blobs':>6} {'regions':>8} {'wire kept':>9} {'full ms':>9} {'roi ms':>9} "
+          f"{'speedup':>8} {'same':>5}")
+    ok = True
+    if args.fixtures:
+        for i, (base, maint) in enumerate(fixture_pairs(limit=args.limit)):
+            out = tempfile.mkdtemp(prefix="bench_skeleton_")
+            detect_anomalies(str(base), str(maint), profile=args.profile, out_arrays_dir=out)
+            arrays = load_run_arrays(out, mmap=False)
+            img, mask = np.asarray(arrays["aligned"]), np.asarray(arrays["hot_mask"])
+            ok &= run_case(f"fixture {i} {img.shape[1]}x{img.shape[0]}", img, mask, scale, args.repeat)
+    else:
+        for size in args.sizes.split(","):
+            w, h = map(int, size.split("x"))
+            for n in (int(k) for k in args.hotspots.split(",")):
+                img = generate_pair(mixed_scene(w, h, n, seed=n)).maintenance
+                mask = morphology_clean(hot_color_mask(to_hsv(img)))
+                ok &= run_case(f"synthetic {w}x{h}, {n} hotspots", img, mask, scale, args.repeat)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
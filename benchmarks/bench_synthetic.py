@@ -0,0 +1,81 @@
+"""Detection accuracy and latency on synthetic pairs with known ground truth.
+
+Pairs come from `anomaly_engine.synthetic` (`mixed_scene`: hotspots split
+60/25/15 over PointOverload / LooseJoint / FullWireOverload). Detected blobs
+are matched one-to-one to ground-truth boxes by IoU; per size/density the
+script reports recall, precision, severity (Faulty / Potentially Faulty) and
+subtype agreement of matched pairs, image-label agreement and detection time.
+
+Example:
+python benchmarks/bench_synthetic.py --sizes 1280x960:12,3840x2160:120 --pairs 3
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+from collections import Counter
+from types import SimpleNamespace
+
+from _fixtures import match_blobs, timed
+
+from anomaly_engine import detect_anomalies
+from anomaly_engine.synthetic import generate_pair, mixed_scene
+
+
+def _score(gt, blobs, iou_thr):
+    truth = [SimpleNamespace(bbox=(a["x"], a["y"], a["w"], a["h"]), **a) for a in gt["anomalies"]]
+    matches = list(match_blobs(truth, blobs, iou_thr))
+    confusion = Counter((truth[i].classification, blobs[j].subtype) for i, j in matches)
+    return {
+        "truth": len(truth),
+        "detected": len(blobs),
+        "matched": len(matches),
+        "severity_ok": sum(truth[i].severity == blobs[j].classification for i, j in matches),
+        "subtype_ok": sum(truth[i].classification == blobs[j].subtype for i, j in matches),
+        "confusion": confusion,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Detection accuracy on synthetic pairs")
+    parser.add_argument("--sizes", default="1280x960:12,1920x1080:40,3840x2160:120",
+                        help="Comma-separated WxH:hotspots")
+    parser.add_argument("--pairs", type=int, default=2, help="Pairs (seeds) per size")
+    parser.add_argument("--iou", type=float, default=0.3, help="Box IoU for a match")
+    parser.add_argument("--profile", default="balanced")
+    args = parser.parse_args()
+
+    print(f"{'size':>16} {'MPix':>5} {'truth':>6} {'recall':>7} {'precision':>9} "
+          f"{'severity':>9} {'subtype':>8} {'image label':>11} {'ms':>7}")
+    confusion = Counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for spec in filter(None, args.sizes.split(",")):
+            size, _, n = spec.partition(":")
+            w, h = map(int, size.split("x"))
+            total, times, labels_ok = Counter(), [], 0
+            for seed in range(args.pairs):
+                pair = generate_pair(mixed_scene(w, h, int(n), seed=seed))
+                out = pair.save(f"{tmp}/{w}x{h}_{n}_{seed}")
+                rep, t = timed(detect_anomalies, str(out / "baseline.png"),
+                               str(out / "maintenance.png"), profile=args.profile)
+                s = _score(pair.ground_truth, rep.blobs, args.iou)
+                confusion.update(s.pop("confusion"))
+                total.update(s)
+                times.append(t[0])
+                labels_ok += rep.image_level_label == pair.ground_truth["imageLevelLabel"]
+            m = max(1, total["matched"])
+            print(f"{spec:>16} {w * h / 1e6:5.1f} {total['truth']:6d} "
+                  f"{total['matched'] / max(1, total['truth']):7.3f} "
+                  f"{total['matched'] / max(1, total['detected']):9.3f} "
+                  f"{total['severity_ok'] / m:9.3f} {total['subtype_ok'] / m:8.3f} "
+                  f"{labels_ok}/{args.pairs:<9} {statistics.median(times):7.0f}")
+
+    print("\nsubtype confusion (truth -> detected), matched blobs:")
+    for (truth, det), count in sorted(confusion.items()):
+        print(f"  {truth:>16} -> {det:<16} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,188 @@
+"""ECC seeded from the last converged warp of a registered baseline vs. from the identity.
+
+Fixture runs are grouped by baseline content (the same transformer inspected
+repeatedly) and replayed in order; --twice instead detects every fixture pair
+twice. For each maintenance image after the first:
+
+  * alignment (full frame): ECC from the identity and from the previous
+    run's converged warp, both with the profile's budget, with iterations
+    counted by stepping ECC one iteration at a time (OpenCV does not report
+    them), wall time, correlation and the largest difference between the two
+    warps; a seed is accepted when its correlation reaches the previous one;
+  * end to end: detection through a registry with warp seeding on and off,
+    comparing the align stage time, `warp_init` and the reports.
+
+Each fixture group repeats one maintenance image. --seed-shift moves the
+seed's translation by that many pixels before every seeded run, as if the
+camera had moved since the last inspection.
+
+Example:
+python benchmarks/bench_warp_seed.py --limit 2
+python benchmarks/bench_warp_seed.py --twice --profile accurate --auto-roi
+python benchmarks/bench_warp_seed.py --seed-shift 20
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import cv2 as cv
+import numpy as np
+
+from _fixtures import fixture_pairs, match_blobs
+
+from anomaly_engine import detect_anomalies
+from anomaly_engine.alignment import ecc_input_mask
+from anomaly_engine.baselines import BaselineRegistry
+from anomaly_engine.io_utils import image_digest, read_bgr, to_gray
+from anomaly_engine.profiles import get_profile
+
+
+def ecc_run(base_e, mov_e, warp, max_iter, eps, mask):
+    """One findTransformECC call: (warp or None, cc, ms)."""
+    t0 = time.perf_counter()
+    try:
+        cc, warp = cv.findTransformECC(base_e, mov_e, warp.copy(), cv.MOTION_AFFINE,
+                                       (cv.TERM_CRITERIA_EPS | cv.TERM_CRITERIA_COUNT, max_iter, eps),
+                                       inputMask=mask)
+    except cv.error:
+        warp, cc = None, 0.0
+    return warp, float(cc), (time.perf_counter() - t0) * 1000.0
+
+
+def ecc_iterations(base_e, mov_e, warp, max_iter, eps, mask) -> int:
+    """Iterations one ECC call runs: same updates and |Δcc| < eps stop, one step at a time."""
+    rho, last = -1.0, -eps
+    warp = warp.copy()
+    n = 0
+    while n < max_iter and abs(rho - last) >= eps:
+        last = rho
+        try:
+            rho, warp = cv.findTransformECC(base_e, mov_e, warp, cv.MOTION_AFFINE,
+                                            (cv.TERM_CRITERIA_COUNT, 1, 0), inputMask=mask)
+        except cv.error:
+            break
+        n += 1
+    return n
+
+
+def shifted(warp, px: float):
+    """The warp with its translation moved by px pixels in x and y."""
+    warp = warp.copy()
+    warp[:, 2] += px
+    return warp
+
+
+def grouped_pairs(limit: int | None):
+    groups = defaultdict(list)
+    for base, maint in fixture_pairs():
+        groups[image_digest(read_bgr(str(base)))].append((base, maint))
+    ordered = sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+    return ordered[:limit] if limit else ordered
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ECC warp seeding for repeated inspections")
+    parser.add_argument("--limit", type=int, help="Only use the N largest baseline groups")
+    parser.add_argument("--no-end-to-end", action="store_true", help="Only benchmark the alignment step")
+    parser.add_argument("--seed-shift", type=float, default=0.0,
+                        help="Offset the seed's translation by this many pixels (x and y)")
+    parser.add_argument("--twice", action="store_true", help="Detect every fixture pair twice instead")
+    parser.add_argument("--profile", default="balanced", help="Pipeline profile")
+    parser.add_argument("--auto-roi", action="store_true", help="Crop to the baseline ROI (end to end only)")
+    args = parser.parse_args()
+
+    if args.twice:
+        groups = [[pair, pair] for pair in fixture_pairs(limit=args.limit)]
+    else:
+        groups = grouped_pairs(args.limit)
+    if not groups:
+        print("No fixture baseline with two or more runs under inspections/", file=sys.stderr)
+        return 2
+
+    prof = get_profile(args.profile)
+    rows = []
+    e2e = {"off": [], "on": []}
+    inits, identical = defaultdict(int), 0
+    for gi, pairs in enumerate(groups):
+        base_gray = to_gray(read_bgr(str(pairs[0][0])))
+        base_e = cv.Canny(base_gray, 50, 150)
+        mask = ecc_input_mask(base_gray.shape)
+        eye = np.eye(2, 3, dtype=np.float32)
+        prev = prev_cc = None
+        for _, maint in pairs:
+            mov_gray = to_gray(read_bgr(str(maint)))
+            if mov_gray.shape != base_gray.shape:
+                mov_gray = cv.resize(mov_gray, (base_gray.shape[1], base_gray.shape[0]))
+            mov_e = cv.Canny(mov_gray, 50, 150)
+            warp, cc, ms = ecc_run(base_e, mov_e, eye, prof.ecc_max_iter, prof.ecc_eps, mask)
+            if prev is not None and warp is not None:
+                seed = shifted(prev, args.seed_shift)
+                seed_warp, seed_cc, seed_ms = ecc_run(base_e, mov_e, seed, prof.ecc_max_iter, prof.ecc_eps, mask)
+                rows.append({
+                    "group": gi, "size": base_gray.shape[::-1],
+                    "it_identity": ecc_iterations(base_e, mov_e, eye, prof.ecc_max_iter, prof.ecc_eps, mask),
+                    "it_seeded": ecc_iterations(base_e, mov_e, seed, prof.ecc_max_iter, prof.ecc_eps, mask),
+                    "ms_identity": ms, "ms_seeded": seed_ms, "cc_identity": cc, "cc_seeded": seed_cc,
+                    "accepted": seed_warp is not None and seed_cc >= prev_cc,
+                    "dmax": float(np.abs(seed_warp - warp).max()) if seed_warp is not None else float("nan"),
+                })
+            if warp is not None:
+                prev, prev_cc = warp, cc
+
+        if args.no_end_to_end:
+            continue
+        reports = {}
+        for mode in ("off", "on"):
+            with tempfile.TemporaryDirectory() as root:
+                registry = BaselineRegistry(root, seed_warps=mode == "on")
+                registry.register(pairs[0][0], "fixture")
+                for i, (base, maint) in enumerate(pairs):
+                    feats = registry.get("fixture")
+                    stored = dict(feats.warps)
+                    seeds = {key: (shifted(w, args.seed_shift), cc) for key, (w, cc) in stored.items()}
+                    feats.warps.update(seeds)
+                    timings = {}
+                    rep = detect_anomalies(str(base), str(maint), baseline=feats, profile=prof,
+                                           auto_roi=args.auto_roi or None, timings=timings)
+                    for key, seed in seeds.items():   # not replaced: keep the unshifted warp
+                        if feats.warps[key] is seed:
+                            feats.warps[key] = stored[key]
+                    reports[mode, i] = rep
+                    if i:
+                        e2e[mode].append(timings["align"])
+                        if mode == "on":
+                            inits[rep.warp_init] += 1
+        for i in range(1, len(pairs)):
+            ref, got = reports["off", i], reports["on", i]
+            matched = sum(1 for _ in match_blobs(ref.blobs, got.blobs))
+            identical += (ref.image_level_label == got.image_level_label
+                          and matched == len(ref.blobs) == len(got.blobs))
+
+    print(f"{len(groups)} baseline group(s), {len(rows)} repeat inspections, {prof.name} profile"
+          f"{' with ROI crop' if args.auto_roi else ''} (seed shifted {args.seed_shift:g} px)\n")
+    print(f"{'group':>5} {'size':>10} {'it id':>6} {'it seed':>8} {'ms id':>8} {'ms seed':>8} "
+          f"{'cc id':>6} {'cc seed':>8} {'accepted':>9} {'max |dW|':>9}")
+    for r in rows:
+        print(f"{r['group']:5d} {'%dx%d' % r['size']:>10} {r['it_identity']:6d} {r['it_seeded']:8d} "
+              f"{r['ms_identity']:8.0f} {r['ms_seeded']:8.0f} {r['cc_identity']:6.3f} {r['cc_seeded']:8.3f} "
+              f"{'yes' if r['accepted'] else 'no':>9} {r['dmax']:9.3f}")
+    print(f"\nmedian iterations: identity {statistics.median(r['it_identity'] for r in rows):.0f}, "
+          f"seeded {statistics.median(r['it_seeded'] for r in rows):.0f}")
+    print(f"total ECC time:    identity {sum(r['ms_identity'] for r in rows) / 1000:.1f} s, "
+          f"seeded {sum(r['ms_seeded'] for r in rows) / 1000:.1f} s")
+    if e2e["on"]:
+        print(f"\nend to end, align stage: seeding off median {statistics.median(e2e['off']):.0f} ms "
+              f"(total {sum(e2e['off']) / 1000:.1f} s), on median {statistics.median(e2e['on']):.0f} ms "
+              f"(total {sum(e2e['on']) / 1000:.1f} s)")
+        print(f"warp_init with seeding: {dict(inits)}")
+        print(f"same label and blobs as unseeded: {identical}/{len(e2e['on'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
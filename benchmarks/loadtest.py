@@ -0,0 +1,408 @@
+"""End-to-end load test of /api/v1/detect and /api/v1/detect-batch.
+
+The service only talks to S3 through presigned URLs, so a local object-store
+stand-in replaces S3: a threaded HTTP server that serves GETs of the input
+images and accepts PUTs of annotated JPEGs, with injectable latency and error
+rates. URLs carry presign-style query strings; the service treats them as
+opaque.
+
+The service is started as a uvicorn subprocess (--workers N), or an already
+running instance is targeted with --service-url. Load is either closed-loop
+(--concurrency clients back to back) or open-loop (--rate requests/s with
+Poisson arrivals; latency is measured from the scheduled arrival, so queueing
+in the service is included). Reported: throughput, p50/p95/p99/max latency,
+errors by kind, store traffic and, when the service process is known, CPU
+utilisation and RSS of the service process tree (sampled from /proc).
+
+Example:
+python benchmarks/loadtest.py --workers 1 --concurrency 2 --duration 60
+python benchmarks/loadtest.py --rate 0.5 --duration 120 --synthetic 1280x960:12 --store-latency-ms 50
+python benchmarks/loadtest.py --endpoint detect-batch --batch-size 4 --requests 10 --store-error-rate 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+
+from _fixtures import PROJECT_ROOT, fixture_pairs
+
+import cv2 as cv
+import httpx
+import numpy as np
+
+from anomaly_engine.synthetic import generate_pair, mixed_scene
+
+
+class ObjectStore:
+    """Local stand-in for presigned S3 GET/PUT URLs."""
+
+    def __init__(self, objects: Dict[str, bytes], latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 get_error_rate: float = 0.0, put_error_rate: float = 0.0, seed: int = 0,
+                 content_types: Dict[str, str] = None):
+        self.objects = objects
+        self.content_types = content_types or {}  # per-object overrides of image/png
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.get_error_rate, self.put_error_rate = get_error_rate, put_error_rate
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _delay_and_fail(self, error_rate: float) -> bool:
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms))
+            fail = self._rng.random() < error_rate
+        if delay:
+            time.sleep(delay / 1000.0)
+        return fail
+
+    def start(self) -> str:
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=b"", ctype="application/xml"):
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    store.stats["aborted_by_client"] += 1
+
+            def do_GET(self):
+                name = self.path.split("?", 1)[0].removeprefix("/objects/")
+                if store._delay_and_fail(store.get_error_rate):
+                    store.stats["get_injected_errors"] += 1
+                    return self._reply(503, b"<Error><Code>SlowDown</Code></Error>")
+                data = store.objects.get(name)
+                if data is None:
+                    store.stats["get_not_found"] += 1
+                    return self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+                store.stats["gets"] += 1
+                store.stats["get_bytes"] += len(data)
+                self._reply(200, data, store.content_types.get(name, "image/png"))
+
+            def do_PUT(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if store._delay_and_fail(store.put_error_rate):
+                    store.stats["put_injected_errors"] += 1
+                    return self._reply(503, b"<Error><Code>SlowDown</Code></Error>")
+                store.stats["puts"] += 1
+                store.stats["put_bytes"] += len(body)
+                self._reply(200)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def get_url(self, base: str, name: str) -> str:
+        return f"{base}/objects/{name}?X-Amz-Expires=900&X-Amz-Signature={uuid.uuid4().hex}"
+
+    def put_url(self, base: str, key: str) -> str:
+        return f"{base}/uploads/{key}?X-Amz-Expires=900&X-Amz-Signature={uuid.uuid4().hex}"
+
+
+class ProcessSampler:
+    """CPU time and RSS of a process and its descendants, from /proc."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid, self.interval = pid, interval
+        self.rss_samples: List[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._cpu0 = self._wall0 = 0.0
+        self.cpu_s = self.wall_s = 0.0
+
+    def _tree(self) -> List[int]:
+        pids, todo = [], [self.pid]
+        while todo:
+            pid = todo.pop()
+            pids.append(pid)
+            for task in Path(f"/proc/{pid}/task").glob("*/children"):
+                try:
+                    todo.extend(int(c) for c in task.read_text().split())
+                except OSError:
+                    pass
+        return pids
+
+    def _cpu_and_rss(self):
+        cpu, rss = 0.0, 0.0
+        tick, page = os.sysconf("SC_CLK_TCK"), os.sysconf("SC_PAGE_SIZE")
+        for pid in self._tree():
+            try:
+                stat = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+                cpu += (int(stat[11]) + int(stat[12])) / tick     # utime + stime
+                rss += int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * page / 2**20
+            except (OSError, IndexError, ValueError):
+                pass
+        return cpu, rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.rss_samples.append(self._cpu_and_rss()[1])
+
+    def start(self):
+        self._cpu0, _ = self._cpu_and_rss()
+        self._wall0 = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        cpu, rss = self._cpu_and_rss()
+        self.rss_samples.append(rss)
+        self.cpu_s, self.wall_s = cpu - self._cpu0, time.perf_counter() - self._wall0
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_service(workers: int, port: int, env_extra: Dict[str, str]) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env={**os.environ, **env_extra},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"service exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("service did not become healthy within 120 s")
+
+
+def load_inputs(args) -> List[Dict[str, bytes]]:
+    """[{'baseline': png bytes, 'maintenance': png bytes}, ...]"""
+    inputs = []
+    if args.synthetic:
+        for i, spec in enumerate(filter(None, args.synthetic.split(","))):
+            size, _, n = spec.partition(":")
+            w, h = map(int, size.split("x"))
+            pair = generate_pair(mixed_scene(w, h, int(n or 0), seed=i))
+            inputs.append({k: cv.imencode(".png", img)[1].tobytes()
+                           for k, img in (("baseline", pair.baseline), ("maintenance", pair.maintenance))})
+    else:
+        for base, maint in fixture_pairs(limit=args.limit):
+            inputs.append({"baseline": base.read_bytes(), "maintenance": maint.read_bytes()})
+    return inputs
+
+
+async def run_load(args, service_url: str, store: ObjectStore, store_url: str, n_inputs: int):
+    results = []           # (latency_ms, status or None, error kind or None)
+    counter = iter(range(10**12))
+
+    def body(i: int):
+        pair = i % n_inputs
+        base_url = store.get_url(store_url, f"{pair}/baseline.png")
+        if args.endpoint == "detect":
+            return "/api/v1/detect", {
+                "baseline_url": base_url,
+                "maintenance_url": store.get_url(store_url, f"{pair}/maintenance.png"),
+                "annotated_upload_url": store.put_url(store_url, f"annotated/{uuid.uuid4().hex}.jpg"),
+                "profile": args.profile,
+            }
+        return "/api/v1/detect-batch", {
+            "baseline_url": base_url,
+            "maintenance_urls": [store.get_url(store_url, f"{(pair + k) % n_inputs}/maintenance.png")
+                                 for k in range(args.batch_size)],
+            "profile": args.profile,
+        }
+
+    async def one(client, i, t_sched, record=True):
+        path, payload = body(i)
+        status, kind = None, None
+        try:
+            resp = await client.post(path, json=payload)
+            status = resp.status_code
+            if status != 200:
+                kind = f"http_{status}"
+        except httpx.TimeoutException:
+            kind = "timeout"
+        except httpx.HTTPError as exc:
+            kind = type(exc).__name__
+        if record:
+            results.append(((time.perf_counter() - t_sched) * 1000.0, status, kind))
+
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight) + 4)
+    async with httpx.AsyncClient(base_url=service_url, timeout=args.timeout, limits=limits) as client:
+        for _ in range(args.warmup):
+            await one(client, next(counter), time.perf_counter(), record=False)
+
+        t0 = time.perf_counter()
+        deadline = t0 + args.duration if args.duration else None
+        budget = args.requests
+
+        def more(issued: int) -> bool:
+            if budget is not None and issued >= budget:
+                return False
+            return deadline is None or time.perf_counter() < deadline
+
+        issued = 0
+        if args.rate:
+            sem = asyncio.Semaphore(args.max_in_flight)
+            tasks, rng = [], random.Random(args.seed)
+            t_next = t0
+
+            async def arrival(i, t_sched):
+                async with sem:
+                    await one(client, i, t_sched)
+
+            while more(issued):
+                await asyncio.sleep(max(0.0, t_next - time.perf_counter()))
+                tasks.append(asyncio.create_task(arrival(next(counter), t_next)))
+                issued += 1
+                t_next += rng.expovariate(args.rate)
+            await asyncio.gather(*tasks)
+        else:
+            async def client_loop():
+                nonlocal issued
+                while more(issued):
+                    issued += 1
+                    await one(client, next(counter), time.perf_counter())
+            await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - t0
+    return results, elapsed
+
+
+def summarize(results, elapsed, store: ObjectStore, sampler: ProcessSampler | None, args) -> Dict:
+    lat = np.array([r[0] for r in results]) if results else np.zeros(1)
+    ok = [r for r in results if r[2] is None]
+    errors = Counter(r[2] for r in results if r[2] is not None)
+    images = args.batch_size if args.endpoint == "detect-batch" else 1
+    out = {
+        "endpoint": args.endpoint,
+        "mode": f"open rate={args.rate}/s" if args.rate else f"closed concurrency={args.concurrency}",
+        "requests": len(results),
+        "ok": len(ok),
+        "elapsedS": elapsed,
+        "throughputRps": len(ok) / elapsed if elapsed else 0.0,
+        "imagesPerS": len(ok) * images / elapsed if elapsed else 0.0,
+        "latencyMs": {"p50": float(np.percentile(lat, 50)), "p95": float(np.percentile(lat, 95)),
+                      "p99": float(np.percentile(lat, 99)), "max": float(lat.max()),
+                      "mean": float(lat.mean())},
+        "errorRate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "errors": dict(errors),
+        "store": dict(store.stats),
+    }
+    if sampler is not None:
+        out["service"] = {
+            "cpuPercent": 100.0 * sampler.cpu_s / sampler.wall_s if sampler.wall_s else 0.0,
+            "cpuSeconds": sampler.cpu_s,
+            "rssPeakMb": max(sampler.rss_samples),
+            "rssMeanMb": float(np.mean(sampler.rss_samples)),
+        }
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the detection service")
+    parser.add_argument("--service-url", help="Target a running service instead of starting one")
+    parser.add_argument("--service-pid", type=int, help="PID to sample for CPU/RSS with --service-url")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started service")
+    parser.add_argument("--endpoint", choices=("detect", "detect-batch"), default="detect")
+    parser.add_argument("--batch-size", type=int, default=4, help="Maintenance images per batch request")
+    parser.add_argument("--concurrency", type=int, default=1, help="Closed-loop clients")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate (requests/s)")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Open-loop in-flight cap")
+    parser.add_argument("--duration", type=float, help="Seconds of load (default: until --requests)")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests first")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout (s)")
+    parser.add_argument("--profile", default="balanced")
+    parser.add_argument("--limit", type=int, default=4, help="Fixture pairs to serve")
+    parser.add_argument("--synthetic", help="Serve synthetic pairs instead (WxH:hotspots,...)")
+    parser.add_argument("--store-latency-ms", type=float, default=0.0)
+    parser.add_argument("--store-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--store-error-rate", type=float, default=0.0, help="Injected 503s on GET")
+    parser.add_argument("--store-put-error-rate", type=float, default=0.0, help="Injected 503s on PUT")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the summary JSON here")
+    args = parser.parse_args()
+    if args.duration is None and args.requests is None:
+        args.requests = 20
+
+    inputs = load_inputs(args)
+    if not inputs:
+        print("No input pairs", file=sys.stderr)
+        return 2
+    objects = {f"{i}/{k}.png": data for i, pair in enumerate(inputs) for k, data in pair.items()}
+    store = ObjectStore(objects, args.store_latency_ms, args.store_jitter_ms,
+                        args.store_error_rate, args.store_put_error_rate, args.seed)
+    store_url = store.start()
+
+    proc, sampler = None, None
+    try:
+        if args.service_url:
+            service_url = args.service_url
+            if args.service_pid:
+                sampler = ProcessSampler(args.service_pid)
+        else:
+            port = _free_port()
+            proc = start_service(args.workers, port, {})
+            service_url = f"http://127.0.0.1:{port}"
+            sampler = ProcessSampler(proc.pid)
+
+        if sampler is not None:
+            sampler.start()
+        results, elapsed = asyncio.run(run_load(args, service_url, store, store_url, len(inputs)))
+        if sampler is not None:
+            sampler.stop()
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        store.stop()
+
+    summary = summarize(results, elapsed, store, sampler, args)
+    lat = summary["latencyMs"]
+    print(f"{summary['endpoint']} ({summary['mode']}): {summary['requests']} requests, "
+          f"{summary['ok']} ok in {summary['elapsedS']:.1f} s")
+    print(f"throughput {summary['throughputRps']:.3f} req/s ({summary['imagesPerS']:.3f} images/s)")
+    print(f"latency ms p50 {lat['p50']:.0f}  p95 {lat['p95']:.0f}  p99 {lat['p99']:.0f}  max {lat['max']:.0f}")
+    print(f"errors {summary['errorRate']:.1%} {summary['errors']}")
+    print(f"store {summary['store']}")
+    if "service" in summary:
+        s = summary["service"]
+        print(f"service CPU {s['cpuPercent']:.0f}% ({s['cpuSeconds']:.1f} s), "
+              f"RSS peak {s['rssPeakMb']:.0f} MB, mean {s['rssMeanMb']:.0f} MB")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
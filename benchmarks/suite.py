@@ -0,0 +1,198 @@
+"""Per-stage benchmark suite with regression gates.
+
+Every engine stage is timed in isolation on prepared inputs, plus the
+end-to-end `detect_anomalies`, for each input:
+
+- stored fixture pairs (`fixture:<run>`, first --limit runs)
+- synthetic thermal pairs (`synthetic:<W>x<H>:<hotspots>`, generated by
+  `anomaly_engine.synthetic.mixed_scene`) at several resolutions and hotspot
+  densities
+
+Results (median / min / all runs in ms per `<input>/<stage>`, plus library
+versions and CPU) are written as JSON. With --baseline, each median is
+compared to the saved one and the run fails (exit 1) when it is slower than
+baseline * (1 + tolerance) by more than --min-ms; --update-baseline writes
+the current results as the new baseline instead.
+
+Example:
+python benchmarks/suite.py --output bench.json --update-baseline bench_base.json
+python benchmarks/suite.py --baseline bench_base.json --tolerance 0.25
+python benchmarks/suite.py --stages deltaE_map,blob_props --synthetic 3840x2160:128 --limit 0
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+from _fixtures import fixture_pairs, timed
+
+import cv2 as cv
+import numpy as np
+import skimage
+
+from anomaly_engine import detect_anomalies, get_profile
+from anomaly_engine.alignment import ecc_align, warp_to_base
+from anomaly_engine.blobs import blob_props
+from anomaly_engine.classification import classify_blob_enhanced
+from anomaly_engine.color_metrics import (absolute_hot_mask, deltaE_map, hot_color_mask,
+                                          lab_and_hsv, to_lab)
+from anomaly_engine.io_utils import read_bgr, to_gray
+from anomaly_engine.morphology import morphology_clean
+from anomaly_engine.synthetic import generate_pair, mixed_scene
+from anomaly_engine.topology import build_wire_skeleton, find_skeleton_nodes
+from anomaly_engine.visualization import overlay_detections
+
+STAGES = ("ecc_align", "lab_and_hsv", "deltaE_map", "hot_color_mask", "morphology_clean",
+          "build_wire_skeleton", "find_skeleton_nodes", "blob_props",
+          "classify_blob_enhanced", "overlay_detections", "pipeline")
+DEFAULT_SYNTHETIC = "640x480:8,1920x1080:32,1920x1080:256"
+T_POT, T_FAULT = 8.0, 12.0
+
+
+def _parse_synthetic(spec: str):
+    out = []
+    for item in filter(None, spec.split(",")):
+        size, _, hotspots = item.partition(":")
+        w, _, h = size.partition("x")
+        out.append((int(w), int(h), int(hotspots or 0)))
+    return out
+
+
+def _classify_all(props, skel, joints, mask, abs_hot):
+    return [classify_blob_enhanced(p, dE_thr_fault=T_FAULT, dE_thr_pot=T_POT, skel=skel,
+                                   joints=joints, hot_mask=mask, abs_hot_mask=abs_hot)
+            for p in props]
+
+
+def bench_input(name, base_path, maint_path, stages, repeat, profile):
+    """Median/min ms per stage for one baseline/maintenance pair."""
+    prof = get_profile(profile)
+    results = {}
+
+    def run(stage, fn, *args, **kwargs):
+        if stage not in stages:
+            return fn(*args, **kwargs)
+        out, durations = timed(fn, *args, repeat=repeat, **kwargs)
+        results[f"{name}/{stage}"] = {"median_ms": statistics.median(durations),
+                                      "min_ms": min(durations), "runs_ms": durations}
+        return out
+
+    report = run("pipeline", detect_anomalies, str(base_path), str(maint_path), profile=prof)
+
+    base = read_bgr(str(base_path))
+    maint = read_bgr(str(maint_path))
+    H, W = base.shape[:2]
+    base_gray, maint_gray = to_gray(base), to_gray(maint)
+    if maint.shape[:2] != (H, W):   # as in detection: both resized from the originals
+        maint = cv.resize(maint, (W, H), interpolation=cv.INTER_LINEAR)
+        maint_gray = cv.resize(maint_gray, (W, H), interpolation=cv.INTER_LINEAR)
+
+    warp, _, _, _ = run("ecc_align", ecc_align, base_gray, maint_gray, max_iter=prof.ecc_max_iter,
+                        eps=prof.ecc_eps, n_features=prof.orb_features)
+    aligned = warp_to_base(maint, warp, (W, H))
+    lab_m, hsv = run("lab_and_hsv", lab_and_hsv, aligned)
+    dE = run("deltaE_map", deltaE_map, to_lab(base), lab_m, formula=prof.delta_e)
+    hot = run("hot_color_mask", hot_color_mask, hsv)
+    mask = cv.bitwise_and(hot, cv.compare(dE, T_POT, cv.CMP_GE))
+    mask = run("morphology_clean", morphology_clean, mask)
+    skel, _ = run("build_wire_skeleton", build_wire_skeleton, aligned, mask, scale=prof.skeleton_scale)
+    endpoints, junctions = run("find_skeleton_nodes", find_skeleton_nodes, skel)
+    props = run("blob_props", blob_props, mask, dE, hsv)
+    abs_hot = absolute_hot_mask(hsv, 200.0)
+    run("classify_blob_enhanced", _classify_all, props, skel, endpoints + junctions, mask, abs_hot)
+    run("overlay_detections", overlay_detections, aligned, report.blobs)
+    return results, {"pixels": H * W, "blobs": len(props)}
+
+
+def compare(current, baseline, tolerance, min_ms):
+    """[(key, base_ms, cur_ms, ratio, regressed)] for keys present in both."""
+    rows = []
+    for key, cur in sorted(current.items()):
+        base = baseline.get(key)
+        if base is None:
+            continue
+        b, c = base["median_ms"], cur["median_ms"]
+        ratio = c / b if b > 0 else float("inf")
+        rows.append((key, b, c, ratio, c > b * (1.0 + tolerance) and c - b > min_ms))
+    return rows
+
+
+def _environment():
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "opencv": cv.__version__, "skimage": skimage.__version__,
+            "machine": platform.machine(), "processor": platform.processor(),
+            "cpus": os.cpu_count()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Per-stage benchmark suite with regression gates")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--limit", type=int, default=3, help="Fixture pairs to use (0 for none)")
+    parser.add_argument("--synthetic", default=DEFAULT_SYNTHETIC,
+                        help="Comma-separated WxH:hotspots synthetic inputs ('' for none)")
+    parser.add_argument("--stages", help=f"Comma-separated subset of: {', '.join(STAGES)}")
+    parser.add_argument("--profile", default="balanced", help="Pipeline profile")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.20,
+                        help="Allowed slowdown vs. the baseline median (0.20 = 20%%)")
+    parser.add_argument("--min-ms", type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this many ms")
+    parser.add_argument("--update-baseline", metavar="PATH", help="Save these results as the baseline")
+    args = parser.parse_args()
+
+    stages = set(args.stages.split(",")) if args.stages else set(STAGES)
+    unknown = stages - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    results, inputs = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        pairs = [(f"fixture:{Path(b).parent.name[:8]}", b, m)
+                 for b, m in (fixture_pairs(limit=args.limit) if args.limit else [])]
+        for w, h, n in _parse_synthetic(args.synthetic):
+            name = f"synthetic:{w}x{h}:{n}"
+            out = generate_pair(mixed_scene(w, h, n)).save(os.path.join(tmp, f"{w}x{h}_{n}"))
+            pairs.append((name, out / "baseline.png", out / "maintenance.png"))
+        if not pairs:
+            print("No inputs (no fixtures and no synthetic sizes)", file=sys.stderr)
+            return 2
+        for name, b, m in pairs:
+            res, info = bench_input(name, b, m, stages, args.repeat, args.profile)
+            results.update(res)
+            inputs[name] = info
+            print(f"{name}: {info['pixels'] / 1e6:.2f} MPix, {info['blobs']} blobs", file=sys.stderr)
+
+    doc = {"environment": _environment(), "profile": args.profile, "repeat": args.repeat,
+           "inputs": inputs, "results": results}
+    print(f"{'input/stage':<52} {'median ms':>10} {'min ms':>9}")
+    for key, r in results.items():
+        print(f"{key:<52} {r['median_ms']:10.2f} {r['min_ms']:9.2f}")
+    for path in filter(None, (args.output, args.update_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        base_doc = json.load(f)
+    if base_doc.get("environment") != doc["environment"]:
+        print("warning: baseline was recorded in a different environment", file=sys.stderr)
+    rows = compare(results, base_doc["results"], args.tolerance, args.min_ms)
+    regressions = [r for r in rows if r[4]]
+    print(f"\n{'input/stage':<52} {'base ms':>9} {'now ms':>9} {'ratio':>6}")
+    for key, b, c, ratio, regressed in rows:
+        print(f"{key:<52} {b:9.2f} {c:9.2f} {ratio:6.2f}{'  REGRESSION' if regressed else ''}")
+    print(f"\n{len(regressions)} regression(s) of {len(rows)} compared "
+          f"(tolerance {args.tolerance:.0%}, min {args.min_ms} ms)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
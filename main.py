@@ -1,11 +1,21 @@
 """
 FastAPI Microservice for Anomaly Detection using Computer Vision
 """
+import time
+_IMPORT_T0 = time.perf_counter()
+
 import os
+import asyncio
+import hashlib
+import threading
 import uuid
 import logging
 import tempfile
 from typing import Optional, List, Any, Dict, Tuple
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 from datetime import datetime
 from urllib.parse import urlparse
 from fastapi import FastAPI, HTTPException
@@ -14,12 +24,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import cv2 as cv
 import httpx
-import uvicorn
+import numpy as np
 
 from anomaly_cv import detect_anomalies, DetectionReport
-from anomaly_engine.io_utils import read_bgr, to_gray
-from anomaly_engine.alignment import ecc_align
+from anomaly_engine.io_utils import read_bgr
+from anomaly_engine.alignment import warp_to_base
+from anomaly_engine.profiles import PROFILES
+from anomaly_engine.buffers import pool_stats, set_process_cap
+from anomaly_engine.baselines import BaselineFeatures, BaselineRegistry
+from anomaly_engine.dispatch import Dispatcher, worker_detect, worker_executor
+from anomaly_engine.fleet import Chunk, FleetProgress, plan_lanes
+from anomaly_engine.run_index import RunIndex
 from anomaly_engine.visualization import overlay_detections
+from anomaly_engine.warmup import warm_up
 
 logging.basicConfig(
     level=logging.INFO,
@@ -46,6 +63,131 @@ app.add_middleware(
 # Temporary directory for processing
 TEMP_DIR = tempfile.gettempdir()
 
+# Largest image accepted from a URL, checked on Content-Length and while streaming; 0 disables
+MAX_DOWNLOAD_MB = float(os.environ.get("ANOMALY_MAX_DOWNLOAD_MB", "64") or 0)
+
+# Working-set budget for the per-pixel stages; unset/0 processes whole frames
+MEMORY_BUDGET_MB = float(os.environ.get("ANOMALY_MEMORY_BUDGET_MB", "0") or 0) or None
+# Free full-frame buffers kept for reuse, per process, over all its detection threads
+BUFFER_POOL_MB = float(os.environ.get("ANOMALY_BUFFER_POOL_MB", "512") or 0)
+
+# Registered baselines (image + precomputed features), referenced by baseline_id
+BASELINE_DIR = os.environ.get(
+    "ANOMALY_BASELINE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+)
+# Seed ECC for a registered baseline from its last converged warp (off by default)
+WARP_SEED = os.environ.get("ANOMALY_WARP_SEED", "0") not in ("0", "false", "False", "")
+BASELINE_REGISTRY: Optional[BaselineRegistry] = None
+
+# Stored inspection runs and their SQLite query index (<dir>/runs.sqlite)
+INSPECTIONS_DIR = os.environ.get(
+    "ANOMALY_INSPECTIONS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "inspections")
+)
+RUN_INDEX: Optional[RunIndex] = None
+
+# Most recently used baselines loaded into memory at startup; 0 disables
+BASELINE_WARM_LOAD = int(os.environ.get("ANOMALY_BASELINE_WARM_LOAD", "8") or 0)
+
+# Engine worker processes that detect/detect-batch are routed to by baseline
+# identity (see anomaly_engine.dispatch); unset/0 detects in this process
+ENGINE_WORKERS = int(os.environ.get("ANOMALY_ENGINE_WORKERS", "0") or 0)
+DISPATCHER: Optional[Dispatcher] = None
+
+# Worker processes (lanes) of a fleet sweep; unset/0 uses one per CPU
+FLEET_WORKERS = int(os.environ.get("ANOMALY_FLEET_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+
+# Default overall deadline of a fleet sweep, in seconds
+FLEET_DEADLINE_S = float(os.environ.get("ANOMALY_FLEET_DEADLINE_S", "3600") or 3600)
+
+# Finished fleet sweeps kept for polling; older ones are dropped first
+FLEET_KEEP = 32
+
+# Run the pipeline once on a tiny synthetic pair before reporting ready; 0 disables
+WARMUP = os.environ.get("ANOMALY_WARMUP", "1") not in ("0", "false", "False", "")
+
+IMPORT_MS = (time.perf_counter() - _IMPORT_T0) * 1000.0
+READINESS: Dict[str, Any] = {"ready": False, "importMs": IMPORT_MS, "warmupMs": None, "error": None}
+
+
+@app.on_event("startup")
+def open_stores():
+    """Open the baseline registry and the run index (creates their directories)"""
+    global BASELINE_REGISTRY, RUN_INDEX
+    BASELINE_REGISTRY = BaselineRegistry(BASELINE_DIR, seed_warps=WARP_SEED)
+    RUN_INDEX = RunIndex(INSPECTIONS_DIR)
+
+
+@app.on_event("startup")
+def limit_buffer_pools():
+    """Cap the buffers retained by this process's detection threads (ANOMALY_BUFFER_POOL_MB)"""
+    set_process_cap(int(BUFFER_POOL_MB * 1024 * 1024))
+
+
+@app.on_event("shutdown")
+def flush_baselines():
+    """Write the baselines' pending lastUsedAt stamps and warps"""
+    if BASELINE_REGISTRY is not None:
+        BASELINE_REGISTRY.flush()
+
+
+@app.on_event("startup")
+def warm_load_baselines():
+    """Load recently used baselines so the first requests skip feature loading"""
+    if BASELINE_WARM_LOAD <= 0:
+        return
+    try:
+        loaded = BASELINE_REGISTRY.warm_load(BASELINE_WARM_LOAD)
+        logger.info("Warm-loaded %d baseline(s) from %s", len(loaded), BASELINE_DIR)
+    except Exception as exc:
+        logger.warning("Baseline warm-load failed: %s", exc)
+
+
+def _run_warmup() -> None:
+    try:
+        t0 = time.perf_counter()
+        warm_up(PROFILES)
+        # The first httpx client imports httpcore and loads the CA bundle (~250 ms)
+        httpx.Client().close()
+        if DISPATCHER is not None:
+            # Detections run in the engine workers, which warm up in parallel
+            for future in DISPATCHER.warmups:
+                future.result()
+        READINESS["warmupMs"] = (time.perf_counter() - t0) * 1000.0
+        logger.info("Warm-up done in %.0f ms (import %.0f ms)", READINESS["warmupMs"], IMPORT_MS)
+    except Exception as exc:
+        # A failed warm-up only costs the first request its cold start
+        READINESS["error"] = str(exc)
+        logger.warning("Warm-up failed: %s", exc)
+    READINESS["ready"] = True
+
+
+@app.on_event("startup")
+def start_dispatcher():
+    """Start the engine worker processes when ANOMALY_ENGINE_WORKERS is set"""
+    global DISPATCHER
+    if ENGINE_WORKERS > 0:
+        DISPATCHER = Dispatcher(ENGINE_WORKERS, BASELINE_DIR, seed_warps=WARP_SEED,
+                                pool_bytes=int(BUFFER_POOL_MB * 1024 * 1024),
+                                warm_profiles=tuple(PROFILES) if WARMUP else None)
+        logger.info("Routing detections to %d engine worker(s)", ENGINE_WORKERS)
+
+
+@app.on_event("shutdown")
+def stop_dispatcher():
+    if DISPATCHER is not None:
+        DISPATCHER.close()
+
+
+@app.on_event("startup")
+def start_warmup():
+    """Warm up in the background; /ready reports 503 until it finishes"""
+    if not WARMUP:
+        READINESS["ready"] = True
+        return
+    threading.Thread(target=_run_warmup, name="warmup", daemon=True).start()
+
 
 @app.get("/")
 async def root():
@@ -63,35 +205,232 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for container orchestration: 200 once the worker is warmed up"""
+    body = {
+        "status": "ready" if READINESS["ready"] else "warming_up",
+        "importMs": READINESS["importMs"],
+        "warmupMs": READINESS["warmupMs"],
+    }
+    if READINESS["error"]:
+        body["warmupError"] = READINESS["error"]
+    return JSONResponse(status_code=200 if READINESS["ready"] else 503, content=body)
+
+
+@app.get("/api/v1/stats/buffers")
+async def buffer_stats():
+    """Reuse statistics of the full-frame buffer pools of the processes that detect"""
+    # With engine workers, detection (and its pools) runs there, not here
+    stats = DISPATCHER.pool_stats() if DISPATCHER is not None else pool_stats()
+    return {
+        "source": "engineWorkers" if DISPATCHER is not None else "process",
+        "pools": stats["pools"],
+        "sessions": stats["sessions"],
+        "takes": stats["takes"],
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hitRate": stats["hit_rate"],
+        "bytesReused": stats["bytes_reused"],
+        "bytesAllocated": stats["bytes_allocated"],
+        "evictedBytes": stats["evicted_bytes"],
+        "pooledBytes": stats["pooled_bytes"],
+        "maxBytes": stats["max_bytes"],
+    }
+
+
+@app.get("/api/v1/stats/workers")
+async def worker_stats():
+    """Per-worker load and baseline cache hits of the engine worker processes"""
+    if DISPATCHER is None:
+        return {"enabled": False, "workers": []}
+    return {"enabled": True, **DISPATCHER.stats()}
+
+
 class DetectRequest(BaseModel):
-    baseline_url: str
+    baseline_url: Optional[str] = None
+    baseline_id: Optional[str] = None
     maintenance_url: str
     annotated_upload_url: str
     slider_percent: Optional[float] = None
+    profile: Optional[str] = None
+    auto_roi: Optional[bool] = None
 
 
 class BatchDetectRequest(BaseModel):
-    baseline_url: str
+    baseline_url: Optional[str] = None
+    baseline_id: Optional[str] = None
     maintenance_urls: List[str]
     slider_percent: Optional[float] = None
+    profile: Optional[str] = None
+    auto_roi: Optional[bool] = None
+
+
+class FleetGroup(BaseModel):
+    group_id: Optional[str] = None
+    baseline_url: Optional[str] = None
+    baseline_id: Optional[str] = None
+    maintenance_urls: List[str]
+
+
+class FleetRequest(BaseModel):
+    groups: List[FleetGroup]
+    slider_percent: Optional[float] = None
+    profile: Optional[str] = None
+    auto_roi: Optional[bool] = None
+    deadline_s: Optional[float] = None
+
+
+class RegisterBaselineRequest(BaseModel):
+    baseline_url: str
+    baseline_id: Optional[str] = None
 
 
-async def _download_image(client: httpx.AsyncClient, url: str, dest_path: str) -> None:
-    """Download an image from a presigned URL to a local path."""
-    resp = await client.get(url)
-    if resp.status_code != 200:
+class EvictBaselinesRequest(BaseModel):
+    max_idle_days: float = 30.0
+
+
+def _validate_profile(profile: Optional[str]) -> None:
+    """Reject unknown quality/speed profile names before any download happens."""
+    if profile is not None and profile.lower() not in PROFILES:
         raise HTTPException(
-            status_code=502,
-            detail=f"Failed to download image from URL (HTTP {resp.status_code})"
+            status_code=400,
+            detail=f"Unknown profile '{profile}' (available: {', '.join(PROFILES)})"
         )
-    content_type = resp.headers.get("content-type", "")
-    if content_type and not content_type.startswith("image/"):
+
+
+def _validate_baseline_source(request: Any) -> None:
+    """Require exactly one of baseline_url / baseline_id."""
+    if (request.baseline_url is None) == (request.baseline_id is None):
         raise HTTPException(
             status_code=400,
-            detail=f"URL did not return an image (content-type: {content_type})"
+            detail="Provide exactly one of baseline_url or baseline_id"
         )
-    with open(dest_path, "wb") as f:
-        f.write(resp.content)
+
+
+def _registered_baseline(baseline_id: str) -> BaselineFeatures:
+    """Features of a registered baseline; 400 for a malformed id, 404 for an unknown one."""
+    try:
+        return BASELINE_REGISTRY.get(baseline_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown baseline id '{baseline_id}'")
+
+
+def _check_registered(baseline_id: str) -> None:
+    """400 for a malformed baseline id, 404 for an unknown one."""
+    if not BASELINE_REGISTRY.valid_id(baseline_id):
+        raise HTTPException(status_code=400, detail=f"Invalid baseline id '{baseline_id}'")
+    if not BASELINE_REGISTRY.exists(baseline_id):
+        raise HTTPException(status_code=404, detail=f"Unknown baseline id '{baseline_id}'")
+
+
+async def _resolve_baseline(
+    client: httpx.AsyncClient,
+    request: Any,
+    download_path: str
+) -> Tuple[str, Optional[BaselineFeatures], Optional[str]]:
+    """Local baseline path, registered features and the downloaded bytes' SHA-256.
+
+    Features are None when the baseline comes from baseline_url; the digest is
+    None for a registered baseline.
+    """
+    if request.baseline_id is not None:
+        if DISPATCHER is not None:
+            # The engine worker loads the features; only check the id here
+            _check_registered(request.baseline_id)
+            return str(BASELINE_REGISTRY.image_path(request.baseline_id)), None, None
+        features = _registered_baseline(request.baseline_id)
+        return str(BASELINE_REGISTRY.image_path(request.baseline_id)), features, None
+    download = await _download_image(client, request.baseline_url, download_path)
+    return download_path, None, download.sha256
+
+
+def _baseline_fields(features: Optional[BaselineFeatures], baseline_id: Optional[str] = None) -> Dict[str, Any]:
+    """baselineId/baselineVersion from the features, or from the metadata of baseline_id."""
+    if features is None and baseline_id is not None:
+        meta = BASELINE_REGISTRY.metadata(baseline_id) or {}
+        return {"baselineId": baseline_id, "baselineVersion": meta.get("version")}
+    return {
+        "baselineId": features.baseline_id if features is not None else None,
+        "baselineVersion": features.version if features is not None else None,
+    }
+
+
+def _baseline_key(baseline_id: Optional[str], baseline_sha256: Optional[str]) -> str:
+    """Identity a baseline is routed (and cached) by: registered id or content hash."""
+    return f"id:{baseline_id}" if baseline_id is not None else f"sha256:{baseline_sha256}"
+
+
+async def _dispatch_detect(key: str, baseline_path: str, baseline_id: Optional[str],
+                           maintenance_path: str, options: Dict[str, Any]) -> DetectionReport:
+    """Run one detection on the engine worker that owns the baseline key."""
+    try:
+        report, _, _, _ = await asyncio.wrap_future(
+            DISPATCHER.submit(key, baseline_path, baseline_id, maintenance_path, options)
+        )
+    except RuntimeError as exc:      # every worker dead, replacements pending
+        raise HTTPException(status_code=503, detail=str(exc))
+    return report
+
+
+@dataclass
+class Download:
+    path: str
+    size: int          # bytes written
+    sha256: str        # hex digest of the body, computed while streaming
+
+
+def _too_large(size: Any) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Image exceeds the {MAX_DOWNLOAD_MB:g} MB download limit ({size} bytes)"
+    )
+
+
+async def _download_image(client: httpx.AsyncClient, url: str, dest_path: str) -> Download:
+    """Stream an image from a presigned URL to a local path.
+
+    Status, content-type and Content-Length are checked before the body is
+    read; the body is written chunk by chunk (never held whole in memory),
+    hashed as it arrives and cut off once it passes MAX_DOWNLOAD_MB.
+    """
+    limit = int(MAX_DOWNLOAD_MB * 1024 * 1024) if MAX_DOWNLOAD_MB > 0 else None
+    async with client.stream("GET", url) as resp:
+        if resp.status_code != 200:
+            raise HTTPException(
+                status_code=502,
+                detail=f"Failed to download image from URL (HTTP {resp.status_code})"
+            )
+        content_type = resp.headers.get("content-type", "")
+        if content_type and not content_type.startswith("image/"):
+            raise HTTPException(
+                status_code=400,
+                detail=f"URL did not return an image (content-type: {content_type})"
+            )
+        length = resp.headers.get("content-length", "")
+        if limit is not None and length.isdigit() and int(length) > limit:
+            raise _too_large(int(length))
+
+        digest = hashlib.sha256()
+        size = 0
+        with open(dest_path, "wb") as f:
+            async for chunk in resp.aiter_bytes():
+                size += len(chunk)
+                if limit is not None and size > limit:
+                    raise _too_large(f"more than {limit}")
+                digest.update(chunk)
+                f.write(chunk)
+    return Download(dest_path, size, digest.hexdigest())
+
+
+def _roi_payload(roi: Optional[Tuple[int, int, int, int]]) -> Optional[Dict[str, int]]:
+    """Serialize the processed region (x, y, w, h) or None when the full frame was used."""
+    if roi is None:
+        return None
+    x, y, w, h = roi
+    return {"x": int(x), "y": int(y), "width": int(w), "height": int(h)}
 
 
 def _build_detect_response(request_id: str, report: Any) -> Dict[str, Any]:
@@ -137,6 +476,7 @@ def _build_detect_response(request_id: str, report: Any) -> Dict[str, Any]:
             "warpModel": report.warp_model,
             "warpSuccess": report.warp_success,
             "warpScore": float(report.warp_score),
+            "warpInit": report.warp_init,
             "thresholdPotential": float(report.t_pot),
             "thresholdFault": float(report.t_fault),
             "basePotential": float(report.base_t_pot),
@@ -144,7 +484,56 @@ def _build_detect_response(request_id: str, report: Any) -> Dict[str, Any]:
             "sliderPercent": float(report.slider_percent) if report.slider_percent is not None else None,
             "scaleApplied": float(report.scale_applied) if report.scale_applied is not None else None,
             "thresholdSource": report.threshold_source,
-            "ratio": report.ratio
+            "ratio": report.ratio,
+            "profile": report.profile,
+            "roi": _roi_payload(report.roi),
+            "tileRows": report.tile_rows,
+            "skippedTileRatio": report.skipped_tile_ratio
+        }
+    }
+
+
+def _batch_result(idx: int, report: Any, maintenance_sha256: str) -> Dict[str, Any]:
+    """One entry of a batch (or fleet group) result list."""
+    anomalies = []
+    for i, blob in enumerate(report.blobs):
+        x, y, w, h = blob.bbox
+        anomalies.append({
+            "id": f"anomaly_{i+1}",
+            "bbox": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
+            "confidence": float(blob.confidence),
+            "severity": blob.classification,
+            "severityScore": float(blob.severity),
+            "classification": blob.subtype,
+            "area": int(blob.area),
+            "centroid": {
+                "x": float(blob.centroid[0]),
+                "y": float(blob.centroid[1])
+            },
+            "meanDeltaE": float(blob.mean_deltaE),
+            "peakDeltaE": float(blob.peak_deltaE),
+            "elongation": float(blob.elongation)
+        })
+
+    return {
+        "imageIndex": idx,
+        "maintenanceSha256": maintenance_sha256,
+        "imageLevelLabel": report.image_level_label,
+        "anomalyCount": len(anomalies),
+        "anomalies": anomalies,
+        "metrics": {
+            "meanSsim": float(report.mean_ssim),
+            "warpModel": report.warp_model,
+            "warpSuccess": report.warp_success,
+            "warpScore": float(report.warp_score),
+            "warpInit": report.warp_init,
+            "thresholdPotential": float(report.t_pot),
+            "thresholdFault": float(report.t_fault),
+            "thresholdSource": report.threshold_source,
+            "profile": report.profile,
+            "roi": _roi_payload(report.roi),
+            "tileRows": report.tile_rows,
+            "skippedTileRatio": report.skipped_tile_ratio,
         }
     }
 
@@ -153,52 +542,59 @@ def run_detection_from_paths(
     baseline_path: str,
     maintenance_path: str,
     slider_percent: Optional[float] = None,
-    request_id: Optional[str] = None
+    request_id: Optional[str] = None,
+    profile: Optional[str] = None,
+    auto_roi: Optional[bool] = None,
+    memory_budget_mb: Optional[float] = MEMORY_BUDGET_MB,
+    baseline: Optional[BaselineFeatures] = None,
+    out_arrays_dir: Optional[str] = None,
+    timings: Optional[Dict[str, float]] = None
 ) -> Tuple[Dict[str, Any], DetectionReport]:
     """Run anomaly detection from local image paths.
 
+    baseline optionally supplies the registered features of baseline_path;
+    out_arrays_dir persists the run's analysis arrays (see anomaly_engine.run_arrays);
+    timings receives per-stage milliseconds (see detect_anomalies).
     Returns a tuple of (endpoint-shaped JSON payload, raw DetectionReport).
     """
     resolved_request_id = request_id or str(uuid.uuid4())
     report = detect_anomalies(
         baseline_path=baseline_path,
         maintenance_path=maintenance_path,
-        slider_percent=slider_percent
+        slider_percent=slider_percent,
+        profile=profile,
+        auto_roi=auto_roi,
+        memory_budget_mb=memory_budget_mb,
+        baseline=baseline,
+        out_arrays_dir=out_arrays_dir,
+        timings=timings
     )
     return _build_detect_response(resolved_request_id, report), report
 
 
-def _create_annotated_image(baseline_path: str, maintenance_path: str, blobs: List[Any]):
-    """Re-align the maintenance image onto the baseline coordinate space and draw anomaly boxes.
+def _create_annotated_image(baseline_path: str, maintenance_path: str, report: DetectionReport):
+    """Warp the maintenance image into the baseline coordinate space and draw anomaly boxes.
 
     Because blob coordinates are emitted in aligned/baseline space by the detection
     pipeline, the overlay must be drawn on the warped maintenance image, not the
-    original.
+    original. The warp is the one detection used (`report.warp`), so the overlay
+    needs no second alignment and shows exactly what was compared.
     """
-    base_bgr = read_bgr(baseline_path)
+    H, W = read_bgr(baseline_path).shape[:2]
     ment_bgr = read_bgr(maintenance_path)
-    base_gray = to_gray(base_bgr)
-    ment_gray = to_gray(ment_bgr)
-
-    if ment_gray.shape != base_gray.shape:
-        H, W = base_gray.shape
+    if ment_bgr.shape[:2] != (H, W):
         ment_bgr = cv.resize(ment_bgr, (W, H), interpolation=cv.INTER_LINEAR)
-        ment_gray = cv.resize(ment_gray, (W, H), interpolation=cv.INTER_LINEAR)
-
-    warp, _, _, _ = ecc_align(base_gray, ment_gray)
-    H, W = base_gray.shape
-    if warp.shape == (3, 3):
-        aligned = cv.warpPerspective(
-            ment_bgr, warp, (W, H),
-            flags=cv.INTER_LINEAR + cv.WARP_INVERSE_MAP
-        )
-    else:
-        aligned = cv.warpAffine(
-            ment_bgr, warp, (W, H),
-            flags=cv.INTER_LINEAR + cv.WARP_INVERSE_MAP
-        )
 
-    return overlay_detections(aligned, blobs)
+    warp = np.asarray(report.warp, np.float64)
+    if report.roi is not None:
+        # Estimated on the ROI crops: shift in and out of crop coordinates to map whole frames
+        ox, oy = report.roi[:2]
+        M = np.eye(3)
+        M[:warp.shape[0]] = warp
+        M = np.array([[1, 0, ox], [0, 1, oy], [0, 0, 1]]) @ M @ np.array([[1, 0, -ox], [0, 1, -oy], [0, 0, 1]])
+        warp = M[:warp.shape[0]]
+    aligned = warp_to_base(ment_bgr, warp.astype(np.float32), (W, H))
+    return overlay_detections(aligned, report.blobs)
 
 
 async def _upload_annotated_image(
@@ -241,16 +637,19 @@ async def detect_anomalies_endpoint(request: DetectRequest):
     """
     Detect anomalies by comparing baseline and maintenance images.
     
-    Accepts presigned S3 URLs for both images. Downloads them, runs the
-    detection pipeline, and returns all results and metadata in the response.
+    Accepts presigned S3 URLs for both images (or a registered baseline_id in
+    place of baseline_url). Downloads them, runs the detection pipeline, and
+    returns all results and metadata in the response.
     
     Args:
-        request: JSON body with baseline_url, maintenance_url, and optional slider_percent
+        request: JSON body with baseline_url or baseline_id, maintenance_url, and optional slider_percent/profile
     
     Returns:
         JSON with detection results including anomalies, metrics, and base64 overlay image
     """
     
+    _validate_profile(request.profile)
+    _validate_baseline_source(request)
     request_id = str(uuid.uuid4())
     baseline_path = os.path.join(TEMP_DIR, f"{request_id}_baseline.png")
     maintenance_path = os.path.join(TEMP_DIR, f"{request_id}_maintenance.png")
@@ -258,20 +657,35 @@ async def detect_anomalies_endpoint(request: DetectRequest):
     try:
         # Download images from presigned URLs
         async with httpx.AsyncClient(timeout=60.0) as client:
-            await _download_image(client, request.baseline_url, baseline_path)
-            await _download_image(client, request.maintenance_url, maintenance_path)
-
-        response_data, report = run_detection_from_paths(
-            baseline_path=baseline_path,
-            maintenance_path=maintenance_path,
-            slider_percent=request.slider_percent,
-            request_id=request_id
-        )
+            source_path, features, baseline_sha256 = await _resolve_baseline(client, request, baseline_path)
+            maintenance = await _download_image(client, request.maintenance_url, maintenance_path)
+
+        if DISPATCHER is not None:
+            report = await _dispatch_detect(
+                _baseline_key(request.baseline_id, baseline_sha256), source_path, request.baseline_id,
+                maintenance_path, dict(slider_percent=request.slider_percent, profile=request.profile,
+                                       auto_roi=request.auto_roi, memory_budget_mb=MEMORY_BUDGET_MB)
+            )
+            response_data = _build_detect_response(request_id, report)
+        else:
+            # In a worker thread: the event loop keeps serving other requests meanwhile
+            response_data, report = await asyncio.to_thread(
+                run_detection_from_paths,
+                baseline_path=source_path,
+                maintenance_path=maintenance_path,
+                slider_percent=request.slider_percent,
+                request_id=request_id,
+                profile=request.profile,
+                auto_roi=request.auto_roi,
+                baseline=features
+            )
+        response_data.update(_baseline_fields(features, request.baseline_id))
+        response_data.update(baselineSha256=baseline_sha256, maintenanceSha256=maintenance.sha256)
 
         # Generate annotated overlay and upload to S3
         try:
-            annotated_img = _create_annotated_image(
-                baseline_path, maintenance_path, report.blobs
+            annotated_img = await asyncio.to_thread(
+                _create_annotated_image, source_path, maintenance_path, report
             )
         except Exception as exc:
             logger.warning("Annotated image generation failed: %s", exc)
@@ -311,73 +725,52 @@ async def detect_anomalies_batch(request: BatchDetectRequest):
     """
     Batch detection: compare one baseline against multiple maintenance images.
     
-    Accepts presigned S3 URLs. Downloads all images, runs detection on each,
-    and returns all results and metadata.
+    Accepts presigned S3 URLs (or a registered baseline_id in place of
+    baseline_url). Downloads all images, runs detection on each, and returns
+    all results and metadata.
     
     Args:
-        request: JSON body with baseline_url, maintenance_urls list, optional slider_percent
+        request: JSON body with baseline_url or baseline_id, maintenance_urls list, optional slider_percent/profile
     
     Returns:
         List of detection results for each maintenance image
     """
     
+    _validate_profile(request.profile)
+    _validate_baseline_source(request)
     results = []
     request_id = str(uuid.uuid4())
     baseline_path = os.path.join(TEMP_DIR, f"{request_id}_baseline.png")
     
     try:
         async with httpx.AsyncClient(timeout=60.0) as client:
-            # Download baseline once
-            await _download_image(client, request.baseline_url, baseline_path)
+            # Download baseline once (or use the registered one)
+            source_path, features, baseline_sha256 = await _resolve_baseline(client, request, baseline_path)
             
             # Process each maintenance image
             for idx, maint_url in enumerate(request.maintenance_urls):
                 maintenance_path = os.path.join(TEMP_DIR, f"{request_id}_maintenance_{idx}.png")
                 
                 try:
-                    await _download_image(client, maint_url, maintenance_path)
+                    maintenance = await _download_image(client, maint_url, maintenance_path)
                     
-                    report = detect_anomalies(
-                        baseline_path=baseline_path,
-                        maintenance_path=maintenance_path,
-                        slider_percent=request.slider_percent
-                    )
+                    options = dict(slider_percent=request.slider_percent, profile=request.profile,
+                                   auto_roi=request.auto_roi, memory_budget_mb=MEMORY_BUDGET_MB)
+                    if DISPATCHER is not None:
+                        report = await _dispatch_detect(
+                            _baseline_key(request.baseline_id, baseline_sha256), source_path,
+                            request.baseline_id, maintenance_path, options
+                        )
+                    else:
+                        report = await asyncio.to_thread(
+                            detect_anomalies,
+                            baseline_path=source_path,
+                            maintenance_path=maintenance_path,
+                            baseline=features,
+                            **options
+                        )
                     
-                    anomalies = []
-                    for i, blob in enumerate(report.blobs):
-                        x, y, w, h = blob.bbox
-                        anomalies.append({
-                            "id": f"anomaly_{i+1}",
-                            "bbox": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
-                            "confidence": float(blob.confidence),
-                            "severity": blob.classification,
-                            "severityScore": float(blob.severity),
-                            "classification": blob.subtype,
-                            "area": int(blob.area),
-                            "centroid": {
-                                "x": float(blob.centroid[0]),
-                                "y": float(blob.centroid[1])
-                            },
-                            "meanDeltaE": float(blob.mean_deltaE),
-                            "peakDeltaE": float(blob.peak_deltaE),
-                            "elongation": float(blob.elongation)
-                        })
-                    
-                    results.append({
-                        "imageIndex": idx,
-                        "imageLevelLabel": report.image_level_label,
-                        "anomalyCount": len(anomalies),
-                        "anomalies": anomalies,
-                        "metrics": {
-                            "meanSsim": float(report.mean_ssim),
-                            "warpModel": report.warp_model,
-                            "warpSuccess": report.warp_success,
-                            "warpScore": float(report.warp_score),
-                            "thresholdPotential": float(report.t_pot),
-                            "thresholdFault": float(report.t_fault),
-                            "thresholdSource": report.threshold_source,
-                        }
-                    })
+                    results.append(_batch_result(idx, report, maintenance.sha256))
                     
                 finally:
                     if os.path.exists(maintenance_path):
@@ -388,6 +781,8 @@ async def detect_anomalies_batch(request: BatchDetectRequest):
         
         return JSONResponse(content={
             "requestId": request_id,
+            **_baseline_fields(features, request.baseline_id),
+            "baselineSha256": baseline_sha256,
             "totalImages": len(request.maintenance_urls),
             "results": results
         })
@@ -409,7 +804,305 @@ async def detect_anomalies_batch(request: BatchDetectRequest):
                 pass
 
 
+@dataclass
+class Fleet:
+    fleet_id: str
+    request: FleetRequest
+    lanes: List[List[Chunk]]
+    progress: FleetProgress
+    deadline_s: float
+    started: float                    # time.monotonic()
+    finished: Optional[float] = None
+    task: Optional[asyncio.Task] = None
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.started >= self.deadline_s
+
+
+FLEETS: "OrderedDict[str, Fleet]" = OrderedDict()
+
+
+def _remove_quietly(path: Optional[str]) -> None:
+    if path is not None and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _lane_executor() -> ProcessPoolExecutor:
+    """One lane: a single spawned worker process with its own baseline registry.
+
+    Lanes run their chunks one after another, so only the current chunk's
+    baseline is kept.
+    """
+    return worker_executor(BASELINE_DIR, WARP_SEED, cache_size=1,
+                           pool_bytes=int(BUFFER_POOL_MB * 1024 * 1024))
+
+
+async def _run_lane(fleet: Fleet, client: httpx.AsyncClient, chunks: List[Chunk]) -> None:
+    """Run a lane's chunks in order; every image ends up recorded as ok, error or expired."""
+    loop = asyncio.get_running_loop()
+    request = fleet.request
+    options = dict(slider_percent=request.slider_percent, profile=request.profile,
+                   auto_roi=request.auto_roi, memory_budget_mb=MEMORY_BUDGET_MB)
+    executor = _lane_executor()
+    try:
+        for chunk in chunks:
+            if fleet.expired():
+                fleet.progress.expire(chunk)
+                continue
+            group = request.groups[chunk.group]
+            tmp_prefix = f"{fleet.fleet_id}_{chunk.group}_{chunk.start}"
+            key = _baseline_key(group.baseline_id, None)
+            baseline_path = None
+            try:
+                if group.baseline_id is None:
+                    baseline_path = os.path.join(TEMP_DIR, f"{tmp_prefix}_baseline.png")
+                    try:
+                        download = await _download_image(client, group.baseline_url, baseline_path)
+                    except HTTPException as exc:
+                        fleet.progress.fail(chunk, f"Baseline: {exc.detail}")
+                        continue
+                    except Exception as exc:
+                        fleet.progress.fail(chunk, f"Baseline: {type(exc).__name__}: {exc}")
+                        continue
+                    fleet.progress.start(chunk.group, baselineSha256=download.sha256)
+                    key = _baseline_key(None, download.sha256)
+                else:
+                    fleet.progress.start(chunk.group)
+
+                for idx in range(chunk.start, chunk.stop):
+                    if fleet.expired():
+                        fleet.progress.expire(chunk, idx)
+                        break
+                    maintenance_path = os.path.join(TEMP_DIR, f"{tmp_prefix}_maintenance_{idx}.png")
+                    try:
+                        maintenance = await _download_image(client, group.maintenance_urls[idx], maintenance_path)
+                        t0 = time.perf_counter()
+                        report, _, _, _ = await loop.run_in_executor(
+                            executor, worker_detect, key, baseline_path, group.baseline_id,
+                            maintenance_path, options
+                        )
+                        result = {"status": "ok", "elapsedMs": (time.perf_counter() - t0) * 1000.0,
+                                  **_batch_result(idx, report, maintenance.sha256)}
+                    except HTTPException as exc:
+                        result = {"imageIndex": idx, "status": "error", "error": exc.detail}
+                    except BrokenProcessPool:
+                        executor = _lane_executor()
+                        result = {"imageIndex": idx, "status": "error", "error": "Lane worker process died"}
+                    except Exception as exc:
+                        result = {"imageIndex": idx, "status": "error", "error": f"{type(exc).__name__}: {exc}"}
+                    finally:
+                        _remove_quietly(maintenance_path)
+                    fleet.progress.record(chunk.group, idx, result)
+            finally:
+                _remove_quietly(baseline_path)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_fleet(fleet: Fleet) -> None:
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            await asyncio.gather(*(_run_lane(fleet, client, chunks) for chunks in fleet.lanes))
+    except Exception:
+        logger.exception("Fleet sweep %s failed", fleet.fleet_id)
+    finally:
+        fleet.finished = time.monotonic()
+        logger.info("Fleet sweep %s finished in %.1f s", fleet.fleet_id, fleet.finished - fleet.started)
+
+
+def _fleet_status(fleet: Fleet, with_results: bool = True) -> Dict[str, Any]:
+    groups = [
+        {"groupId": group.group_id, "baselineId": group.baseline_id, **entry}
+        for group, entry in zip(fleet.request.groups, fleet.progress.snapshot(with_results))
+    ]
+    if fleet.finished is None:
+        status = "running"
+    else:
+        status = "expired" if any(g["expired"] for g in groups) else "done"
+    end = fleet.finished if fleet.finished is not None else time.monotonic()
+    return {
+        "fleetId": fleet.fleet_id,
+        "status": status,
+        "lanes": len(fleet.lanes),
+        "deadlineS": fleet.deadline_s,
+        "elapsedMs": (end - fleet.started) * 1000.0,
+        "totalImages": sum(g["totalImages"] for g in groups),
+        "completedImages": sum(g["completed"] for g in groups),
+        "failedImages": sum(g["failed"] for g in groups),
+        "expiredImages": sum(g["expired"] for g in groups),
+        "groups": groups,
+    }
+
+
+@app.post("/api/v1/fleet")
+async def start_fleet(request: FleetRequest):
+    """
+    Fleet sweep: many (baseline, [maintenance...]) groups in one call.
+
+    Groups are dealt to ANOMALY_FLEET_WORKERS worker processes, largest
+    first; a group stays on one worker (its baseline is prepared once)
+    unless it exceeds the fair share of the sweep. The sweep runs in the
+    background: the response (202) carries the fleetId to poll with
+    GET /api/v1/fleet/{fleet_id}. No new image is started once deadline_s
+    has passed; the remaining ones are reported as expired.
+    """
+    _validate_profile(request.profile)
+    if not request.groups:
+        raise HTTPException(status_code=400, detail="Provide at least one group")
+    for group in request.groups:
+        _validate_baseline_source(group)
+        if group.baseline_id is not None:
+            _check_registered(group.baseline_id)
+    deadline_s = request.deadline_s if request.deadline_s is not None else FLEET_DEADLINE_S
+    if deadline_s <= 0:
+        raise HTTPException(status_code=400, detail="deadline_s must be positive")
+
+    sizes = [len(group.maintenance_urls) for group in request.groups]
+    lanes = [chunks for chunks in plan_lanes(sizes, FLEET_WORKERS) if chunks]
+    fleet = Fleet(fleet_id=str(uuid.uuid4()), request=request, lanes=lanes,
+                  progress=FleetProgress(sizes), deadline_s=deadline_s, started=time.monotonic())
+    FLEETS[fleet.fleet_id] = fleet
+    finished = [fid for fid, f in FLEETS.items() if f.finished is not None]
+    for fid in finished[:max(0, len(FLEETS) - FLEET_KEEP)]:
+        del FLEETS[fid]
+    fleet.task = asyncio.create_task(_run_fleet(fleet))
+    return JSONResponse(status_code=202, content=_fleet_status(fleet, with_results=False))
+
+
+@app.get("/api/v1/fleet/{fleet_id}")
+async def get_fleet(fleet_id: str, results: bool = True):
+    """Progress of a fleet sweep; per-group results unless results=false."""
+    fleet = FLEETS.get(fleet_id)
+    if fleet is None:
+        raise HTTPException(status_code=404, detail=f"Unknown fleet id '{fleet_id}'")
+    return JSONResponse(content=_fleet_status(fleet, with_results=results))
+
+
+@app.post("/api/v1/baselines")
+async def register_baseline(request: RegisterBaselineRequest):
+    """
+    Register a baseline image once and precompute its features.
+
+    Downloads the image from baseline_url and stores it under baseline_id (a
+    new id is generated when omitted). Registering an existing id replaces the
+    image and increments its version. Detection requests can then pass
+    baseline_id instead of baseline_url.
+    """
+    if request.baseline_id is not None and not BASELINE_REGISTRY.valid_id(request.baseline_id):
+        raise HTTPException(status_code=400, detail=f"Invalid baseline id '{request.baseline_id}'")
+    download_path = os.path.join(TEMP_DIR, f"{uuid.uuid4()}_register.png")
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            await _download_image(client, request.baseline_url, download_path)
+        meta = BASELINE_REGISTRY.register(download_path, request.baseline_id)
+        return JSONResponse(content=meta)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Baseline registration failed: {str(e)}"
+        )
+
+    finally:
+        if os.path.exists(download_path):
+            try:
+                os.remove(download_path)
+            except:
+                pass
+
+
+@app.get("/api/v1/baselines")
+async def list_baselines():
+    """Metadata of every registered baseline"""
+    return {
+        "baselines": BASELINE_REGISTRY.list_baselines(),
+        "loaded": BASELINE_REGISTRY.cached_ids(),
+    }
+
+
+@app.get("/api/v1/baselines/{baseline_id}")
+async def get_baseline(baseline_id: str):
+    """Metadata of one registered baseline"""
+    if not BASELINE_REGISTRY.valid_id(baseline_id):
+        raise HTTPException(status_code=400, detail=f"Invalid baseline id '{baseline_id}'")
+    meta = BASELINE_REGISTRY.metadata(baseline_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"Unknown baseline id '{baseline_id}'")
+    return meta
+
+
+@app.delete("/api/v1/baselines/{baseline_id}")
+async def delete_baseline(baseline_id: str):
+    """Remove a baseline with its stored image and features"""
+    if not BASELINE_REGISTRY.valid_id(baseline_id):
+        raise HTTPException(status_code=400, detail=f"Invalid baseline id '{baseline_id}'")
+    if not BASELINE_REGISTRY.delete(baseline_id):
+        raise HTTPException(status_code=404, detail=f"Unknown baseline id '{baseline_id}'")
+    return {"id": baseline_id, "deleted": True}
+
+
+def _camel_keys(row: Dict[str, Any]) -> Dict[str, Any]:
+    """snake_case index columns -> camelCase response fields (nested lists included)."""
+    out = {}
+    for key, value in row.items():
+        head, *rest = key.split("_")
+        if isinstance(value, list):
+            value = [_camel_keys(v) for v in value]
+        out[head + "".join(part.title() for part in rest)] = value
+    return out
+
+
+@app.get("/api/v1/runs")
+async def query_runs(
+    transformer: Optional[str] = None,
+    label: Optional[str] = None,
+    subtype: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    min_severity: Optional[float] = None,
+    limit: int = 100
+):
+    """
+    Query stored inspection runs, newest first.
+
+    Runs added to the inspections directory since the last call are indexed
+    first (unchanged inspections are skipped by size/mtime).
+    """
+    await asyncio.to_thread(RUN_INDEX.ingest)
+    runs = await asyncio.to_thread(
+        RUN_INDEX.query_runs,
+        transformer=transformer, label=label, subtype=subtype,
+        since=since, until=until, min_severity=min_severity, limit=limit
+    )
+    return {"count": len(runs), "runs": [_camel_keys(r) for r in runs]}
+
+
+@app.get("/api/v1/runs/{run_id}")
+async def get_run(run_id: str):
+    """One stored run with its thresholds and anomalies"""
+    await asyncio.to_thread(RUN_INDEX.ingest)
+    run = await asyncio.to_thread(RUN_INDEX.get_run, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run id '{run_id}'")
+    return _camel_keys(run)
+
+
+@app.post("/api/v1/baselines/evict")
+async def evict_baselines(request: EvictBaselinesRequest):
+    """Drop the features of baselines unused for max_idle_days (rebuilt on next use)"""
+    evicted = BASELINE_REGISTRY.evict_unused(request.max_idle_days)
+    return {"maxIdleDays": request.max_idle_days, "evicted": evicted}
+
+
 if __name__ == "__main__":
+    import uvicorn
+
     # Run with uvicorn for production use: uvicorn main:app --host 0.0.0.0 --port 8000
     uvicorn.run(
         "main:app",
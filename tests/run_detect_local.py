@@ -3,21 +3,33 @@
 This script executes the same detection/response-building path as the FastAPI
 single-detect endpoint, but uses local image files instead of S3 URLs.
 
+`--sweep` instead runs every transformer under --dataset-root (baseline picked
+by --baseline-index against each maintenance image) on a process pool,
+streaming one JSON line per pair to --output-jsonl (and a row to --output-csv)
+as pairs complete. `--resume` skips pairs already recorded as ok in that file.
+The sweep never re-aligns for display; it ends with images/sec and per-stage
+timings aggregated over the pairs it ran.
+
 Example:
 uv run python tests/run_detect_local.py --dataset-root datasets --transformer T2 --baseline-image T2_normal_001.png --maintenance-image T2_faulty_001.png --slider-percent 50
+uv run python tests/run_detect_local.py --dataset-root datasets --sweep --workers 4 --output-jsonl tests/output/sweep.jsonl --output-csv tests/output/sweep.csv --resume
 """
 from __future__ import annotations
 
 import argparse
 import base64
+import csv
 import json
+import os
 import sys
 import tempfile
+import time
 import webbrowser
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterable, List, Set, Tuple
 
 import cv2 as cv
 
@@ -28,10 +40,20 @@ if str(PROJECT_ROOT) not in sys.path:
 from main import run_detection_from_paths
 from anomaly_engine.alignment import ecc_align
 from anomaly_engine.io_utils import read_bgr, to_gray
+from anomaly_engine.profiles import PROFILES, get_profile
 from anomaly_engine.visualization import overlay_detections
 
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
 
+# Stage keys filled by detect_anomalies(timings=...), in pipeline order
+SWEEP_STAGES = ("load", "align", "stats", "delta_e", "skeleton", "blobs", "arrays")
+SWEEP_CSV_FIELDS = (
+    ["transformer", "baselineImage", "maintenanceImage", "status", "imageLevelLabel",
+     "anomalyCount", "meanSsim", "elapsedMs"]
+    + [f"{stage}Ms" for stage in SWEEP_STAGES]
+    + ["error"]
+)
+
 
 @dataclass
 class _OverlayBlob:
@@ -74,7 +96,7 @@ def _parse_args() -> argparse.Namespace:
         description="Run detect endpoint logic locally from dataset images"
     )
     parser.add_argument("--dataset-root", default="datasets", help="Path to datasets root")
-    parser.add_argument("--transformer", required=True, help="Transformer folder, e.g. T1")
+    parser.add_argument("--transformer", help="Transformer folder, e.g. T1 (required unless --sweep)")
     parser.add_argument("--baseline-subdir", default="normal", help="Baseline image subdirectory")
     parser.add_argument("--maintenance-subdir", default="faulty", help="Maintenance image subdirectory")
     parser.add_argument("--baseline-image", help="Specific baseline image filename")
@@ -83,13 +105,27 @@ def _parse_args() -> argparse.Namespace:
     parser.add_argument("--maintenance-index", type=int, default=0, help="Maintenance image index when --maintenance-image is not provided")
     parser.add_argument("--all-maintenance", action="store_true", help="Run baseline against every maintenance image in the selected folder")
     parser.add_argument("--slider-percent", type=float, help="Optional threshold slider percent")
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="Quality/speed profile (default: balanced)")
+    parser.add_argument("--auto-roi", action="store_true", default=None, help="Crop processing to the detected baseline ROI")
+    parser.add_argument("--memory-budget-mb", type=float, help="Process per-pixel stages in bands sized to this budget")
+    parser.add_argument("--save-arrays", help="Directory for per-run analysis array bundles (one subdirectory per maintenance image)")
     parser.add_argument("--output-json", help="Optional output JSON path")
     parser.add_argument("--print-full", action="store_true", help="Print full JSON results to stdout")
     parser.add_argument("--no-show-overlay", action="store_true", help="Do not display the final overlay image")
-    return parser.parse_args()
-
-
-def _align_maintenance_to_baseline(baseline_path: Path, maintenance_path: Path):
+    parser.add_argument("--sweep", action="store_true", help="Run every transformer under --dataset-root on a process pool")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Sweep worker processes")
+    parser.add_argument("--output-jsonl", help="Sweep results, one JSON line per pair (required with --resume)")
+    parser.add_argument("--output-csv", help="Optional sweep summary CSV, one row per pair")
+    parser.add_argument("--resume", action="store_true", help="Skip pairs already recorded as ok in --output-jsonl")
+    args = parser.parse_args()
+    if not args.sweep and not args.transformer:
+        parser.error("--transformer is required unless --sweep is given")
+    if args.resume and not args.output_jsonl:
+        parser.error("--resume needs the --output-jsonl of the interrupted sweep")
+    return args
+
+
+def _align_maintenance_to_baseline(baseline_path: Path, maintenance_path: Path, profile: str | None = None):
     """Replicate pipeline alignment so blob bboxes map correctly on overlay."""
     base_bgr = read_bgr(str(baseline_path))
     ment_bgr = read_bgr(str(maintenance_path))
@@ -101,7 +137,14 @@ def _align_maintenance_to_baseline(baseline_path: Path, maintenance_path: Path):
         ment_bgr = cv.resize(ment_bgr, (ws, hs), interpolation=cv.INTER_LINEAR)
         ment_gray = cv.resize(ment_gray, (ws, hs), interpolation=cv.INTER_LINEAR)
 
-    warp, _, _, _ = ecc_align(base_gray, ment_gray)
+    prof = get_profile(profile)
+    warp, _, _, _ = ecc_align(
+        base_gray,
+        ment_gray,
+        max_iter=prof.ecc_max_iter,
+        eps=prof.ecc_eps,
+        n_features=prof.orb_features,
+    )
     h, w = base_gray.shape
 
     if warp.shape == (3, 3):
@@ -151,14 +194,14 @@ def _prepare_panel(image_bgr, title: str, target_size: tuple[int, int]):
     return panel
 
 
-def _display_overlay(result: dict, baseline_path: Path, maintenance_path: Path) -> None:
+def _display_overlay(result: dict, baseline_path: Path, maintenance_path: Path, profile: str | None = None) -> None:
     """Display baseline, maintenance, and overlay side by side.
 
     Falls back to browser display if OpenCV GUI is unavailable.
     """
     baseline_bgr = read_bgr(str(baseline_path))
     maintenance_bgr = read_bgr(str(maintenance_path))
-    aligned_maintenance = _align_maintenance_to_baseline(baseline_path, maintenance_path)
+    aligned_maintenance = _align_maintenance_to_baseline(baseline_path, maintenance_path, profile)
     overlay = overlay_detections(aligned_maintenance, _result_to_overlay_blobs(result))
 
     panel_h, panel_w = baseline_bgr.shape[:2]
@@ -209,10 +252,195 @@ def _display_overlay(result: dict, baseline_path: Path, maintenance_path: Path)
                 pass
 
 
+def _sweep_pairs(dataset_root: Path, args: argparse.Namespace) -> List[Tuple[str, Path, Path]]:
+    """(transformer, baseline, maintenance) for every transformer folder with both subdirs."""
+    pairs = []
+    for transformer_dir in sorted(p for p in dataset_root.iterdir() if p.is_dir()):
+        baseline_dir = transformer_dir / args.baseline_subdir
+        maintenance_dir = transformer_dir / args.maintenance_subdir
+        if not baseline_dir.is_dir() or not maintenance_dir.is_dir():
+            continue
+        try:
+            baseline_image = _pick_image(baseline_dir, None, args.baseline_index, "baseline")
+        except ValueError as exc:
+            print(f"Skipping {transformer_dir.name}: {exc}", file=sys.stderr)
+            continue
+        pairs.extend((transformer_dir.name, baseline_image, m) for m in _list_images(maintenance_dir))
+    return pairs
+
+
+def _sweep_key(transformer: str, maintenance_name: str) -> str:
+    return f"{transformer}/{maintenance_name}"
+
+
+def _completed_keys(path: Path) -> Set[str]:
+    """Pairs recorded as ok; a line cut short by an interruption is ignored."""
+    done: Set[str] = set()
+    if not path.exists():
+        return done
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                done.add(_sweep_key(record["transformer"], record["maintenanceImage"]))
+    return done
+
+
+def _sweep_one(task: Tuple[str, Path, Path, Dict[str, Any]]) -> Dict[str, Any]:
+    """Detect one pair in a worker; failures become status=error records."""
+    transformer, baseline_image, maintenance_image, opts = task
+    record: Dict[str, Any] = {
+        "transformer": transformer,
+        "baselineImage": baseline_image.name,
+        "maintenanceImage": maintenance_image.name,
+    }
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    try:
+        result, _ = run_detection_from_paths(
+            baseline_path=str(baseline_image),
+            maintenance_path=str(maintenance_image),
+            slider_percent=opts["slider_percent"],
+            profile=opts["profile"],
+            auto_roi=opts["auto_roi"],
+            memory_budget_mb=opts["memory_budget_mb"],
+            out_arrays_dir=(
+                str(Path(opts["save_arrays"]) / transformer / maintenance_image.stem)
+                if opts["save_arrays"] else None
+            ),
+            timings=timings,
+        )
+    except Exception as exc:
+        record.update(status="error", error=f"{type(exc).__name__}: {exc}")
+        return record
+    record.update(
+        status="ok",
+        elapsedMs=(time.perf_counter() - t0) * 1000.0,
+        stageMs=timings,
+        result=result,
+    )
+    return record
+
+
+def _csv_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    result = record.get("result", {})
+    row = {
+        "transformer": record["transformer"],
+        "baselineImage": record["baselineImage"],
+        "maintenanceImage": record["maintenanceImage"],
+        "status": record["status"],
+        "imageLevelLabel": result.get("imageLevelLabel"),
+        "anomalyCount": result.get("anomalyCount"),
+        "meanSsim": result.get("metrics", {}).get("meanSsim"),
+        "elapsedMs": record.get("elapsedMs"),
+        "error": record.get("error"),
+    }
+    for stage in SWEEP_STAGES:
+        row[f"{stage}Ms"] = record.get("stageMs", {}).get(stage)
+    return row
+
+
+def _run_sweep(args: argparse.Namespace, dataset_root: Path) -> int:
+    if not dataset_root.is_dir():
+        print(f"Dataset root does not exist: {dataset_root}", file=sys.stderr)
+        return 2
+    pairs = _sweep_pairs(dataset_root, args)
+    if not pairs:
+        print(f"No {args.baseline_subdir}/{args.maintenance_subdir} pairs under {dataset_root}", file=sys.stderr)
+        return 2
+
+    jsonl_path = (
+        Path(args.output_jsonl)
+        if args.output_jsonl
+        else Path("tests") / "output" / f"sweep_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    )
+    jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+    done = _completed_keys(jsonl_path) if args.resume else set()
+    pending = [p for p in pairs if _sweep_key(p[0], p[2].name) not in done]
+    print(
+        f"{len(pairs)} pairs across {len({p[0] for p in pairs})} transformers; "
+        f"{len(pairs) - len(pending)} already done, {len(pending)} to run on {args.workers} worker(s)"
+    )
+
+    opts = {
+        "slider_percent": args.slider_percent,
+        "profile": args.profile,
+        "auto_roi": args.auto_roi,
+        "memory_budget_mb": args.memory_budget_mb,
+        "save_arrays": args.save_arrays,
+    }
+    tasks = [(t, b, m, opts) for t, b, m in pending]
+
+    mode = "a" if args.resume else "w"
+    if args.resume and jsonl_path.exists() and jsonl_path.stat().st_size:
+        with jsonl_path.open("rb") as fh:
+            fh.seek(-1, os.SEEK_END)
+            if fh.read(1) != b"\n":
+                with jsonl_path.open("a", encoding="utf-8") as tail:
+                    tail.write("\n")
+    csv_path = Path(args.output_csv) if args.output_csv else None
+    write_header = csv_path is not None and (not args.resume or not csv_path.exists()
+                                             or csv_path.stat().st_size == 0)
+
+    stage_totals = {stage: 0.0 for stage in SWEEP_STAGES}
+    ok = failed = 0
+    busy_ms = 0.0
+    t0 = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        if executor is not None:
+            futures = [executor.submit(_sweep_one, task) for task in tasks]
+            results: Iterable[Dict[str, Any]] = (f.result() for f in as_completed(futures))
+        else:
+            results = map(_sweep_one, tasks)
+        csv_fh = csv_path.open(mode, newline="", encoding="utf-8") if csv_path is not None else None
+        with jsonl_path.open(mode, encoding="utf-8") as jsonl_fh:
+            writer = csv.DictWriter(csv_fh, fieldnames=SWEEP_CSV_FIELDS) if csv_fh is not None else None
+            if writer is not None and write_header:
+                writer.writeheader()
+            for i, record in enumerate(results, 1):
+                jsonl_fh.write(json.dumps(record) + "\n")
+                jsonl_fh.flush()
+                if writer is not None:
+                    writer.writerow(_csv_row(record))
+                    csv_fh.flush()
+                if record["status"] == "ok":
+                    ok += 1
+                    busy_ms += record["elapsedMs"]
+                    for stage, ms in record["stageMs"].items():
+                        stage_totals[stage] += ms
+                    status = f"label={record['result'].get('imageLevelLabel')} {record['elapsedMs']:.0f} ms"
+                else:
+                    failed += 1
+                    status = f"ERROR {record['error']}"
+                print(f"[{i}/{len(tasks)}] {_sweep_key(record['transformer'], record['maintenanceImage'])}: {status}")
+        if csv_fh is not None:
+            csv_fh.close()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    wall = time.perf_counter() - t0
+
+    print(f"\nSaved results to: {jsonl_path}" + (f" and {csv_path}" if csv_path else ""))
+    print(f"{ok} ok, {failed} failed in {wall:.1f} s: {ok / wall if wall > 0 else 0.0:.2f} images/s")
+    if ok:
+        stage_totals["other"] = busy_ms - sum(stage_totals.values())
+        print(f"{'stage':>10} {'mean ms':>9} {'share':>7}")
+        for stage, total in stage_totals.items():
+            if total > 0:
+                print(f"{stage:>10} {total / ok:9.1f} {total / busy_ms:7.1%}")
+    return 1 if failed else 0
+
+
 def main() -> int:
     args = _parse_args()
 
     dataset_root = Path(args.dataset_root)
+    if args.sweep:
+        return _run_sweep(args, dataset_root)
     transformer_dir = dataset_root / args.transformer
     baseline_dir = transformer_dir / args.baseline_subdir
     maintenance_dir = transformer_dir / args.maintenance_subdir
@@ -260,10 +488,16 @@ def main() -> int:
     last_result = None
     last_maintenance_image = None
     for maintenance_image in maintenance_images:
-        result = run_detection_from_paths(
+        result, _ = run_detection_from_paths(
             baseline_path=str(baseline_image),
             maintenance_path=str(maintenance_image),
             slider_percent=args.slider_percent,
+            profile=args.profile,
+            auto_roi=args.auto_roi,
+            memory_budget_mb=args.memory_budget_mb,
+            out_arrays_dir=(
+                str(Path(args.save_arrays) / maintenance_image.stem) if args.save_arrays else None
+            ),
         )
         runs.append({
             "maintenanceImage": maintenance_image.name,
@@ -287,6 +521,7 @@ def main() -> int:
         "baselinePath": str(baseline_image),
         "maintenanceSubdir": args.maintenance_subdir,
         "sliderPercent": args.slider_percent,
+        "profile": args.profile,
         "totalRuns": len(runs),
         "runs": runs,
     }
@@ -306,7 +541,7 @@ def main() -> int:
         print(json.dumps(payload, indent=2))
 
     if not args.no_show_overlay and last_result is not None and last_maintenance_image is not None:
-        _display_overlay(last_result, baseline_image, last_maintenance_image)
+        _display_overlay(last_result, baseline_image, last_maintenance_image, args.profile)
 
     return 0
 